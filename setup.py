@@ -1,6 +1,23 @@
 #!/usr/bin/env python
 
+import os
+
 from setuptools import setup
+from setuptools.command.build_py import build_py
+
+
+class BuildPyWithSchemaBundle(build_py):
+    """Generate the prebuilt schema and metadata bundle alongside the package."""
+    def run(self):
+        super().run()
+        try:
+            from tap_mailchimp.schema import BUNDLE_FILE, write_bundle # pylint: disable=import-outside-toplevel
+        except ImportError as exc:
+            self.warn('Skipping schema bundle, tap dependencies are not installed: {}'.format(exc))
+            return
+        path = write_bundle(os.path.join(self.build_lib, 'tap_mailchimp', BUNDLE_FILE))
+        self.announce('wrote schema bundle {}'.format(path), level=2)
+
 
 setup(name='tap-mailchimp',
       version='1.4.0',
@@ -18,13 +35,19 @@ setup(name='tap-mailchimp',
           'dev': [
               'pylint',
               'nose2',
+          ],
+          'parquet': [
+              'pyarrow',
           ]
       },
       entry_points='''
           [console_scripts]
           tap-mailchimp=tap_mailchimp:main
+          tap-mailchimp-merge-states=tap_mailchimp.sharding:main
+          tap-mailchimp-daemon=tap_mailchimp.daemon:main
       ''',
       packages=['tap_mailchimp'],
+      cmdclass={'build_py': BuildPyWithSchemaBundle},
       package_data = {
           'tap_mailchimp': ['schemas/*.json'],
       }
@@ -5,11 +5,8 @@ import json
 import argparse
 
 import singer
-from singer import metadata
 
 from tap_mailchimp.client import MailchimpClient
-from tap_mailchimp.discover import discover
-from tap_mailchimp.sync import sync
 
 LOGGER = singer.get_logger()
 
@@ -18,6 +15,9 @@ REQUIRED_CONFIG_KEYS = [
 ]
 
 def do_discover(client):
+    # Only the mode that runs imports its modules
+    from tap_mailchimp.discover import discover # pylint: disable=import-outside-toplevel
+
     LOGGER.info('Starting discover')
     catalog = discover(client)
     json.dump(catalog.to_dict(), sys.stdout, indent=2)
@@ -31,7 +31,11 @@ def main():
         if parsed_args.discover:
             do_discover(client)
         elif parsed_args.catalog:
-            sync(client,
-                 parsed_args.catalog,
-                 parsed_args.state,
-                 parsed_args.config['start_date'])
+            from tap_mailchimp.sync import sync # pylint: disable=import-outside-toplevel
+            from tap_mailchimp.profiling import profiled # pylint: disable=import-outside-toplevel
+
+            with profiled(parsed_args.config.get('profile_dir')):
+                sync(client,
+                     parsed_args.catalog,
+                     parsed_args.state,
+                     parsed_args.config['start_date'])
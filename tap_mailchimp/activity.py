@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from singer import metadata, Transformer
+
+# Returned by a field converter for a value it cannot convert like the
+# Transformer would, the record then goes through the Transformer
+SLOW = object()
+
+def convert_string(value):
+    return value if isinstance(value, str) else SLOW
+
+def convert_nullable_string(value):
+    return value if value is None or isinstance(value, str) else SLOW
+
+def convert_boolean(value):
+    return value if isinstance(value, bool) else SLOW
+
+def convert_datetime(value):
+    # Mailchimp's own format, 2020-01-01T00:00:00+00:00, formatted as the
+    # Transformer formats it once checked to be a valid date
+    if isinstance(value, str) and len(value) == 25 and value.endswith('+00:00'):
+        try:
+            datetime.fromisoformat(value[:19])
+        except ValueError:
+            return SLOW
+        return value[:19] + '.000000Z'
+    return SLOW
+
+def get_converter(schema):
+    """Converter of the values of a field, None when every value goes through the Transformer."""
+    json_types = schema.get('type', [])
+    if isinstance(json_types, str):
+        json_types = [json_types]
+    nullable = 'null' in json_types
+    json_types = [json_type for json_type in json_types if json_type != 'null']
+    if json_types == ['string'] and schema.get('format') == 'date-time':
+        return convert_datetime
+    if json_types == ['string'] and 'format' not in schema:
+        return convert_nullable_string if nullable else convert_string
+    if json_types == ['boolean'] and not nullable:
+        return convert_boolean
+    return None
+
+class ActivityFlattener:
+    """
+    Flattens the emails of a reports_email_activity operation into one
+    transformed record per activity.
+
+    The fields selected in the catalog and a converter for each are compiled
+    once. The fields of an email are converted once into a template, and each
+    record is built from it and its activity's converted fields, in the order
+    `dict(email)` updated with the activity would have. A value the compiled
+    converters do not handle sends its record through the Transformer as it
+    is, so the output is the same either way.
+    """
+    def __init__(self, schema, stream_metadata):
+        self.schema = schema
+        self.stream_metadata = stream_metadata
+        self.converters = {}
+        for field, field_schema in schema.get('properties', {}).items():
+            field_metadata = stream_metadata.get(('properties', field), {})
+            if field_metadata.get('inclusion') != 'automatic' and \
+               (field_metadata.get('selected') is False or field_metadata.get('inclusion') == 'unsupported'):
+                continue
+            self.converters[field] = get_converter(field_schema)
+        self.transformer = Transformer()
+        # The largest raw `timestamp` flattened
+        self.max_timestamp = None
+
+    def convert(self, fields):
+        """The converted `fields` the Transformer would keep, None when one of them needs the Transformer."""
+        converted = {}
+        for key, value in fields.items():
+            if key not in self.converters:
+                # Not selected or not in the schema, dropped by the Transformer
+                continue
+            convert = self.converters[key]
+            value = SLOW if convert is None else convert(value)
+            if value is SLOW:
+                return None
+            converted[key] = value
+        return converted
+
+    def flatten(self, emails):
+        for email in emails:
+            activities = email.get('activity')
+            if activities is None:
+                continue
+            template_fields = {key: value for key, value in email.items() if key not in ('activity', '_links')}
+            template = self.convert(template_fields)
+            for activity in activities:
+                timestamp = activity.get('timestamp')
+                if timestamp is not None and (self.max_timestamp is None or timestamp > self.max_timestamp):
+                    self.max_timestamp = timestamp
+                converted = None if template is None else self.convert(activity)
+                if converted is None:
+                    record = dict(template_fields)
+                    record.update(activity)
+                    yield self.transformer.transform(record, self.schema, self.stream_metadata)
+                else:
+                    record = template.copy()
+                    record.update(converted)
+                    yield record
+
+def get_flattener(catalog, stream_name):
+    stream = catalog.get_stream(stream_name)
+    return ActivityFlattener(stream.schema.to_dict(), metadata.to_map(stream.metadata))
@@ -0,0 +1,54 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+import singer
+
+LOGGER = singer.get_logger()
+
+DEFAULT_CACHE_TTL = 3600 # 1 hour
+
+def get_cache_key(*parts):
+    """
+    Hash the given values (credentials, data center, ...) into a key that is
+    safe to use in a file name and does not leak the credentials to disk.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part or '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def get_cache_path(cache_dir, name, key):
+    return os.path.join(cache_dir, '{}-{}.json'.format(name, key))
+
+def read_cache(cache_dir, name, key, ttl):
+    """Return the cached value, or None when it is missing, unreadable or older than `ttl` seconds."""
+    path = get_cache_path(cache_dir, name, key)
+    try:
+        with open(path, encoding='UTF-8') as file:
+            entry = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        LOGGER.warning('Ignoring unreadable cache file %s: %s', path, exc)
+        return None
+
+    age = time.time() - entry.get('written_at', 0)
+    if age < 0 or age > ttl:
+        LOGGER.info('Cache entry %s expired (%.0f seconds old)', path, age)
+        return None
+    return entry.get('value')
+
+def write_cache(cache_dir, name, key, value):
+    """Atomically write `value` to the cache, failures are logged and ignored."""
+    path = get_cache_path(cache_dir, name, key)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False, encoding='UTF-8') as file:
+            json.dump({'written_at': time.time(), 'value': value}, file)
+        os.replace(file.name, path)
+    except OSError as exc:
+        LOGGER.warning('Unable to write cache file %s: %s', path, exc)
@@ -0,0 +1,156 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import tempfile
+import threading
+from collections import defaultdict, deque
+from urllib.parse import urlencode
+
+import requests
+import singer
+
+LOGGER = singer.get_logger()
+
+RECORD = 'record'
+REPLAY = 'replay'
+CASSETTE_MODES = (RECORD, REPLAY)
+
+INDEX_FILE = 'index.jsonl'
+BODIES_DIR = 'bodies'
+COPY_CHUNK_SIZE = 1024 * 1024 # 1 MB
+
+class CassetteMissError(Exception):
+    pass
+
+def get_request_key(method, url, params=None, json_body=None):
+    """
+    Identify a request by method, url, query parameters and JSON body.
+    Credentials are sent in headers and are never part of the key.
+    """
+    key = '{} {}'.format(method.upper(), url)
+    if params:
+        key += '?' + urlencode(sorted(params.items()))
+    if json_body is not None:
+        key += ' ' + hashlib.sha256(json.dumps(json_body, sort_keys=True).encode('utf-8')).hexdigest()
+    return key
+
+class Cassette:
+    """
+    Records HTTP interactions to, or replays them from, a local directory.
+
+    The directory holds `index.jsonl`, one line per interaction in the order
+    they happened, and the response bodies gzip compressed under `bodies/`,
+    named by their content hash so identical responses are stored once.
+    Streamed responses (the batch archives and, with `stream_json`, the
+    pages) are copied to disk in chunks while recording, they are never held
+    in memory. Bodies are stored decoded from their Content-Encoding, so a
+    replayed response is never decoded again.
+
+    On replay, requests with the same key are answered in the recorded order,
+    the last response is repeated once they run out (e.g. batch polling).
+    Requests that were never recorded raise CassetteMissError, the network is
+    never used. With `replay_latency` the recorded response times are slept.
+    """
+    def __init__(self, path, mode, replay_latency=False):
+        if mode not in CASSETTE_MODES:
+            raise Exception('Invalid cassette_mode: {}, expected one of {}'.format(mode, CASSETTE_MODES))
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.__lock = threading.Lock()
+        self.__interactions = defaultdict(deque)
+
+        os.makedirs(os.path.join(self.path, BODIES_DIR), exist_ok=True)
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if mode == REPLAY:
+            self.__load()
+        elif os.path.exists(index_path):
+            # Start a new recording, bodies are kept as they are shared by content hash
+            os.remove(index_path)
+
+    def __load(self):
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise CassetteMissError('No cassette found at {}'.format(index_path))
+        with open(index_path, encoding='UTF-8') as file:
+            for line in file:
+                interaction = json.loads(line)
+                self.__interactions[interaction['key']].append(interaction)
+        LOGGER.info('Replaying HTTP responses from cassette %s', self.path)
+
+    def request(self, session, method, url, **kwargs):
+        key = get_request_key(method, url, kwargs.get('params'), kwargs.get('json'))
+        if self.mode == REPLAY:
+            return self.__replay(key)
+        return self.__record(key, session, method, url, **kwargs)
+
+    def __body_path(self, body_hash):
+        return os.path.join(self.path, BODIES_DIR, body_hash + '.gz')
+
+    def __store_body(self, chunks):
+        """Write the chunks to a compressed body file and return its content hash."""
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=os.path.join(self.path, BODIES_DIR), delete=False) as tmp_file:
+            with gzip.GzipFile(fileobj=tmp_file, mode='wb', compresslevel=1) as body_file:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    body_file.write(chunk)
+        body_hash = digest.hexdigest()
+        os.replace(tmp_file.name, self.__body_path(body_hash))
+        return body_hash
+
+    def __record(self, key, session, method, url, **kwargs):
+        start = time.perf_counter()
+        response = session.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        stream = kwargs.get('stream', False)
+        if stream:
+            body_hash = self.__store_body(response.raw.stream(COPY_CHUNK_SIZE, decode_content=True))
+            response.close()
+            # Hand the caller the copy on disk, the original stream has been consumed
+            response.raw = gzip.open(self.__body_path(body_hash), 'rb')
+            response.headers.pop('Content-Encoding', None)
+        else:
+            body_hash = self.__store_body([response.content])
+
+        interaction = {
+            'key': key,
+            'status_code': response.status_code,
+            'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+            'elapsed': elapsed,
+            'stream': stream,
+            'body': body_hash,
+        }
+        with self.__lock:
+            with open(os.path.join(self.path, INDEX_FILE), 'a', encoding='UTF-8') as file:
+                file.write(json.dumps(interaction) + '\n')
+        return response
+
+    def __replay(self, key):
+        with self.__lock:
+            interactions = self.__interactions.get(key)
+            if not interactions:
+                raise CassetteMissError('No recorded response for request: {}'.format(key))
+            interaction = interactions.popleft() if len(interactions) > 1 else interactions[0]
+
+        if self.replay_latency:
+            time.sleep(interaction['elapsed'])
+
+        response = requests.Response()
+        response.status_code = interaction['status_code']
+        response.reason = ''
+        response.url = key.split(' ')[1]
+        response.encoding = 'utf-8'
+        response.headers.update(interaction['headers'])
+        body_path = self.__body_path(interaction['body'])
+        if interaction['stream']:
+            response.raw = gzip.open(body_path, 'rb')
+        else:
+            with gzip.open(body_path, 'rb') as body_file:
+                response._content = body_file.read() # pylint: disable=protected-access
+            # Also readable with iter_content, like a response whose body was read
+            response._content_consumed = True # pylint: disable=protected-access
+        return response
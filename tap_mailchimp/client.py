@@ -1,12 +1,25 @@
+import time
+from contextlib import nullcontext
+
 import backoff
 import requests
 import singer
 from requests.exceptions import ConnectionError, Timeout # pylint: disable=redefined-builtin
 from singer import metrics
 
+from tap_mailchimp.cassette import Cassette
+from tap_mailchimp.json_stream import iter_items
+from tap_mailchimp.cache import DEFAULT_CACHE_TTL, get_cache_key, read_cache, write_cache
+from tap_mailchimp.page_size import DEFAULT_TARGET_PAGE_LATENCY
+from tap_mailchimp.schema import get_package_version, get_schemas_digest
+from tap_mailchimp.output import BATCH_FORMATS, DEFAULT_BATCH_SIZE, DEFAULT_ROW_GROUP_SIZE
+from tap_mailchimp.instrumentation import DEFAULT_METRICS_INTERVAL, HTTP_WAIT, JSON_DECODE, StageMetrics
+
 LOGGER = singer.get_logger()
 
 REQUEST_TIMEOUT = 300
+STREAM_CHUNK_SIZE = 64 * 1024 # 64 KB
+DEFAULT_SEGMENT_REFRESH_DAYS = 0 # segments are not fingerprinted unless enabled
 
 class MailchimpForbiddenError(Exception):
     pass
@@ -19,13 +32,88 @@ class Server5xxError(Exception):
 
 # pylint: disable=R0902
 class MailchimpClient:
-    def __init__(self, config):
+    def __init__(self, config, adapter=None, throttle=None):
         self.__user_agent = config.get('user_agent')
         self.__access_token = config.get('access_token')
         self.__api_key = config.get('api_key')
         self.__session = requests.Session()
+        # Daemon mode shares one connection pool between the accounts' clients
+        # and rate limits each account's requests with `throttle`
+        self.__shared_adapter = adapter is not None
+        if adapter is not None:
+            self.__session.mount('https://', adapter)
+            self.__session.mount('http://', adapter)
+        self.__throttle = throttle or nullcontext
         self.__base_url = None
         self.page_size = int(config.get('page_size', '1000'))
+        # Adjust the page size of each endpoint towards `target_page_latency` seconds per page
+        self.adaptive_page_size = str(config.get('adaptive_page_size', '')).lower() in ('true', '1')
+        self.target_page_latency = float(config.get('target_page_latency') or DEFAULT_TARGET_PAGE_LATENCY)
+        # Split large list_members backlogs into windows of `list_members_window_days` days,
+        # fetched by `list_members_window_workers` threads
+        self.list_members_window_days = int(config.get('list_members_window_days') or 0)
+        self.list_members_window_workers = int(config.get('list_members_window_workers') or 1)
+        # Re-fetch the members of unchanged segments at least every `segment_refresh_days`
+        # days, 0 re-fetches them on every run and writes no fingerprints
+        segment_refresh_days = config.get('segment_refresh_days')
+        self.segment_refresh_days = float(DEFAULT_SEGMENT_REFRESH_DAYS if segment_refresh_days in (None, '')
+                                          else segment_refresh_days)
+        # Replace the email activity bookmarks of campaigns sent more than
+        # `state_retention_days` days ago by a watermark
+        self.state_retention_days = float(config.get('state_retention_days') or 0)
+        # Store the per list and per campaign bookmarks as compressed JSON
+        self.compress_state_bookmarks = str(config.get('compress_state_bookmarks', '')).lower() in ('true', '1')
+        # Fetch the members of each list as one stream per status, in parallel
+        self.list_members_status_partitions = \
+            str(config.get('list_members_status_partitions', '')).lower() in ('true', '1')
+
+        # Decode the records of each page as the response body arrives
+        self.stream_json = str(config.get('stream_json', '')).lower() in ('true', '1')
+        # Size in bytes of the last response body, observed by the page size controller
+        self.last_response_bytes = None
+
+        # Optional on-disk cache for discovery results and the OAuth api_endpoint
+        self.cache_dir = config.get('cache_dir')
+        self.cache_ttl = float(config.get('cache_ttl') or DEFAULT_CACHE_TTL)
+        self.__cache_key_parts = (self.__access_token, self.__api_key, config.get('dc'), config.get('base_url'))
+        self.__cache_key = None
+
+        # Record every HTTP interaction to, or replay them from, a local cassette
+        self.__cassette = None
+        if config.get('cassette_mode'):
+            self.__cassette = Cassette(config.get('cassette_dir') or 'cassette',
+                                       config['cassette_mode'],
+                                       replay_latency=bool(config.get('cassette_replay_latency')))
+
+        # Stop the sync at the next safe point once `max_runtime_seconds` have elapsed
+        max_runtime_seconds = float(config.get('max_runtime_seconds') or 0)
+        self.deadline = time.monotonic() + max_runtime_seconds if max_runtime_seconds > 0 else None
+
+        # Split the lists and campaigns of the account between `shard_count` processes
+        self.shard_count = int(config.get('shard_count') or 1)
+        self.shard_index = int(config.get('shard_index') or 0)
+        if self.shard_count < 1 or not 0 <= self.shard_index < self.shard_count:
+            raise Exception('Invalid sharding config: shard_index {} of shard_count {}'.format(
+                self.shard_index, self.shard_count))
+
+        # Write records to compressed JSONL files referenced by BATCH messages instead of stdout
+        self.batch_dir = config.get('batch_dir')
+        self.batch_streams = config.get('batch_streams')
+        if isinstance(self.batch_streams, str):
+            self.batch_streams = [stream_name.strip() for stream_name in self.batch_streams.split(',')]
+        self.batch_size = int(config.get('batch_size') or DEFAULT_BATCH_SIZE)
+        self.batch_format = config.get('batch_format') or 'jsonl'
+        if self.batch_format not in BATCH_FORMATS:
+            raise Exception('Invalid batch_format: {}, expected one of {}'.format(self.batch_format, BATCH_FORMATS))
+        self.row_group_size = int(config.get('row_group_size') or DEFAULT_ROW_GROUP_SIZE)
+
+        # Transform and serialize the records on a pool of processes, with stdout output
+        self.transform_workers = int(config.get('transform_workers') or 0)
+
+        # Interval in seconds between the per-stage timing metrics logged during sync
+        self.metrics_interval = float(config.get('metrics_interval') or DEFAULT_METRICS_INTERVAL)
+        # Timings of the client's requests, from every thread of a sync
+        self.stage_metrics = StageMetrics(self.metrics_interval)
 
         # performs date-window calculation for fetching campaigns
         try:
@@ -46,7 +134,10 @@ class MailchimpClient:
         else:
             self.__request_timeout = REQUEST_TIMEOUT
 
-        if not self.__access_token and self.__api_key:
+        if config.get('base_url'):
+            # e.g. a proxy or a local API simulator
+            self.__base_url = config['base_url'].rstrip('/')
+        elif not self.__access_token and self.__api_key:
             self.__base_url = 'https://{}.api.mailchimp.com'.format(
                 config.get('dc'))
 
@@ -54,9 +145,33 @@ class MailchimpClient:
         return self
 
     def __exit__(self, type, value, traceback): # pylint: disable=redefined-builtin
-        self.__session.close()
+        # Closing the session closes its adapters, a shared pool stays open
+        if not self.__shared_adapter:
+            self.__session.close()
+
+    @property
+    def base_url(self):
+        return self.__base_url
+
+    @property
+    def cache_key(self):
+        """
+        Key of the cache entries of the account and the API it is reached through,
+        and of the tap version and its schema files so an upgrade or a schema
+        edit does not reuse a stale catalog. Only computed once the cache is used.
+        """
+        if self.__cache_key is None:
+            self.__cache_key = get_cache_key(*self.__cache_key_parts, get_package_version(), get_schemas_digest())
+        return self.__cache_key
 
     def get_base_url(self):
+        if self.cache_dir:
+            api_endpoint = read_cache(self.cache_dir, 'api_endpoint', self.cache_key, self.cache_ttl)
+            if api_endpoint:
+                LOGGER.info('Using cached Mailchimp API endpoint')
+                self.__base_url = api_endpoint
+                return
+
         data = self.request('GET',
                             url='https://login.mailchimp.com/oauth2/metadata',
                             endpoint='base_url')
@@ -72,15 +187,25 @@ class MailchimpClient:
             )
         self.__base_url = data['api_endpoint']
 
+        if self.cache_dir:
+            write_cache(self.cache_dir, 'api_endpoint', self.cache_key, self.__base_url)
+
     @backoff.on_exception(backoff.expo,
                           Timeout, # Backoff for request timeout
                           max_tries=5,
                           factor=2)
+    def request(self, method, path=None, url=None, s3=False, **kwargs):
+        return self.request_without_timeout_retries(method, path=path, url=url, s3=s3, **kwargs)
+
     @backoff.on_exception(backoff.expo,
                           (Server5xxError, ClientRateLimitError, ConnectionError),
                           max_tries=6,
                           factor=3)
-    def request(self, method, path=None, url=None, s3=False, **kwargs):
+    def request_without_timeout_retries(self, method, path=None, url=None, s3=False, stream_response=False, **kwargs):
+        """
+        `request` without the retries on Timeout, for callers that handle a
+        timeout themselves, e.g. by asking for a smaller page.
+        """
         if url is None and self.__base_url is None:
             self.get_base_url()
 
@@ -107,12 +232,17 @@ class MailchimpClient:
         if self.__user_agent:
             kwargs['headers']['User-Agent'] = self.__user_agent
 
-        if s3:
+        if s3 or stream_response:
             kwargs['stream'] = True
 
-        with metrics.http_request_timer(endpoint) as timer:
+        with self.__throttle(), metrics.http_request_timer(endpoint) as timer:
             LOGGER.info("Executing %s request to %s with params: %s", method, url, kwargs.get('params'))
-            response = self.__session.request(method, url, timeout=self.__request_timeout, **kwargs) # Pass request timeout
+            start = time.perf_counter()
+            if self.__cassette:
+                response = self.__cassette.request(self.__session, method, url, timeout=self.__request_timeout, **kwargs)
+            else:
+                response = self.__session.request(method, url, timeout=self.__request_timeout, **kwargs) # Pass request timeout
+            self.stage_metrics.add(endpoint, HTTP_WAIT, time.perf_counter() - start)
             timer.tags[metrics.Tag.http_status_code] = response.status_code
 
         if response.status_code >= 500:
@@ -127,13 +257,46 @@ class MailchimpClient:
 
         response.raise_for_status()
 
-        if s3:
+        if s3 or stream_response:
             return response
 
-        return response.json()
+        self.last_response_bytes = len(response.content)
+        with self.stage_metrics.timer(endpoint, JSON_DECODE):
+            return response.json()
 
-    def get(self, path, **kwargs):
+    def get(self, path, retry_timeouts=True, **kwargs):
+        if not retry_timeouts:
+            return self.request_without_timeout_retries('GET', path=path, **kwargs)
         return self.request('GET', path=path, **kwargs)
 
+    def get_records(self, path, data_key, **kwargs):
+        """
+        GET a page and yield the records under `data_key` one at a time, decoded
+        as the response body arrives instead of after buffering all of it.
+        """
+        endpoint = kwargs.get('endpoint')
+        response = self.request('GET', path=path, stream_response=True, **kwargs)
+        self.last_response_bytes = 0
+
+        def read_chunks():
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                self.last_response_bytes += len(chunk)
+                yield chunk
+
+        # Reading the body and decoding it are interleaved, both are timed as json_decode
+        decode_time = 0.0
+        count = 0
+        with response:
+            records = iter_items(read_chunks(), data_key)
+            while True:
+                start = time.perf_counter()
+                record = next(records, records)
+                decode_time += time.perf_counter() - start
+                if record is records:
+                    break
+                count += 1
+                yield record
+        self.stage_metrics.add(endpoint, JSON_DECODE, decode_time, count)
+
     def post(self, path, **kwargs):
         return self.request('POST', path=path, **kwargs)
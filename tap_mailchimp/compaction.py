@@ -0,0 +1,179 @@
+import json
+import zlib
+import base64
+from bisect import bisect_left
+from datetime import timedelta
+
+import singer
+from singer.utils import now, strftime, strptime_to_utc
+
+LOGGER = singer.get_logger()
+
+# Bookmarks keyed by the id of a list or campaign, and the stream returning those ids
+PER_ID_BOOKMARKS = {
+    'lists': 'lists',
+    'campaigns': 'campaigns',
+    'reports_email_activity': 'campaigns',
+}
+# Keys of the per-id bookmarks that are not ids
+NOT_IDS = {'datetime'}
+
+# Email activity bookmarks of the old campaigns, by cohort, see apply_retention
+WATERMARK = 'reports_email_activity_watermark'
+# Cohorts kept in the watermark, the earliest ones are combined past it
+MAX_WATERMARK_COHORTS = 10
+
+ENCODING = 'zlib+base64'
+# Bookmarks stored compressed by encode_bookmarks
+ENCODED_BOOKMARKS = list(PER_ID_BOOKMARKS) + [WATERMARK]
+
+def prune_bookmarks(state, live_ids, owns_id):
+    """
+    Drop the bookmarks of the lists and campaigns that are no longer returned
+    by their stream. `live_ids` has the ids returned this run by stream name,
+    streams not synced this run are left as they are. Only the ids `owns_id`
+    are pruned, a shard does not know the ids of the others.
+    """
+    bookmarks = state.get('bookmarks', {})
+    pruned = 0
+    for key, stream_name in PER_ID_BOOKMARKS.items():
+        ids = live_ids.get(stream_name)
+        per_id = bookmarks.get(key)
+        if ids is None or not isinstance(per_id, dict):
+            continue
+        for _id in list(per_id):
+            if _id not in NOT_IDS and _id not in ids and owns_id(_id):
+                del per_id[_id]
+                pruned += 1
+    watermark = bookmarks.get(WATERMARK)
+    if watermark and live_ids.get('campaigns') is not None:
+        for cohort in watermark['cohorts']:
+            campaign_ids = [campaign_id for campaign_id in cohort['campaign_ids']
+                            if campaign_id in live_ids['campaigns'] or not owns_id(campaign_id)]
+            pruned += len(cohort['campaign_ids']) - len(campaign_ids)
+            cohort['campaign_ids'] = campaign_ids
+        watermark['cohorts'] = [cohort for cohort in watermark['cohorts'] if cohort['campaign_ids']]
+    if pruned:
+        LOGGER.info('Dropped %s bookmarks of deleted lists and campaigns', pruned)
+    return pruned
+
+def apply_retention(state, send_times, retention_days, synced_campaigns):
+    """
+    Replace the email activity bookmarks of the campaigns sent more than
+    `retention_days` days ago by a watermark, one cohort per run:
+
+      {"send_time": "2020-01-01T00:00:00.000000Z",
+       "cohorts": [{"datetime": "2020-02-03T04:05:06+00:00", "campaign_ids": ["abc123", "def456"]}]}
+
+    Only the campaigns synced this run are retired, `synced_campaigns` has the
+    submission time of the batch each was read by. Every activity of theirs
+    up to that time was read, so their cohort's `datetime` is the latest of
+    their bookmarks, capped by the earliest of those times. A campaign synced
+    again moves to the new cohort, so the watermark advances with the runs.
+    A campaign without a bookmark, never synced or whose operation failed,
+    is not covered and starts from the start date.
+    """
+    horizon = now() - timedelta(days=retention_days)
+    activity = state.get('bookmarks', {}).get('reports_email_activity', {})
+    expired = [campaign_id for campaign_id, bookmark in activity.items()
+               if bookmark and campaign_id in synced_campaigns and send_times.get(campaign_id) and
+               strptime_to_utc(send_times[campaign_id]) < horizon]
+    if not expired:
+        return 0
+
+    latest_bookmark = max((activity.pop(campaign_id) for campaign_id in expired), key=strptime_to_utc)
+    earliest_batch = min((synced_campaigns[campaign_id] for campaign_id in expired), key=strptime_to_utc)
+    cohort = {
+        'datetime': min(latest_bookmark, earliest_batch, key=strptime_to_utc),
+        'campaign_ids': sorted(expired),
+    }
+    watermarks = [{'send_time': strftime(horizon), 'cohorts': [cohort]}]
+    if state['bookmarks'].get(WATERMARK):
+        # The campaigns retired again leave their previous cohort
+        previous = state['bookmarks'][WATERMARK]
+        retired = set(expired)
+        watermarks.append({**previous, 'cohorts': [
+            {**old, 'campaign_ids': [campaign_id for campaign_id in old['campaign_ids']
+                                     if campaign_id not in retired]}
+            for old in previous['cohorts']]})
+    watermark = merge_watermarks(watermarks)
+    state['bookmarks'][WATERMARK] = watermark
+    LOGGER.info('Replaced the email activity bookmarks of %s campaigns sent before %s by a watermark',
+                len(expired), watermark['send_time'])
+    return len(expired)
+
+def merge_watermarks(watermarks):
+    """
+    One watermark standing for several, e.g. of the shards of an account:
+    the latest `send_time` with the cohorts of every one of them. Cohorts
+    with the same `datetime` are combined and empty ones dropped. Past
+    MAX_WATERMARK_COHORTS the earliest cohorts are combined at the earliest
+    of their datetimes, a lower bound for each of their campaigns.
+    """
+    by_datetime = {}
+    for watermark in watermarks:
+        for cohort in watermark['cohorts']:
+            if cohort['campaign_ids']:
+                by_datetime.setdefault(cohort['datetime'], set()).update(cohort['campaign_ids'])
+    cohorts = [{'datetime': cohort_datetime, 'campaign_ids': sorted(campaign_ids)}
+               for cohort_datetime, campaign_ids in sorted(by_datetime.items(),
+                                                    key=lambda item: strptime_to_utc(item[0]))]
+    if len(cohorts) > MAX_WATERMARK_COHORTS:
+        combined = len(cohorts) - MAX_WATERMARK_COHORTS + 1
+        cohorts = [{'datetime': cohorts[0]['datetime'],
+                    'campaign_ids': sorted({campaign_id for cohort in cohorts[:combined]
+                                            for campaign_id in cohort['campaign_ids']})}] + cohorts[combined:]
+    return {
+        'send_time': max((watermark['send_time'] for watermark in watermarks), key=strptime_to_utc),
+        'cohorts': cohorts,
+    }
+
+def get_email_activity_bookmark(state, campaign_id, default):
+    """Email activity bookmark of a campaign, its own or its watermark cohort's when it has one."""
+    bookmarks = state.get('bookmarks', {})
+    bookmark = bookmarks.get('reports_email_activity', {}).get(campaign_id)
+    if bookmark:
+        return bookmark
+    for cohort in bookmarks.get(WATERMARK, {}).get('cohorts', []):
+        # Sorted, see merge_watermarks
+        campaign_ids = cohort['campaign_ids']
+        index = bisect_left(campaign_ids, campaign_id)
+        if index < len(campaign_ids) and campaign_ids[index] == campaign_id:
+            return cohort['datetime']
+    return default
+
+def is_encoded(value):
+    return isinstance(value, dict) and value.get('encoding') == ENCODING and 'data' in value
+
+def encode_bookmarks(state, cache=None):
+    """
+    Copy of `state` with each per-id bookmark map stored as compressed JSON:
+
+      {"lists": {"encoding": "zlib+base64", "data": "eJy..."}}
+
+    With a `cache` dict kept across the states of a run, a map is only
+    compressed again once its JSON changed.
+    """
+    bookmarks = state.get('bookmarks')
+    if not bookmarks:
+        return state
+    encoded = dict(bookmarks)
+    for key in ENCODED_BOOKMARKS:
+        if isinstance(encoded.get(key), dict) and not is_encoded(encoded[key]):
+            text = json.dumps(encoded[key], separators=(',', ':'))
+            cached = cache.get(key) if cache is not None else None
+            if cached is None or cached[0] != text:
+                data = base64.b64encode(zlib.compress(text.encode('utf-8'))).decode('ascii')
+                cached = (text, {'encoding': ENCODING, 'data': data})
+                if cache is not None:
+                    cache[key] = cached
+            encoded[key] = cached[1]
+    return {**state, 'bookmarks': encoded}
+
+def decode_bookmarks(state):
+    """Decode the per-id bookmark maps encoded by encode_bookmarks in place."""
+    bookmarks = state.get('bookmarks', {})
+    for key, value in list(bookmarks.items()):
+        if is_encoded(value):
+            bookmarks[key] = json.loads(zlib.decompress(base64.b64decode(value['data'])).decode('utf-8'))
+    return state
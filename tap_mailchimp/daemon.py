@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import argparse
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import singer
+from singer.catalog import Schema
+from requests.adapters import HTTPAdapter
+
+from tap_mailchimp.client import MailchimpClient
+from tap_mailchimp.profiling import profiled
+from tap_mailchimp.schema import get_schemas
+from tap_mailchimp.sync import sync
+
+LOGGER = singer.get_logger()
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_REQUESTS_PER_SECOND = 10
+DEFAULT_INTERVAL = 3600 # seconds between two runs of an account
+
+class ThreadLocalStdout:
+    """
+    sys.stdout replacement sending each thread's writes to its own file.
+    singer.write_message looks sys.stdout up on every message, so the Singer
+    output of an account's sync goes to that account's output file. Threads
+    without a file (e.g. the main thread) write to the original stdout.
+    """
+    def __init__(self, default):
+        self.default = default
+        self.__local = threading.local()
+
+    def set_target(self, file):
+        self.__local.file = file
+
+    def get_target(self):
+        return getattr(self.__local, 'file', None) or self.default
+
+    def write(self, text):
+        return self.get_target().write(text)
+
+    def flush(self):
+        self.get_target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.get_target(), name)
+
+class RateLimiter:
+    """Spaces an account's requests to at most `requests_per_second`."""
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.__lock = threading.Lock()
+        self.__next_request = 0
+
+    def wait(self):
+        with self.__lock:
+            now = time.monotonic()
+            delay = self.__next_request - now
+            self.__next_request = max(now, self.__next_request) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+class FairScheduler:
+    """
+    Limits the requests in flight across all accounts to `max_concurrent_requests`.
+    Free slots are handed out first come first served, each account's sync
+    issues one request at a time so the accounts take turns and a busy
+    account cannot starve the others.
+    """
+    def __init__(self, max_concurrent_requests):
+        self.max_concurrent_requests = max_concurrent_requests
+        self.__condition = threading.Condition()
+        self.__waiting = deque()
+        self.__in_flight = 0
+
+    @contextmanager
+    def slot(self, rate_limiter):
+        rate_limiter.wait()
+        ticket = object()
+        with self.__condition:
+            self.__waiting.append(ticket)
+            self.__condition.wait_for(lambda: self.__waiting[0] is ticket and
+                                      self.__in_flight < self.max_concurrent_requests)
+            self.__waiting.popleft()
+            self.__in_flight += 1
+            self.__condition.notify_all()
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__in_flight -= 1
+                self.__condition.notify_all()
+
+def load_json(path, default=None):
+    if not path or not os.path.exists(path):
+        return default
+    with open(path, encoding='UTF-8') as file:
+        return json.load(file)
+
+def write_json(path, value):
+    """Atomically replace `path`, a crash never leaves a truncated state file behind."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, encoding='UTF-8') as file:
+        json.dump(value, file)
+    os.replace(file.name, path)
+
+class Account:
+    """
+    One account of the daemon config:
+
+      - name: used in logs and output file names
+      - config: path to the tap config of the account
+      - catalog: path to its catalog with the selected streams
+      - state: path to its state file, read before and written after each run
+      - output_dir: directory receiving one <name>-<timestamp>.jsonl file per run
+      - requests_per_second: per account rate limit, defaults to the daemon's
+    """
+    def __init__(self, account_config, requests_per_second):
+        self.name = account_config['name']
+        self.config_path = account_config['config']
+        self.catalog_path = account_config['catalog']
+        self.state_path = account_config['state']
+        self.output_dir = account_config['output_dir']
+        self.rate_limiter = RateLimiter(float(account_config.get('requests_per_second') or requests_per_second))
+        self.next_run = 0
+        self.client = None
+
+class Daemon:
+    """
+    Runs the syncs of many accounts in one process. Accounts run on a pool of
+    `max_workers` threads, sharing one connection pool and the schemas loaded
+    at startup. Due accounts are started longest-waiting first, and each
+    account is synced again `interval` seconds after its previous run started.
+    With `profile_dir`, each account's run is profiled on its own thread.
+    """
+    def __init__(self, daemon_config):
+        self.max_workers = int(daemon_config.get('max_workers') or DEFAULT_MAX_WORKERS)
+        self.interval = float(daemon_config.get('interval', DEFAULT_INTERVAL))
+        requests_per_second = float(daemon_config.get('requests_per_second') or DEFAULT_REQUESTS_PER_SECOND)
+        self.accounts = [Account(account_config, requests_per_second)
+                         for account_config in daemon_config['accounts']]
+        self.scheduler = FairScheduler(int(daemon_config.get('max_concurrent_requests') or self.max_workers))
+        self.adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.profile_dir = daemon_config.get('profile_dir')
+        # The tap's stream schemas, parsed once and shared by the catalogs of every run
+        self.schemas = {}
+        self.stopping = threading.Event()
+        self.__lock = threading.Lock()
+
+    def stop(self):
+        """Stop scheduling runs, running syncs stop at their next safe point."""
+        LOGGER.info('Daemon - stopping')
+        self.stopping.set()
+        with self.__lock:
+            for account in self.accounts:
+                if account.client is not None:
+                    account.client.deadline = 0
+
+    def load_catalog(self, path):
+        """
+        The catalog of an account, its selection and metadata with the shared
+        schemas of the tap's streams in place of its own copies.
+        """
+        catalog_dict = load_json(path)
+        streams = [{**stream, 'schema': {}} if stream['tap_stream_id'] in self.schemas else stream
+                   for stream in catalog_dict['streams']]
+        catalog = singer.Catalog.from_dict({**catalog_dict, 'streams': streams})
+        for stream in catalog.streams:
+            if stream.tap_stream_id in self.schemas:
+                stream.schema = self.schemas[stream.tap_stream_id]
+        return catalog
+
+    def sync_account(self, account, stdout):
+        config = load_json(account.config_path)
+        state = load_json(account.state_path, {})
+        output_path = os.path.join(account.output_dir, '{}-{}.jsonl'.format(
+            account.name, time.strftime('%Y%m%dT%H%M%S')))
+        os.makedirs(account.output_dir, exist_ok=True)
+
+        LOGGER.info('Daemon - %s - starting sync to %s', account.name, output_path)
+        with open(output_path, 'w', encoding='UTF-8') as output, \
+                MailchimpClient(config,
+                                adapter=self.adapter,
+                                throttle=lambda: self.scheduler.slot(account.rate_limiter)) as client:
+            with self.__lock:
+                account.client = client
+                if self.stopping.is_set():
+                    client.deadline = 0
+            stdout.set_target(output)
+            try:
+                catalog = self.load_catalog(account.catalog_path)
+                with profiled(self.profile_dir, 'sync-{}'.format(account.name)):
+                    sync(client, catalog, state, config['start_date'])
+            finally:
+                stdout.set_target(None)
+                with self.__lock:
+                    account.client = None
+                # The state holds every bookmark written so far, also when the sync failed
+                write_json(account.state_path, state)
+        LOGGER.info('Daemon - %s - finished sync', account.name)
+
+    def run(self, once=False):
+        self.schemas = {stream_name: Schema.from_dict(schema)
+                        for stream_name, schema in get_schemas()[0].items()}
+        stdout = ThreadLocalStdout(sys.stdout)
+        sys.stdout = stdout
+        try:
+            self.__run(stdout, once)
+        finally:
+            sys.stdout = stdout.default
+
+    def __run(self, stdout, once):
+        running = {}
+        pending = list(self.accounts)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='account') as executor:
+            try:
+                while not self.stopping.is_set() and (pending or running or not once):
+                    now = time.monotonic()
+                    due = sorted((account for account in pending if account.next_run <= now),
+                                 key=lambda account: account.next_run)
+                    for account in due[:self.max_workers - len(running)]:
+                        pending.remove(account)
+                        account.next_run = now + self.interval
+                        running[executor.submit(self.sync_account, account, stdout)] = account
+
+                    next_due = min((account.next_run for account in pending), default=now + self.interval)
+                    timeout = max(next_due - time.monotonic(), 0.1)
+                    if not running:
+                        self.stopping.wait(timeout)
+                        continue
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        account = running.pop(future)
+                        if future.exception():
+                            LOGGER.error('Daemon - %s - sync failed: %s', account.name, future.exception())
+                        if not once:
+                            pending.append(account)
+            except KeyboardInterrupt:
+                # Let the running syncs write their state before the pool shuts down
+                self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync many Mailchimp accounts in one long-running process')
+    parser.add_argument('-c', '--config', required=True, help='Daemon config file')
+    parser.add_argument('--once', action='store_true', help='Sync every account once, then exit')
+    args = parser.parse_args()
+
+    daemon_config = load_json(args.config)
+    daemon = Daemon(daemon_config)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    daemon.run(once=args.once)
@@ -1,9 +1,11 @@
 import copy
+
 import singer
 from singer.catalog import Catalog, CatalogEntry, Schema
 
 from tap_mailchimp.schema import get_schemas, STREAMS
 from tap_mailchimp.client import MailchimpForbiddenError
+from tap_mailchimp.cache import read_cache, write_cache
 
 LOGGER = singer.get_logger()
 
@@ -21,26 +23,43 @@ CHILD_PARENT_MAP = {
     if stream_obj.get('parent_stream')
 }
 
+def _has_access(client, stream_name: str) -> bool:
+    """Probe a single parent stream, returning False when it responds with a 403."""
+    try:
+        client.get(PARENT_STREAM_PATHS[stream_name], params={'count': 1}, endpoint=stream_name)
+    except MailchimpForbiddenError as exc:
+        LOGGER.warning(
+            "Excluding unauthorized stream '%s' from catalog. HTTP-Error-Message: '%s'",
+            stream_name,
+            str(exc),
+        )
+        return False
+    return True
+
+
 def _apply_access_checks(client, schemas: dict, field_metadata: dict) -> None:
     """
     Probe each parent stream for read access and remove inaccessible streams
     (and their children) from schemas and field_metadata in place.
+    The probes run concurrently.
     """
-    inaccessible_streams = []
+    stream_names = [stream_name for stream_name in PARENT_STREAM_PATHS if stream_name in schemas]
 
-    for stream_name, endpoint_path in PARENT_STREAM_PATHS.items():
-        if stream_name not in schemas:
-            continue
-
-        try:
-            client.get(endpoint_path, params={'count': 1}, endpoint=stream_name)
-        except MailchimpForbiddenError as exc:
-            LOGGER.warning(
-                "Excluding unauthorized stream '%s' from catalog. HTTP-Error-Message: '%s'",
-                stream_name,
-                str(exc),
-            )
-            inaccessible_streams.append(stream_name)
+    # Resolve the OAuth api_endpoint once, rather than once per concurrent probe
+    if stream_names and client.base_url is None:
+        client.get_base_url()
+
+    inaccessible_streams = []
+    if stream_names:
+        # Imported here as the thread pool is only needed for discovery
+        from concurrent.futures import ThreadPoolExecutor # pylint: disable=import-outside-toplevel
+        with ThreadPoolExecutor(max_workers=len(stream_names)) as executor:
+            results = executor.map(lambda stream_name: _has_access(client, stream_name), stream_names)
+            inaccessible_streams = [
+                stream_name
+                for stream_name, has_access in zip(stream_names, results)
+                if not has_access
+            ]
 
     for stream_name in inaccessible_streams:
         schemas.pop(stream_name, None)
@@ -84,7 +103,24 @@ def discover(client) -> Catalog:
     """
     Run discovery and return a catalog.
     Streams the credentials cannot access are excluded from the returned catalog.
+    When `cache_dir` is configured, a catalog discovered within `cache_ttl`
+    seconds with the same credentials is returned without probing the API.
     """
+    if client.cache_dir:
+        cached_catalog = read_cache(client.cache_dir, 'catalog', client.cache_key, client.cache_ttl)
+        if cached_catalog:
+            LOGGER.info('Using cached discovery result')
+            return Catalog.from_dict(cached_catalog)
+
+    catalog = _discover(client)
+
+    if client.cache_dir:
+        write_cache(client.cache_dir, 'catalog', client.cache_key, catalog.to_dict())
+
+    return catalog
+
+
+def _discover(client) -> Catalog:
     schemas, field_metadata = get_schemas()
 
     # Avoid mutating the module-level schema/metadata cache.
@@ -0,0 +1,78 @@
+import os
+import tempfile
+
+# Ids are kept in memory until they take up this many bytes, then spilled to disk
+MAX_MEMORY_BYTES = 4 * 1024 * 1024 # 4 MB
+
+SEPARATOR = b'\n'
+
+class IdStore:
+    """Append-only store of parent record ids.
+
+    Ids are packed as newline separated UTF-8 bytes in a single bytearray
+    instead of a list of Python strings. Once the buffer grows past
+    `max_memory_bytes` it is flushed to an anonymous temporary file, so the
+    resident size stays bounded regardless of the number of ids. Iteration is
+    lazy and yields the ids as strings in insertion order.
+    """
+    def __init__(self, ids=None, max_memory_bytes=MAX_MEMORY_BYTES):
+        self.__buffer = bytearray()
+        self.__file = None
+        self.__count = 0
+        self.__max_memory_bytes = max_memory_bytes
+        if ids:
+            for _id in ids:
+                self.append(_id)
+
+    def append(self, _id):
+        self.__buffer += str(_id).encode('utf-8')
+        self.__buffer += SEPARATOR
+        self.__count += 1
+        if len(self.__buffer) > self.__max_memory_bytes:
+            self.__spill()
+
+    def __spill(self):
+        if self.__file is None:
+            self.__file = tempfile.TemporaryFile() # pylint: disable=consider-using-with
+        self.__file.seek(0, os.SEEK_END)
+        self.__file.write(self.__buffer)
+        self.__buffer = bytearray()
+
+    @property
+    def spilled(self):
+        return self.__file is not None
+
+    def __len__(self):
+        return self.__count
+
+    def __bool__(self):
+        return self.__count > 0
+
+    def __iter__(self):
+        if self.__file is not None:
+            # Remember the spilled size so ids appended while iterating are
+            # read from the buffer rather than twice from the file
+            self.__file.seek(0, os.SEEK_END)
+            spilled_size = self.__file.tell()
+            position = 0
+            while position < spilled_size:
+                self.__file.seek(position)
+                line = self.__file.readline()
+                position += len(line)
+                yield line[:-1].decode('utf-8')
+        # Read in place, one id at a time, without copying the buffer
+        buffer = self.__buffer
+        position = 0
+        while True:
+            end = buffer.find(SEPARATOR, position)
+            if end == -1:
+                return
+            yield buffer[position:end].decode('utf-8')
+            position = end + 1
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+        self.__buffer = bytearray()
+        self.__count = 0
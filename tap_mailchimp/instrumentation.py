@@ -0,0 +1,111 @@
+import time
+import threading
+from contextlib import contextmanager
+
+import singer
+from singer import metrics
+
+LOGGER = singer.get_logger()
+
+DEFAULT_METRICS_INTERVAL = 60 # seconds
+
+# Hot-path stages timed during a sync
+HTTP_WAIT = 'http_wait'
+JSON_DECODE = 'json_decode'
+FLATTEN = 'flatten'
+TRANSFORM = 'transform'
+WRITE = 'write'
+BATCH_POLL_SLEEP = 'batch_poll_sleep'
+ARCHIVE_DOWNLOAD = 'archive_download'
+
+class StageMetrics:
+    """
+    Aggregates the time spent and number of calls per (stream, stage).
+
+    Adding a measurement is a dict update under a lock, callers time their
+    own work with time.perf_counter() and report it in bulk where possible
+    (e.g. once per page). Every `interval` seconds the increments are logged
+    as Singer metric messages, and `log_summary` logs the run totals.
+    """
+    def __init__(self, interval=DEFAULT_METRICS_INTERVAL):
+        self.__lock = threading.Lock()
+        self.interval = interval
+        self.totals = {}
+        self.__pending = {}
+        self.__last_emit = time.monotonic()
+
+    def reset(self, interval=DEFAULT_METRICS_INTERVAL):
+        with self.__lock:
+            self.interval = interval
+            self.totals = {}
+            self.__pending = {}
+            self.__last_emit = time.monotonic()
+
+    def add(self, stream, stage, seconds, count=1):
+        key = (stream, stage)
+        with self.__lock:
+            for stats in (self.totals, self.__pending):
+                current = stats.get(key)
+                if current is None:
+                    stats[key] = [seconds, count]
+                else:
+                    current[0] += seconds
+                    current[1] += count
+            due = time.monotonic() - self.__last_emit >= self.interval
+        if due:
+            self.emit()
+
+    @contextmanager
+    def timer(self, stream, stage, count=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stream, stage, time.perf_counter() - start, count)
+
+    def emit(self):
+        """Log the increments since the last emission as Singer metric messages."""
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+            self.__last_emit = time.monotonic()
+        for (stream, stage), (seconds, count) in sorted(pending.items(), key=lambda item: str(item[0])):
+            metrics.log(LOGGER, metrics.Point('timer',
+                                              'stage_duration',
+                                              seconds,
+                                              {'endpoint': stream, 'stage': stage, 'count': count}))
+
+    def log_summary(self):
+        """Log a table of the time spent per stream and stage during the run."""
+        self.emit()
+        with self.__lock:
+            totals = sorted(self.totals.items(), key=lambda item: -item[1][0])
+        if not totals:
+            return
+        total_seconds = sum(seconds for _, (seconds, _) in totals) or 1
+        LOGGER.info('Stage summary:')
+        LOGGER.info('%-30s %-18s %12s %12s %7s', 'stream', 'stage', 'seconds', 'count', '%')
+        for (stream, stage), (seconds, count) in totals:
+            LOGGER.info('%-30s %-18s %12.3f %12d %6.1f%%',
+                        stream, stage, seconds, count, 100.0 * seconds / total_seconds)
+
+# StageMetrics of the sync running on each thread, see `recording`
+_LOCAL = threading.local()
+# Measurements taken outside of a sync
+UNBOUND_METRICS = StageMetrics()
+
+@contextmanager
+def recording(stage_metrics):
+    """
+    Time the work of the current thread's sync into `stage_metrics`. The
+    worker threads of a run time their requests through the client's
+    `stage_metrics`, the same instance, so the run's totals include them
+    while the accounts synced side by side in daemon mode stay separate.
+    """
+    _LOCAL.stage_metrics = stage_metrics
+    try:
+        yield stage_metrics
+    finally:
+        _LOCAL.stage_metrics = None
+
+def current_metrics():
+    return getattr(_LOCAL, 'stage_metrics', None) or UNBOUND_METRICS
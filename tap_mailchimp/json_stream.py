@@ -0,0 +1,98 @@
+import re
+import json
+import codecs
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+DECODER = json.JSONDecoder()
+
+class JsonStream:
+    """
+    Incremental reader of a JSON document arriving in chunks of bytes. Values
+    are decoded with the C accelerated json scanner once the buffer holds them
+    entirely, consumed text is dropped from the buffer as more is read.
+    """
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def read_more(self, min_chars=1):
+        """Append at least `min_chars` characters to the buffer, False once the input is exhausted."""
+        if self.exhausted:
+            return False
+        parts = [self.buffer[self.pos:]]
+        read = 0
+        while read < min_chars:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                parts.append(self.decoder.decode(b'', final=True))
+                self.exhausted = True
+                break
+            text = self.decoder.decode(chunk)
+            parts.append(text)
+            read += len(text)
+        self.buffer = ''.join(parts)
+        self.pos = 0
+        return read > 0 or len(parts[-1]) > 0
+
+    def peek(self):
+        """Next non-whitespace character, '' at the end of the input."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError('Invalid JSON: expected {!r}, got {!r}'.format(chars, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value, at least double the pending text so a large
+                # value is not decoded again for every chunk
+                if not self.read_more(max(len(self.buffer) - self.pos, 1)):
+                    raise
+                continue
+            # A number ending the buffer may continue in the next chunk
+            if end == len(self.buffer) and self.read_more():
+                continue
+            self.pos = end
+            return value
+
+def iter_items(chunks, key):
+    """
+    Yield the items of the array under `key` in a JSON object arriving in
+    `chunks` of bytes, one at a time as they arrive. The other members of the
+    object are decoded and dropped.
+    """
+    stream = JsonStream(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.expect(',]') == ']':
+                        break
+        else:
+            stream.value()
+        if stream.expect(',}') == '}':
+            return
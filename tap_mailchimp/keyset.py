@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from singer.utils import strptime_to_utc
+
+# Beyond this many records sharing the boundary timestamp (a bulk import) the
+# bookmark keeps their count instead of their ids
+MAX_TIE_IDS = 1000
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S+00:00'
+
+def format_datetime(value):
+    return value.strftime(DATETIME_FORMAT)
+
+class KeysetCursor:
+    """
+    Position of an endpoint requested in ascending order of `field`, a
+    timestamp, as a bookmark that is safe to resume from at any page:
+
+      {"datetime": "2020-01-01T00:10:00+00:00", "tie_ids": ["a1", "b2"]}
+
+    Every record changed before `datetime` has been synced, and so have the
+    records changed at `datetime` listed in `tie_ids`. Each page is requested
+    from the boundary again, records already synced are dropped, and the
+    boundary moves to the last timestamp of the page. A page made only of
+    records at the boundary is walked through by offset instead, when more
+    than MAX_TIE_IDS of them have been synced the bookmark keeps that offset
+    as `tie_offset` in place of their ids.
+    """
+    def __init__(self, field, bookmark, start_date):
+        self.field = field
+        # Same format as the records' timestamps, so they compare as strings
+        self.boundary = format_datetime(strptime_to_utc(bookmark.get('datetime', start_date)))
+        self.tie_ids = set(bookmark.get('tie_ids', []))
+        self.offset = bookmark.get('tie_offset', 0)
+        # Resuming from a `tie_offset`, the ids of the ties before it are unknown
+        self.tie_ids_complete = 'tie_offset' not in bookmark
+        self.page_last = None
+        self.page_ties = set()
+
+    def query_since(self):
+        """Value of the since query parameter, a second early in case it excludes the boundary itself."""
+        return format_datetime(strptime_to_utc(self.boundary) - timedelta(seconds=1))
+
+    def filter(self, records):
+        """Yield the records of a page not synced yet, noting the ids at its last timestamp."""
+        self.page_last = None
+        self.page_ties = set()
+        for record in records:
+            value = record[self.field]
+            if value != self.page_last:
+                self.page_last = value
+                self.page_ties = set()
+            self.page_ties.add(record['id'])
+            if value < self.boundary or (value == self.boundary and record['id'] in self.tie_ids):
+                continue
+            yield record
+
+    def advance(self, page_records):
+        """Move past a page of `page_records` records, once every record of it is processed."""
+        if self.page_last is not None and self.page_last > self.boundary:
+            self.boundary = self.page_last
+            self.tie_ids = self.page_ties
+            self.tie_ids_complete = True
+            self.offset = 0
+        else:
+            # Nothing past the boundary on this page, the next one is further down the ties
+            if self.page_last == self.boundary and self.tie_ids_complete:
+                self.tie_ids |= self.page_ties
+                # Too many to keep, only the offset locates the next ties from now on
+                self.tie_ids_complete = len(self.tie_ids) <= MAX_TIE_IDS
+            self.offset += page_records
+
+    def bookmark(self):
+        if not self.tie_ids_complete:
+            return {'datetime': self.boundary, 'tie_offset': self.offset}
+        return {'datetime': self.boundary, 'tie_ids': sorted(self.tie_ids)}
@@ -0,0 +1,188 @@
+import os
+import copy
+import gzip
+import time
+import threading
+from contextlib import contextmanager
+
+import simplejson as json
+import singer
+
+LOGGER = singer.get_logger()
+
+DEFAULT_BATCH_SIZE = 100000 # records per file
+DEFAULT_ROW_GROUP_SIZE = 50000 # rows per Parquet row group
+
+BATCH_FORMATS = ('jsonl', 'parquet')
+
+class BatchMessage(singer.Message):
+    """
+    Singer BATCH message, referencing files of records instead of carrying them:
+
+      {"type": "BATCH", "stream": "list_members",
+       "encoding": {"format": "jsonl", "compression": "gzip"},
+       "manifest": ["file:///data/batches/list_members-...-00001.jsonl.gz"]}
+    """
+    def __init__(self, stream, manifest, encoding=None):
+        self.stream = stream
+        self.manifest = manifest
+        self.encoding = encoding or {'format': 'jsonl', 'compression': 'gzip'}
+
+    def asdict(self):
+        return {
+            'type': 'BATCH',
+            'stream': self.stream,
+            'encoding': self.encoding,
+            'manifest': self.manifest,
+        }
+
+class StdoutWriter:
+    """Default output: one RECORD message per record on stdout."""
+    # Writers transforming whole pages of records themselves, see TransformPoolWriter
+    pooled = False
+
+    def write_schema(self, stream_name, schema, key_properties):
+        singer.write_schema(stream_name, schema, key_properties)
+
+    def write_record(self, stream_name, record):
+        singer.write_record(stream_name, record)
+
+    def write_state(self, state):
+        singer.write_state(state)
+
+    def close(self):
+        pass
+
+class BatchWriter:
+    """
+    Writes the records of `streams` (every stream when None) to gzip compressed
+    JSONL files in `batch_dir`, one record per line. A file is closed after
+    `batch_size` records, and a BATCH message referencing it is emitted.
+
+    A STATE message must never get ahead of the records it covers, so while
+    any file holds records it is held back. Whenever a file is rotated every
+    open file is closed with it and the latest held back state is emitted
+    after their BATCH messages.
+
+    Subclasses write other file formats by overriding `extension`, `encoding`
+    and the open_file/write_to_file/close_file hooks.
+    """
+    extension = '.jsonl.gz'
+    encoding = {'format': 'jsonl', 'compression': 'gzip'}
+    pooled = False
+
+    def __init__(self, batch_dir, streams=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_dir = batch_dir
+        self.streams = set(streams) if streams else None
+        self.batch_size = batch_size
+        self.run_name = 'sync-{}'.format(time.strftime('%Y%m%dT%H%M%S'))
+        self.schemas = {}
+        self.files = {}
+        self.file_count = 0
+        self.pending_state = None
+        os.makedirs(batch_dir, exist_ok=True)
+
+    def write_schema(self, stream_name, schema, key_properties):
+        self.schemas[stream_name] = schema
+        singer.write_schema(stream_name, schema, key_properties)
+
+    def open_file(self, stream_name, path):
+        return gzip.open(path, 'wt', compresslevel=1, encoding='UTF-8')
+
+    def write_to_file(self, stream_name, file, record):
+        file.write(json.dumps(record, use_decimal=True) + '\n')
+
+    def close_file(self, stream_name, file):
+        file.close()
+
+    def write_record(self, stream_name, record):
+        if self.streams is not None and stream_name not in self.streams:
+            singer.write_record(stream_name, record)
+            return
+
+        batch_file = self.files.get(stream_name)
+        if batch_file is None:
+            self.file_count += 1
+            path = os.path.join(self.batch_dir, '{}-{}-{:05d}{}'.format(
+                stream_name, self.run_name, self.file_count, self.extension))
+            batch_file = self.files[stream_name] = {
+                'path': path,
+                'file': self.open_file(stream_name, path),
+                'records': 0,
+            }
+
+        self.write_to_file(stream_name, batch_file['file'], record)
+        batch_file['records'] += 1
+        if batch_file['records'] >= self.batch_size:
+            self.flush()
+
+    def write_state(self, state):
+        if self.files:
+            # The state is still being updated by the sync, keep it as it is now
+            self.pending_state = copy.deepcopy(state)
+        else:
+            singer.write_state(state)
+
+    def flush(self):
+        """Close every open file, emit their BATCH messages, then the held back state."""
+        for stream_name, batch_file in sorted(self.files.items()):
+            self.close_file(stream_name, batch_file['file'])
+            LOGGER.info('%s - Wrote %s records to %s', stream_name, batch_file['records'], batch_file['path'])
+            singer.write_message(BatchMessage(stream_name,
+                                              ['file://' + os.path.abspath(batch_file['path'])],
+                                              self.encoding))
+        self.files = {}
+
+        if self.pending_state is not None:
+            singer.write_state(self.pending_state)
+            self.pending_state = None
+
+    def close(self):
+        self.flush()
+
+# Writer of the sync running in the current thread, see `writing`
+_LOCAL = threading.local()
+
+def get_writer(client):
+    if not client.batch_dir:
+        if client.transform_workers:
+            from tap_mailchimp.transform_pool import TransformPoolWriter # pylint: disable=import-outside-toplevel
+            return TransformPoolWriter(client.transform_workers)
+        return StdoutWriter()
+    if client.batch_format == 'parquet':
+        # pyarrow is optional, only imported when Parquet output is used
+        from tap_mailchimp.parquet import ParquetBatchWriter # pylint: disable=import-outside-toplevel
+        return ParquetBatchWriter(client.batch_dir, client.batch_streams, client.batch_size,
+                                  client.row_group_size)
+    return BatchWriter(client.batch_dir, client.batch_streams, client.batch_size)
+
+@contextmanager
+def writing(writer, encode_state=None):
+    """
+    Send the records and states of the current thread's sync to `writer`,
+    the states as returned by `encode_state` when given.
+    """
+    _LOCAL.writer = writer
+    _LOCAL.encode_state = encode_state
+    try:
+        yield writer
+    finally:
+        _LOCAL.writer = None
+        _LOCAL.encode_state = None
+        writer.close()
+
+def current_writer():
+    writer = getattr(_LOCAL, 'writer', None)
+    return writer if writer is not None else STDOUT_WRITER
+
+def write_schema(stream_name, schema, key_properties):
+    current_writer().write_schema(stream_name, schema, key_properties)
+
+def write_record(stream_name, record):
+    current_writer().write_record(stream_name, record)
+
+def write_state(state):
+    encode_state = getattr(_LOCAL, 'encode_state', None)
+    current_writer().write_state(encode_state(state) if encode_state else state)
+
+STDOUT_WRITER = StdoutWriter()
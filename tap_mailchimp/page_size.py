@@ -0,0 +1,48 @@
+import singer
+
+LOGGER = singer.get_logger()
+
+DEFAULT_TARGET_PAGE_LATENCY = 5 # seconds
+MIN_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000 # the maximum `count` accepted by the Mailchimp API
+MAX_RESPONSE_BYTES = 20 * 1024 * 1024 # 20 MB
+# Limit the change of the page size after a single page
+MIN_GROWTH = 0.5
+MAX_GROWTH = 2.0
+
+class PageSizeController:
+    """
+    Chooses the `count` of an endpoint's next page from the previous pages.
+
+    After each full page the size is scaled towards `target_latency` seconds
+    per page, by at most MIN_GROWTH/MAX_GROWTH at a time, and capped so a
+    response stays under MAX_RESPONSE_BYTES at the observed bytes per record.
+    A timeout halves the page size so the same offset is requested again
+    with a smaller page instead of retrying the oversized request.
+    """
+    def __init__(self, page_size, target_latency=DEFAULT_TARGET_PAGE_LATENCY,
+                 min_page_size=MIN_PAGE_SIZE, max_page_size=MAX_PAGE_SIZE):
+        self.target_latency = target_latency
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.page_size = self.clamp(page_size)
+
+    def clamp(self, page_size):
+        return max(self.min_page_size, min(self.max_page_size, int(page_size)))
+
+    def observe(self, records, latency, response_bytes=None):
+        # A short (last) page says little about the cost of a full one
+        if records < self.page_size:
+            return
+        growth = self.target_latency / max(latency, 0.001)
+        page_size = self.page_size * min(MAX_GROWTH, max(MIN_GROWTH, growth))
+        if response_bytes:
+            page_size = min(page_size, MAX_RESPONSE_BYTES * records / response_bytes)
+        self.page_size = self.clamp(page_size)
+
+    def shrink(self):
+        """Halve the page size after a timeout, False when it is already the smallest."""
+        if self.page_size <= self.min_page_size:
+            return False
+        self.page_size = self.clamp(self.page_size // 2)
+        return True
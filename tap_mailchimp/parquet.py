@@ -0,0 +1,119 @@
+import simplejson as json
+from singer.utils import strptime_to_utc
+
+from tap_mailchimp.output import BatchWriter, DEFAULT_BATCH_SIZE, DEFAULT_ROW_GROUP_SIZE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as exc:
+    raise ImportError('batch_format "parquet" requires pyarrow, install it with `pip install pyarrow`') from exc
+
+def identity(value):
+    return value
+
+def to_json(value):
+    return None if value is None else json.dumps(value, use_decimal=True)
+
+def to_float(value):
+    return None if value is None else float(value)
+
+def to_timestamp(value):
+    return None if value is None else strptime_to_utc(value)
+
+def get_column(schema):
+    """
+    Arrow type of a JSON schema and the function converting a transformed
+    record value to it. Every column is nullable, the ["null", ...] unions only
+    add null to the other types. Objects without properties and unions of
+    several types are kept as JSON strings.
+    """
+    json_types = schema.get('type', [])
+    if isinstance(json_types, str):
+        json_types = [json_types]
+    json_types = [json_type for json_type in json_types if json_type != 'null']
+
+    if len(json_types) != 1:
+        return pa.string(), to_json
+    json_type = json_types[0]
+
+    if json_type == 'string':
+        if schema.get('format') == 'date-time':
+            return pa.timestamp('us', tz='UTC'), to_timestamp
+        return pa.string(), identity
+    if json_type == 'integer':
+        return pa.int64(), identity
+    if json_type == 'number':
+        return pa.float64(), to_float
+    if json_type == 'boolean':
+        return pa.bool_(), identity
+    if json_type == 'object' and schema.get('properties'):
+        return get_struct(schema['properties'])
+    if json_type == 'array' and schema.get('items'):
+        item_type, convert_item = get_column(schema['items'])
+        return pa.list_(item_type), lambda value: None if value is None else [convert_item(item) for item in value]
+    return pa.string(), to_json
+
+def get_struct(properties):
+    names = sorted(properties)
+    columns = [get_column(properties[name]) for name in names]
+    arrow_type = pa.struct([pa.field(name, arrow_type) for name, (arrow_type, _) in zip(names, columns)])
+    converters = [(name, convert) for name, (_, convert) in zip(names, columns)]
+
+    def convert(value):
+        if value is None:
+            return None
+        return {name: convert_field(value.get(name)) for name, convert_field in converters}
+    return arrow_type, convert
+
+def get_arrow_schema(schema):
+    """Arrow schema of a stream and the function converting its records to rows."""
+    struct_type, convert = get_struct(schema.get('properties', {}))
+    return pa.schema(list(struct_type)), convert
+
+class ParquetFile:
+    def __init__(self, path, arrow_schema, convert, row_group_size):
+        self.arrow_schema = arrow_schema
+        self.convert = convert
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.writer = pq.ParquetWriter(path, arrow_schema, compression='snappy')
+
+    def write(self, record):
+        self.rows.append(self.convert(record))
+        if len(self.rows) >= self.row_group_size:
+            self.write_row_group()
+
+    def write_row_group(self):
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=self.arrow_schema),
+                                    row_group_size=self.row_group_size)
+            self.rows = []
+
+    def close(self):
+        self.write_row_group()
+        self.writer.close()
+
+class ParquetBatchWriter(BatchWriter):
+    """
+    Writes the records to Parquet files, typed from the stream JSON schemas.
+    Rows are buffered and converted to Arrow in row groups of at most
+    `row_group_size` rows.
+    """
+    extension = '.parquet'
+    encoding = {'format': 'parquet', 'compression': 'snappy'}
+
+    def __init__(self, batch_dir, streams=None, batch_size=DEFAULT_BATCH_SIZE,
+                 row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        super().__init__(batch_dir, streams, batch_size)
+        self.row_group_size = row_group_size
+        self.arrow_schemas = {}
+
+    def open_file(self, stream_name, path):
+        if stream_name not in self.arrow_schemas:
+            self.arrow_schemas[stream_name] = get_arrow_schema(self.schemas[stream_name])
+        arrow_schema, convert = self.arrow_schemas[stream_name]
+        return ParquetFile(path, arrow_schema, convert, self.row_group_size)
+
+    def write_to_file(self, stream_name, file, record):
+        file.write(record)
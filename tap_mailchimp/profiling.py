@@ -0,0 +1,109 @@
+import io
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Number of frames kept per tracemalloc allocation
+TRACEMALLOC_FRAMES = 10
+
+# Profiler of the current thread's run, set while a profiled sync is running
+_LOCAL = threading.local()
+# tracemalloc is process wide, it traces while any run is profiled
+_TRACING_LOCK = threading.Lock()
+_TRACING_RUNS = 0
+
+class Profiler:
+    """
+    Runs code under cProfile and tracemalloc and writes the results to `profile_dir`:
+
+      - <run>.prof: cProfile stats, readable with pstats or snakeviz
+      - <run>.txt: the top functions by cumulative time
+      - <run>-<n>-<label>.snapshot: tracemalloc snapshots taken at stream boundaries
+
+    cProfile only sees the thread that started it. The memory snapshots cover
+    the whole process, including the other runs of a daemon profiled at the
+    same time.
+
+    cProfile, pstats and tracemalloc are only imported by a Profiler, so
+    runs without `profile_dir` do not pay for them.
+    """
+    def __init__(self, profile_dir, name='sync'):
+        import cProfile # pylint: disable=import-outside-toplevel
+
+        self.profile_dir = profile_dir
+        self.run_name = '{}-{}'.format(name, time.strftime('%Y%m%dT%H%M%S'))
+        self.snapshot_count = 0
+        self.__profile = cProfile.Profile()
+
+    def get_path(self, suffix):
+        return os.path.join(self.profile_dir, self.run_name + suffix)
+
+    def start(self):
+        global _TRACING_RUNS # pylint: disable=global-statement
+        import tracemalloc # pylint: disable=import-outside-toplevel
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with _TRACING_LOCK:
+            if not _TRACING_RUNS:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            _TRACING_RUNS += 1
+        self.__profile.enable()
+
+    def snapshot(self, label):
+        import tracemalloc # pylint: disable=import-outside-toplevel
+
+        self.snapshot_count += 1
+        path = self.get_path('-{:04d}-{}.snapshot'.format(self.snapshot_count, label))
+        tracemalloc.take_snapshot().dump(path)
+        current, peak = tracemalloc.get_traced_memory()
+        LOGGER.info('Profiling - memory snapshot %s: current %.1f MB, peak %.1f MB',
+                    path, current / 2 ** 20, peak / 2 ** 20)
+
+    def stop(self):
+        global _TRACING_RUNS # pylint: disable=global-statement
+        import pstats # pylint: disable=import-outside-toplevel
+        import tracemalloc # pylint: disable=import-outside-toplevel
+
+        self.__profile.disable()
+        self.snapshot('end')
+        with _TRACING_LOCK:
+            _TRACING_RUNS -= 1
+            if not _TRACING_RUNS:
+                tracemalloc.stop()
+
+        self.__profile.dump_stats(self.get_path('.prof'))
+        summary = io.StringIO()
+        pstats.Stats(self.__profile, stream=summary).sort_stats('cumulative').print_stats(50)
+        with open(self.get_path('.txt'), 'w', encoding='UTF-8') as file:
+            file.write(summary.getvalue())
+        LOGGER.info('Profiling - wrote CPU profile to %s', self.get_path('.prof'))
+
+@contextmanager
+def profiled(profile_dir, name='sync'):
+    """Profile the current thread in the body of the `with` block when `profile_dir` is set."""
+    if not profile_dir:
+        yield
+        return
+
+    profiler = Profiler(profile_dir, name)
+    profiler.start()
+    _LOCAL.profiler = profiler
+    try:
+        yield
+    finally:
+        _LOCAL.profiler = None
+        profiler.stop()
+
+def active_profiler():
+    return getattr(_LOCAL, 'profiler', None)
+
+def snapshot(label):
+    """Take a tracemalloc snapshot when profiling, no-op otherwise."""
+    profiler = active_profiler()
+    if profiler:
+        profiler.snapshot(label)
@@ -1,10 +1,19 @@
 import os
 import json
+import hashlib
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
 from singer import metadata
 
 SCHEMAS = {}
 FIELD_METADATA = {}
 
+# Prebuilt schemas and standard metadata, generated at build time by setup.py and
+# stamped with the version of the package it was built for.
+# Bump BUNDLE_VERSION whenever the bundle layout or the metadata generation changes.
+BUNDLE_FILE = 'schema_bundle.json'
+BUNDLE_VERSION = 1
+
 STREAMS = {
     'automations': {
         'key_properties': ['id'],
@@ -56,19 +65,97 @@ def get_abs_path(path):
     """
     return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
 
+def get_schema_path(stream_name):
+    return get_abs_path("schemas/{}.json".format(stream_name))
+
+def get_bundle_path():
+    return get_abs_path(BUNDLE_FILE)
+
+def get_streams_digest():
+    """
+    Digest of the stream definitions the bundle was built from, so a bundle
+    left over from another version of the tap is not used.
+    """
+    return hashlib.sha256(json.dumps(STREAMS, sort_keys=True).encode('utf-8')).hexdigest()
+
+@lru_cache(maxsize=None)
+def get_package_version():
+    """Installed version of the tap, None when running from a source tree that is not installed."""
+    try:
+        return version('tap-mailchimp')
+    except PackageNotFoundError:
+        return None
+
+def get_schemas_digest():
+    """Digest of the contents of the schema files."""
+    digest = hashlib.sha256()
+    for stream_name in sorted(STREAMS):
+        with open(get_schema_path(stream_name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def build_bundle():
+    """Load the schema files, generate their metadata and return them as a bundle."""
+    schemas, field_metadata = load_schemas()
+    return {
+        'version': BUNDLE_VERSION,
+        'streams_digest': get_streams_digest(),
+        'package_version': get_package_version(),
+        'schemas': schemas,
+        'metadata': field_metadata,
+    }
+
+def write_bundle(path=None):
+    """Write the bundle to `path`, defaults to the bundle file of the package."""
+    path = path or get_bundle_path()
+    with open(path, 'w', encoding='UTF-8') as file:
+        json.dump(build_bundle(), file, separators=(',', ':'))
+    return path
+
+def load_bundle():
+    """
+    Return the prebuilt bundle, or None when it is missing or stale: built
+    for another package version or other stream definitions. The schema
+    files are not read, they only change with the package.
+    """
+    try:
+        with open(get_bundle_path(), encoding='UTF-8') as file:
+            bundle = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if bundle.get('version') != BUNDLE_VERSION or \
+       bundle.get('streams_digest') != get_streams_digest() or \
+       bundle.get('package_version') != get_package_version():
+        return None
+    return bundle
+
 def get_schemas():
     """Prepare metadata for each stream and return schema and metadata for the catalog."""
-    global SCHEMAS, FIELD_METADATA # pylint: disable=global-statement
-
     if SCHEMAS:
         return SCHEMAS, FIELD_METADATA
 
+    # Use the prebuilt bundle when available, it is a single read with no metadata generation
+    bundle = load_bundle()
+    if bundle:
+        schemas, field_metadata = bundle['schemas'], bundle['metadata']
+    else:
+        schemas, field_metadata = load_schemas()
+
+    SCHEMAS.update(schemas)
+    FIELD_METADATA.update(field_metadata)
+    return SCHEMAS, FIELD_METADATA
+
+def load_schemas():
+    """Load every schema file and generate its standard metadata."""
+    schemas = {}
+    field_metadata = {}
+
     for stream_name, stream_obj in STREAMS.items():
-        schema_path = get_abs_path("schemas/{}.json".format(stream_name))
-        with open(schema_path, encoding='UTF-8') as file:
+        with open(get_schema_path(stream_name), encoding='UTF-8') as file:
             schema = json.load(file)
 
-        SCHEMAS[stream_name] = schema
+        schemas[stream_name] = schema
 
         mdata = metadata.get_standard_metadata(
             schema=schema,
@@ -90,6 +177,6 @@ def get_schemas():
             mdata = metadata.write(mdata, (), 'parent-tap-stream-id', parent_tap_stream_id)
 
         mdata = metadata.to_list(mdata)
-        FIELD_METADATA[stream_name] = mdata
+        field_metadata[stream_name] = mdata
 
-    return SCHEMAS, FIELD_METADATA
+    return schemas, field_metadata
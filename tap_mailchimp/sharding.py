@@ -0,0 +1,88 @@
+import sys
+import json
+import zlib
+import argparse
+
+import singer
+from singer.utils import strptime_to_utc
+
+from tap_mailchimp.compaction import WATERMARK, decode_bookmarks, merge_watermarks
+
+LOGGER = singer.get_logger()
+
+# Progress of an in-flight run, only meaningful to the shard that wrote it
+SHARD_RUN_KEYS = ['current_stream', 'completed_streams']
+SHARD_RUN_BOOKMARKS = ['reports_email_activity_last_run_id', 'reports_email_activity_next_chunk']
+
+def get_shard(record_id, shard_count):
+    """Stable shard of an id, the same in every process (unlike hash())."""
+    return zlib.crc32(str(record_id).encode('utf-8')) % shard_count
+
+def in_shard(client, record_id):
+    if client.shard_count <= 1:
+        return True
+    return get_shard(record_id, client.shard_count) == client.shard_index
+
+def owns_unsharded_streams(client):
+    """Streams that are not split by id (e.g. automations) are synced by the first shard."""
+    return client.shard_index == 0
+
+def latest(value, other):
+    try:
+        return max(value, other, key=strptime_to_utc)
+    except (TypeError, ValueError):
+        return value
+
+def merge_bookmarks(merged, bookmarks):
+    for key, value in bookmarks.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merge_bookmarks(merged[key], value)
+        elif key in merged and merged[key] != value:
+            merged[key] = latest(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def merge_states(states):
+    """
+    Combine the states of the shards of one account into a single state.
+
+    Shards own disjoint list and campaign ids, so their per-id bookmarks are
+    merged as they are, a bookmark present in several states keeps the latest
+    datetime. The progress of an interrupted shard run (current stream, email
+    activity batch) cannot be resumed by another process and is dropped.
+    """
+    merged = {}
+    stream_durations = {}
+    watermarks = []
+    for index, state in enumerate(states):
+        decode_bookmarks(state)
+        if any(key in state for key in SHARD_RUN_KEYS):
+            LOGGER.warning('State of shard %s is from an interrupted run, its bookmarks are merged '
+                           'but the run is not resumed', index)
+        bookmarks = {key: value for key, value in state.get('bookmarks', {}).items()
+                     if key not in SHARD_RUN_BOOKMARKS and key != WATERMARK}
+        if state.get('bookmarks', {}).get(WATERMARK):
+            watermarks.append(state['bookmarks'][WATERMARK])
+        merge_bookmarks(merged.setdefault('bookmarks', {}), json.loads(json.dumps(bookmarks)))
+        for stream_name, duration in state.get('stream_durations', {}).items():
+            stream_durations[stream_name] = max(duration, stream_durations.get(stream_name, 0))
+    if watermarks:
+        # Each shard's cohorts are kept, their campaigns are not resumed from another shard's
+        merged.setdefault('bookmarks', {})[WATERMARK] = merge_watermarks(watermarks)
+    if stream_durations:
+        merged['stream_durations'] = stream_durations
+    return merged
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge the state files of sharded tap-mailchimp runs')
+    parser.add_argument('states', nargs='+', help='State files, one per shard')
+    args = parser.parse_args()
+
+    states = []
+    for path in args.states:
+        with open(path, encoding='UTF-8') as file:
+            states.append(json.load(file))
+
+    json.dump(merge_states(states), sys.stdout, indent=2)
+    sys.stdout.write('\n')
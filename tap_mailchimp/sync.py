@@ -1,12 +1,27 @@
 import json
 import time
+import queue
 import random
-import tarfile
+import threading
+from datetime import timedelta
+from functools import partial
+from itertools import islice
 
 import singer
 from singer import metrics, metadata, Transformer
-from singer.utils import strptime_to_utc, should_sync_field
-from requests.exceptions import HTTPError
+from singer.utils import strftime, strptime_to_utc, should_sync_field, now
+from requests.exceptions import HTTPError, Timeout, ChunkedEncodingError, ConnectionError # pylint: disable=redefined-builtin
+
+from tap_mailchimp import output, profiling
+from tap_mailchimp.sharding import in_shard, owns_unsharded_streams
+from tap_mailchimp.id_store import IdStore
+from tap_mailchimp.activity import get_flattener
+from tap_mailchimp.compaction import (apply_retention, decode_bookmarks, encode_bookmarks,
+                                      get_email_activity_bookmark, prune_bookmarks)
+from tap_mailchimp.keyset import KeysetCursor, format_datetime
+from tap_mailchimp.page_size import PageSizeController
+from tap_mailchimp.instrumentation import (ARCHIVE_DOWNLOAD, BATCH_POLL_SLEEP, FLATTEN, JSON_DECODE,
+                                           TRANSFORM, WRITE, current_metrics, recording)
 
 LOGGER = singer.get_logger()
 
@@ -14,43 +29,126 @@ MIN_RETRY_INTERVAL = 2 # 2 seconds
 MAX_RETRY_INTERVAL = 300 # 5 minutes
 MAX_RETRY_ELAPSED_TIME = 43200 # 12 hours
 
+# Subtracted from the end of the list_members windows, and from the run's start
+# standing for a finished status partition, when bookmarking them. Covers a
+# difference between the local clock and Mailchimp's
+WINDOW_END_MARGIN = timedelta(hours=1)
+
+# Added to the end of each list_members window when requesting it, so adjacent
+# windows overlap and a member changed on the second between them is in one of
+# them whether Mailchimp's bounds include that second or not
+WINDOW_OVERLAP = timedelta(seconds=1)
+
+# Statuses of the members returned by /lists/{id}/members without a status filter,
+# archived members are not
+LIST_MEMBER_STATUSES = ('subscribed', 'unsubscribed', 'cleaned', 'pending', 'transactional')
+
+# Segments whose members only change along with their fingerprint, fuzzy
+# segments can change with their members' activity
+FINGERPRINTED_SEGMENT_TYPES = ('static', 'saved')
+
+# Errors reading a page streamed with `stream_json` after its records started
+# being emitted, the page is requested again up to this many times
+STREAM_READ_ERRORS = (ChunkedEncodingError, ConnectionError, Timeout)
+STREAM_READ_MAX_TRIES = 5
+
 # Break up reports_email_activity batches to iterate over chunks
 EMAIL_ACTIVITY_BATCH_SIZE = 100
 
+class WrittenSchemas(threading.local):
+    """
+    Streams whose SCHEMA message has already been emitted during this run.
+    Kept per thread, daemon mode syncs each account in its own thread and
+    output.
+    """
+    def __init__(self):
+        super().__init__()
+        self.streams = set()
+
+    def __contains__(self, stream_name):
+        return stream_name in self.streams
+
+    def add(self, stream_name):
+        self.streams.add(stream_name)
+
+    def clear(self):
+        self.streams.clear()
+
+WRITTEN_SCHEMAS = WrittenSchemas()
+
 class BatchExpiredError(Exception):
     pass
 
+class TimeBudgetExceeded(Exception):
+    pass
+
+def check_time_budget(client):
+    """
+    Raise TimeBudgetExceeded once the client's `max_runtime_seconds` deadline
+    has passed. Only called at safe points, where the state written so far
+    lets the next run resume.
+    """
+    if client.deadline is not None and time.monotonic() >= client.deadline:
+        raise TimeBudgetExceeded('max_runtime_seconds elapsed')
+
 def next_sleep_interval(previous_sleep_interval):
     min_interval = previous_sleep_interval or MIN_RETRY_INTERVAL
     max_interval = previous_sleep_interval * 2 or MIN_RETRY_INTERVAL
     return min(MAX_RETRY_INTERVAL, random.randint(min_interval, max_interval))
 
 def write_schema(catalog, stream_name):
+    # Child streams are synced once per parent id, only emit their schema once
+    if stream_name in WRITTEN_SCHEMAS:
+        return
     stream = catalog.get_stream(stream_name)
     schema = stream.schema.to_dict()
-    singer.write_schema(stream_name, schema, stream.key_properties)
+    output.write_schema(stream_name, schema, stream.key_properties)
+    WRITTEN_SCHEMAS.add(stream_name)
 
 def process_records(catalog,
                     stream_name,
                     records,
                     persist=True,
                     bookmark_field=None,
-                    max_bookmark_field=None):
+                    max_bookmark_field=None,
+                    transformed=False):
     stream = catalog.get_stream(stream_name)
     schema = stream.schema.to_dict()
     stream_metadata = metadata.to_map(stream.metadata)
+    transform_time = write_time = 0.0
+    persisted = 0
+    writer = output.current_writer()
+    # Records already `transformed` are written as they are, or only serialized by the pool
+    pooled = persist and writer.pooled
+    page = []
     with metrics.record_counter(stream_name) as counter, Transformer() as transformer:
         for record in records:
             if bookmark_field:
                 if max_bookmark_field is None or \
                    record[bookmark_field] > max_bookmark_field:
                     max_bookmark_field = record[bookmark_field]
-            if persist:
-                record = transformer.transform(record,
-                                               schema,
-                                               stream_metadata)
-                singer.write_record(stream_name, record)
+            if pooled:
+                page.append(record)
+                counter.increment()
+            elif persist:
+                start = time.perf_counter()
+                if not transformed:
+                    record = transformer.transform(record,
+                                                   schema,
+                                                   stream_metadata)
+                transformed_at = time.perf_counter()
+                output.write_record(stream_name, record)
+                transform_time += transformed_at - start
+                write_time += time.perf_counter() - transformed_at
                 counter.increment()
+                persisted += 1
+        if page:
+            # Transformed and written in order by the worker pool, which also records their timings
+            writer.submit_page(stream_name, schema, stream_metadata, page, transformed=transformed)
+        if persisted:
+            if not transformed:
+                current_metrics().add(stream_name, TRANSFORM, transform_time, persisted)
+            current_metrics().add(stream_name, WRITE, write_time, persisted)
         return max_bookmark_field
 
 def get_bookmark(state, path, default):
@@ -69,7 +167,47 @@ def nested_set(dic, path, value):
 
 def write_bookmark(state, path, value):
     nested_set(state, ['bookmarks'] + path, value)
-    singer.write_state(state)
+    output.write_state(state)
+
+class CountedRecords:
+    """Iterates over records, counting them, for pages decoded as they arrive."""
+    def __init__(self, records):
+        self.records = records
+        self.count = 0
+
+    def __iter__(self):
+        for record in self.records:
+            self.count += 1
+            yield record
+
+def get_page_size_controller(client, state, stream_name):
+    """Page size controller of the stream, starting from the size remembered in the state."""
+    if not client.adaptive_page_size:
+        return None
+    page_size = state.get('page_sizes', {}).get(stream_name, client.page_size)
+    return PageSizeController(page_size, client.target_page_latency)
+
+def get_adaptive_page(client, state, controller, stream_name, path, params, data_key):
+    """
+    Request a page, adjusting the page size from its latency and size. Returns
+    None when the request timed out, the page should then be requested again
+    with the reduced page size.
+    """
+    start = time.monotonic()
+    try:
+        data = client.get(path, params=params, endpoint=stream_name, retry_timeouts=False)
+    except Timeout:
+        if not controller.shrink():
+            # Already at the smallest page, fall back to retrying the request
+            return client.get(path, params=params, endpoint=stream_name)
+        LOGGER.warning('%s - Request timed out with count %s, retrying with count %s',
+                       stream_name, params['count'], controller.page_size)
+        state.setdefault('page_sizes', {})[stream_name] = controller.page_size
+        return None
+
+    controller.observe(len(data.get(data_key) or []), time.monotonic() - start, client.last_response_bytes)
+    state.setdefault('page_sizes', {})[stream_name] = controller.page_size
+    return data
 
 def sync_endpoint(client,
                   catalog,
@@ -82,25 +220,58 @@ def sync_endpoint(client,
                   static_params,
                   bookmark_path,
                   bookmark_query_field,
-                  bookmark_field):
-    bookmark_path = bookmark_path + ['datetime']
-    last_datetime = get_bookmark(state, bookmark_path, start_date)
-    ids = []
+                  bookmark_field,
+                  collect_ids=False,
+                  sharded=False,
+                  keyset_field=None,
+                  index_fields=None,
+                  index=None):
+    # Requested in ascending `keyset_field` order, bookmarked with a KeysetCursor
+    cursor = None
+    if keyset_field:
+        cursor = KeysetCursor(keyset_field, get_bookmark(state, bookmark_path, {}), start_date)
+    datetime_path = bookmark_path + ['datetime']
+    last_datetime = get_bookmark(state, datetime_path, start_date)
+    # Only parent streams need their ids, everything else skips collection
+    ids = IdStore() if collect_ids else None
     max_bookmark_field = last_datetime
 
+    formatted_selected_fields = format_selected_fields(catalog, stream_name, data_key)
+    # Index fields the catalog does not select are requested, then dropped
+    extra_fields = [field for field in index_fields or []
+                    if '{}.{}'.format(data_key, field) not in formatted_selected_fields.split(',')]
+    if extra_fields:
+        formatted_selected_fields = format_selected_fields(
+            catalog, stream_name, data_key, ['{}.{}'.format(data_key, field) for field in extra_fields])
+
     def transform(record):
-        _id = record.get('id')
-        if _id:
-            ids.append(_id)
+        if collect_ids:
+            _id = record.get('id')
+            if _id:
+                ids.append(_id)
+        if index_fields:
+            # Keyed like the ids from the IdStore, as strings
+            index[str(record['id'])] = {field: record.get(field) for field in index_fields}
+            for field in extra_fields:
+                record.pop(field, None)
         del record['_links']
         return record
 
     write_schema(catalog, stream_name)
 
+    controller = get_page_size_controller(client, state, stream_name)
     page_size = client.page_size
     offset = 0
+    read_failures = 0
     has_more = True
     while has_more:
+        check_time_budget(client)
+        if controller:
+            page_size = controller.page_size
+        if cursor:
+            # Every page starts again from the boundary, past the ties already synced
+            offset = cursor.offset
+            last_datetime = cursor.query_since()
         params = {
             'count': page_size,
             'offset': offset,
@@ -109,6 +280,9 @@ def sync_endpoint(client,
 
         if bookmark_query_field:
             params[bookmark_query_field] = last_datetime
+        if cursor:
+            params['sort_field'] = keyset_field
+            params['sort_dir'] = 'ASC'
 
         LOGGER.info('%s - Syncing - %scount: %s, offset: %s',
                     stream_name,
@@ -116,44 +290,437 @@ def sync_endpoint(client,
                     page_size,
                     offset)
 
-        formatted_selected_fields = format_selected_fields(catalog, stream_name, data_key)
-
         params['fields'] = formatted_selected_fields
 
-        data = client.get(
-            path,
-            params=params,
-            endpoint=stream_name)
-
-
-        raw_records = data.get(data_key)
+        if controller:
+            data = get_adaptive_page(client, state, controller, stream_name, path, params, data_key)
+            if data is None:
+                continue
+            raw_records = data.get(data_key)
+        elif client.stream_json:
+            # Records are processed while the rest of the page is still arriving
+            raw_records = CountedRecords(client.get_records(
+                path,
+                data_key,
+                params=params,
+                endpoint=stream_name))
+        else:
+            data = client.get(
+                path,
+                params=params,
+                endpoint=stream_name)
+            raw_records = data.get(data_key)
+
+        records = raw_records
+        if cursor:
+            records = cursor.filter(raw_records)
+        if sharded:
+            # Only this shard's records are emitted and their ids passed on to the children
+            records = (record for record in records if in_shard(client, record['id']))
 
-        if len(raw_records) < page_size:
+        try:
+            max_bookmark_field = process_records(catalog,
+                                                 stream_name,
+                                                 map(transform, records),
+                                                 persist=persist,
+                                                 bookmark_field=bookmark_field,
+                                                 max_bookmark_field=max_bookmark_field)
+        except STREAM_READ_ERRORS as exc:
+            if not isinstance(raw_records, CountedRecords) or read_failures + 1 >= STREAM_READ_MAX_TRIES:
+                raise
+            # Some records of the page may have been emitted, they are emitted again
+            read_failures += 1
+            LOGGER.warning('%s - Reading the page at offset %s failed (%s), requesting it again',
+                           stream_name, offset, exc)
+            continue
+        read_failures = 0
+
+        page_records = raw_records.count if isinstance(raw_records, CountedRecords) else len(raw_records)
+        if page_records < page_size:
             has_more = False
 
-        max_bookmark_field = process_records(catalog,
-                                             stream_name,
-                                             map(transform, raw_records),
-                                             persist=persist,
-                                             bookmark_field=bookmark_field,
-                                             max_bookmark_field=max_bookmark_field)
-
-        if bookmark_field:
+        if cursor:
+            cursor.advance(page_records)
+            write_bookmark(state, bookmark_path, cursor.bookmark())
+        elif bookmark_field:
             write_bookmark(state,
-                           bookmark_path,
+                           datetime_path,
                            max_bookmark_field)
 
         offset += page_size
 
     return ids
 
+def get_windows(start, end, days):
+    """Split [start, end) into consecutive windows of `days` days."""
+    windows = []
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + timedelta(days=days), end)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+def format_window_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+def put_page(pages, stop, item):
+    """Queue a page for the main thread, giving up once the sync is stopped."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+def fetch_window(client, stream_name, path, data_key, params, index, pages, stop):
+    """
+    Runs in a window worker thread: request the pages of one window and queue
+    them for the main thread, which processes them. The last item of a window
+    is flagged, an error is queued in place of a page.
+    """
+    page_size = client.page_size
+    offset = 0
+    try:
+        while not stop.is_set():
+            data = client.get(path, params={**params, 'count': page_size, 'offset': offset}, endpoint=stream_name)
+            records = data.get(data_key)
+            last = len(records) < page_size
+            put_page(pages, stop, (index, records, last))
+            if last:
+                return
+            offset += page_size
+    except Exception as exc: # pylint: disable=broad-except
+        put_page(pages, stop, (index, exc, True))
+
+def sync_windowed_endpoint(client,
+                           catalog,
+                           state,
+                           start_date,
+                           stream_name,
+                           persist,
+                           path,
+                           data_key,
+                           static_params,
+                           bookmark_path,
+                           bookmark_query_field,
+                           window_query_field,
+                           bookmark_field):
+    """
+    Sync a large backlog (a first sync or a backfill) in windows of
+    `list_members_window_days` days, [bookmark_query_field, window_query_field).
+
+    Windows are fetched by `list_members_window_workers` threads and their
+    records processed in the main thread as the pages arrive. Completed
+    windows are tracked in the state under `windows`, an interrupted backfill
+    resumes with the windows left. Once every window is done the regular
+    `datetime` bookmark takes over. Returns False when the backlog is small
+    enough for a regular sync.
+    """
+    bookmark = get_bookmark(state, bookmark_path, {})
+    windows_state = bookmark.get('windows')
+    if windows_state is None:
+        start = strptime_to_utc(bookmark.get('datetime', start_date))
+        end = now()
+        if end - start <= timedelta(days=client.list_members_window_days):
+            return False
+        windows_state = {
+            'start': format_window_datetime(start),
+            'end': format_window_datetime(end),
+            'days': client.list_members_window_days,
+            'completed': [],
+            'max_bookmark': bookmark.get('datetime', start_date),
+        }
+
+    windows = get_windows(strptime_to_utc(windows_state['start']),
+                          strptime_to_utc(windows_state['end']),
+                          windows_state['days'])
+    pending = [index for index in range(len(windows)) if index not in windows_state['completed']]
+    LOGGER.info('%s - Syncing %s of %s windows of %s days from %s to %s',
+                stream_name, len(pending), len(windows), windows_state['days'],
+                windows_state['start'], windows_state['end'])
+
+    def transform(record):
+        del record['_links']
+        return record
+
+    # Only needed for backfills, don't pay for the import on every run
+    from concurrent.futures import ThreadPoolExecutor # pylint: disable=import-outside-toplevel
+
+    write_schema(catalog, stream_name)
+    params = {**static_params, 'fields': format_selected_fields(catalog, stream_name, data_key)}
+    workers = client.list_members_window_workers
+    pages = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='window') as executor:
+        try:
+            for index in pending:
+                window_start, window_end = windows[index]
+                window_params = {**params,
+                                 bookmark_query_field: format_window_datetime(window_start),
+                                 window_query_field: format_window_datetime(window_end + WINDOW_OVERLAP)}
+                executor.submit(fetch_window, client, stream_name, path, data_key, window_params,
+                                index, pages, stop)
+
+            remaining = len(pending)
+            while remaining:
+                check_time_budget(client)
+                index, records, last = pages.get()
+                if isinstance(records, Exception):
+                    raise records
+                windows_state['max_bookmark'] = process_records(catalog,
+                                                                stream_name,
+                                                                map(transform, records),
+                                                                persist=persist,
+                                                                bookmark_field=bookmark_field,
+                                                                max_bookmark_field=windows_state['max_bookmark'])
+                if last:
+                    windows_state['completed'] = sorted(windows_state['completed'] + [index])
+                    write_bookmark(state, bookmark_path + ['windows'], windows_state)
+                    remaining -= 1
+        finally:
+            stop.set()
+
+    # Every record changed before the end of the windows has been synced, bookmark it
+    # so an inactive list does not go through windows again on the next run
+    max_bookmark = windows_state['max_bookmark']
+    windows_end = strptime_to_utc(windows_state['end']) - WINDOW_END_MARGIN
+    if strptime_to_utc(max_bookmark) < windows_end:
+        max_bookmark = format_window_datetime(windows_end)
+
+    bookmark = get_bookmark(state, bookmark_path, {})
+    for key in ('windows', 'tie_ids', 'tie_offset', 'partitions'):
+        bookmark.pop(key, None)
+    write_bookmark(state, bookmark_path + ['datetime'], max_bookmark)
+    return True
+
+def fetch_partition(client, stream_name, path, data_key, params, bookmark_query_field, cursor, partition,
+                    pages, stop):
+    """
+    Runs in a partition worker thread: request the pages of one partition from
+    its KeysetCursor and queue their new records with the partition's
+    bookmark after them. The last item is flagged, an error is queued in place
+    of a page.
+    """
+    page_size = client.page_size
+    try:
+        while not stop.is_set():
+            page_params = {**params,
+                           bookmark_query_field: cursor.query_since(),
+                           'count': page_size,
+                           'offset': cursor.offset}
+            raw_records = client.get(path, params=page_params, endpoint=stream_name).get(data_key) or []
+            records = list(cursor.filter(raw_records))
+            cursor.advance(len(raw_records))
+            last = len(raw_records) < page_size
+            put_page(pages, stop, (partition, records, cursor.bookmark(), last))
+            if last:
+                return
+    except Exception as exc: # pylint: disable=broad-except
+        put_page(pages, stop, (partition, exc, None, True))
+
+def sync_partitioned_endpoint(client,
+                              catalog,
+                              state,
+                              start_date,
+                              stream_name,
+                              persist,
+                              path,
+                              data_key,
+                              static_params,
+                              bookmark_path,
+                              bookmark_query_field,
+                              partition_query_field,
+                              keyset_field):
+    """
+    Sync the members of a list as one stream per status in LIST_MEMBER_STATUSES,
+    fetched in parallel by worker threads and processed in the main thread as
+    the pages arrive.
+
+    Each partition is bookmarked by its own KeysetCursor under `partitions`.
+    The list's `datetime` is the earliest of them, every member changed before
+    it has been synced whatever its status, so a sync without partitions can
+    still resume from it. A partition that reached its last page counts as
+    the run's start there, less WINDOW_END_MARGIN, so an empty or idle status
+    does not hold it back.
+    """
+    bookmark = get_bookmark(state, bookmark_path, {})
+    # Partitions without a bookmark of their own start from the list's, a
+    # `tie_offset` is a position among every status and does not carry over
+    list_bookmark = {key: bookmark[key] for key in ('datetime', 'tie_ids') if key in bookmark}
+    partition_bookmarks = bookmark.get('partitions', {})
+    cursors = {status: KeysetCursor(keyset_field, partition_bookmarks.get(status, list_bookmark), start_date)
+               for status in LIST_MEMBER_STATUSES}
+    bookmarks = {status: cursor.bookmark() for status, cursor in cursors.items()}
+    run_start = format_datetime(now() - WINDOW_END_MARGIN)
+    finished = set()
+
+    def transform(record):
+        del record['_links']
+        return record
+
+    # Only needed with partitions, don't pay for the import on every run
+    from concurrent.futures import ThreadPoolExecutor # pylint: disable=import-outside-toplevel
+
+    write_schema(catalog, stream_name)
+    params = {**static_params,
+              'fields': format_selected_fields(catalog, stream_name, data_key),
+              'sort_field': keyset_field,
+              'sort_dir': 'ASC'}
+    pages = queue.Queue(maxsize=len(cursors) * 2)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=len(cursors), thread_name_prefix='partition') as executor:
+        try:
+            for status, cursor in cursors.items():
+                executor.submit(fetch_partition, client, stream_name, path, data_key,
+                                {**params, partition_query_field: status}, bookmark_query_field,
+                                cursor, status, pages, stop)
+
+            remaining = len(cursors)
+            while remaining:
+                check_time_budget(client)
+                status, records, partition_bookmark, last = pages.get()
+                if isinstance(records, Exception):
+                    raise records
+                process_records(catalog, stream_name, map(transform, records), persist=persist)
+                bookmarks[status] = partition_bookmark
+                if last:
+                    finished.add(status)
+                    remaining -= 1
+                write_bookmark(state, bookmark_path, {
+                    'datetime': min(run_start if partition in finished else partition_bookmark['datetime']
+                                    for partition, partition_bookmark in bookmarks.items()),
+                    'partitions': dict(bookmarks),
+                })
+        finally:
+            stop.set()
+
+def get_report_counts(client, id_bag, count_field):
+    """
+    `count_field` of every campaign report by campaign id, requested from
+    /reports once per run and kept in the id bag.
+    """
+    report_counts = id_bag.setdefault('report_counts', {})
+    if count_field not in report_counts:
+        counts = {}
+        offset = 0
+        while True:
+            check_time_budget(client)
+            data = client.get('/reports',
+                              params={'count': client.page_size,
+                                      'offset': offset,
+                                      'fields': 'reports.id,reports.{}'.format(count_field)},
+                              endpoint='reports')
+            reports = data.get('reports') or []
+            for report in reports:
+                counts[report['id']] = report.get(count_field)
+            if len(reports) < client.page_size:
+                break
+            offset += client.page_size
+        report_counts[count_field] = counts
+    return report_counts[count_field]
+
+def sync_appended_endpoint(client,
+                           catalog,
+                           state,
+                           stream_name,
+                           persist,
+                           path,
+                           data_key,
+                           bookmark_path,
+                           report_count,
+                           key_field):
+    """
+    Sync a list only ever appended to, such as the unsubscribes of a campaign,
+    from where the previous run stopped. The bookmark keeps the number of
+    records read and the key of the last one:
+
+      {"count": 120, "last_key": "a1b2..."}
+
+    A list whose `report_count` is that count is skipped. Otherwise it is read
+    from the last record of the previous run, which must still be in its place,
+    else the list changed other than by appending and is read from the start.
+    """
+    bookmark = get_bookmark(state, bookmark_path, {})
+    count = bookmark.get('count', 0)
+    last_key = bookmark.get('last_key')
+    if report_count is not None and report_count == count:
+        return
+
+    write_schema(catalog, stream_name)
+
+    # Read the last record again to check it did not move
+    offset = count - 1 if count and last_key and (report_count is None or report_count > count) else 0
+    overlap = offset > 0
+    fields = format_selected_fields(catalog, stream_name, data_key)
+    page_size = client.page_size
+    while True:
+        check_time_budget(client)
+        LOGGER.info('%s - Syncing - count: %s, offset: %s', stream_name, page_size, offset)
+        records = client.get(path,
+                             params={'count': page_size, 'offset': offset, 'fields': fields},
+                             endpoint=stream_name).get(data_key) or []
+        page_records = len(records)
+        if page_records:
+            last_key = records[-1][key_field]
+        if overlap:
+            overlap = False
+            if not records or records[0][key_field] != bookmark['last_key']:
+                LOGGER.info('%s - %s changed since the last sync, syncing it from the start', stream_name, path)
+                offset = 0
+                continue
+            records = records[1:]
+
+        for record in records:
+            del record['_links']
+        process_records(catalog, stream_name, records, persist=persist)
+        write_bookmark(state, bookmark_path, {'count': offset + page_records, 'last_key': last_key})
+
+        if page_records < page_size:
+            return
+        offset += page_size
+
+def segment_unchanged(client, state, bookmark_path, fingerprint):
+    """
+    Whether the members of a segment are those synced by a previous run: a
+    static or saved segment with the same fingerprint, synced less than
+    `segment_refresh_days` days ago.
+    """
+    if fingerprint.get('type') not in FINGERPRINTED_SEGMENT_TYPES:
+        return False
+    bookmark = get_bookmark(state, bookmark_path, {})
+    if bookmark.get('fingerprint') != fingerprint or 'synced_at' not in bookmark:
+        return False
+    return now() - strptime_to_utc(bookmark['synced_at']) < timedelta(days=client.segment_refresh_days)
+
+def prune_fingerprints(state, bookmark_path, fingerprinted_ids):
+    """
+    Drop the fingerprints of the segments no longer returned, or no longer
+    fingerprinted since their type changed, once every segment was synced.
+    """
+    bookmarks = get_bookmark(state, bookmark_path, {})
+    for _id in [_id for _id in bookmarks if _id not in fingerprinted_ids]:
+        del bookmarks[_id]
+
 def get_dependants(endpoint_config):
-    dependants = endpoint_config.get('dependants', [])
+    # Copy, so the endpoint config's own list is not extended
+    dependants = list(endpoint_config.get('dependants', []))
     for stream_name, child_endpoint_config in endpoint_config.get('children', {}).items():
         dependants.append(stream_name)
         dependants += get_dependants(child_endpoint_config)
     return dependants
 
+def uses_window_index(client, streams_to_sync, stream_name, endpoint_config, should_persist):
+    """
+    Whether the stream is only synced for the date window of its `dependants`,
+    the ids they need then come from its persisted window index.
+    """
+    if should_persist or not endpoint_config.get('window_index_field') or not client.adjusted_start_date:
+        return False
+    pending = set(get_dependants(endpoint_config)).intersection(streams_to_sync['selected_streams']) - \
+        streams_to_sync['completed_streams']
+    return pending <= set(endpoint_config.get('dependants', []))
+
 def sync_stream(client,
                 catalog,
                 state,
@@ -173,28 +740,106 @@ def sync_stream(client,
     should_stream, should_persist = should_sync_stream(streams_to_sync,
                                                        dependants,
                                                        stream_name)
-    if should_stream:
+    if should_stream and uses_window_index(client, streams_to_sync, stream_name, endpoint_config, should_persist):
+        sync_window_index(client, catalog, state, id_bag, stream_name, endpoint_config)
+    elif should_stream:
+        if not id_path:
+            profiling.snapshot('{}-start'.format(stream_name))
         path = endpoint_config.get('path').format(*id_path)
-        stream_ids = sync_endpoint(client,
+        children = endpoint_config.get('children')
+        data_key = endpoint_config.get('data_path', stream_name)
+        # Filled by sync_endpoint with the `index_fields` of each record, by id
+        index = {} if endpoint_config.get('index_fields') else None
+        windowed = False
+        if endpoint_config.get('window_query_field') and client.list_members_window_days:
+            windowed = sync_windowed_endpoint(client,
+                                              catalog,
+                                              state,
+                                              start_date,
+                                              stream_name,
+                                              should_persist,
+                                              path,
+                                              data_key,
+                                              endpoint_config.get('params', {}),
+                                              bookmark_path,
+                                              endpoint_config.get('bookmark_query_field'),
+                                              endpoint_config.get('window_query_field'),
+                                              endpoint_config.get('bookmark_field'))
+        partitioned = endpoint_config.get('partition_query_field') and client.list_members_status_partitions
+        stream_ids = None
+        if partitioned and not windowed:
+            sync_partitioned_endpoint(client,
+                                      catalog,
+                                      state,
+                                      start_date,
+                                      stream_name,
+                                      should_persist,
+                                      path,
+                                      data_key,
+                                      endpoint_config.get('params', {}),
+                                      bookmark_path,
+                                      endpoint_config.get('bookmark_query_field'),
+                                      endpoint_config.get('partition_query_field'),
+                                      endpoint_config.get('keyset_field'))
+        elif endpoint_config.get('report_count_field') and not windowed:
+            sync_appended_endpoint(client,
                                    catalog,
                                    state,
-                                   start_date,
                                    stream_name,
                                    should_persist,
                                    path,
-                                   endpoint_config.get('data_path', stream_name),
-                                   endpoint_config.get('params', {}),
+                                   data_key,
                                    bookmark_path,
-                                   endpoint_config.get('bookmark_query_field'),
-                                   endpoint_config.get('bookmark_field'))
+                                   get_report_counts(client,
+                                                     id_bag,
+                                                     endpoint_config['report_count_field']).get(id_path[-1]),
+                                   endpoint_config['append_key'])
+        elif not windowed:
+            stream_ids = sync_endpoint(client,
+                                       catalog,
+                                       state,
+                                       start_date,
+                                       stream_name,
+                                       should_persist,
+                                       path,
+                                       data_key,
+                                       endpoint_config.get('params', {}),
+                                       bookmark_path,
+                                       endpoint_config.get('bookmark_query_field'),
+                                       endpoint_config.get('bookmark_field'),
+                                       collect_ids=bool(children or endpoint_config.get('store_ids')),
+                                       sharded=endpoint_config.get('sharded', False),
+                                       keyset_field=endpoint_config.get('keyset_field'),
+                                       index_fields=endpoint_config.get('index_fields'),
+                                       index=index)
 
         if endpoint_config.get('store_ids'):
             id_bag[stream_name] = stream_ids
+            if index is not None:
+                id_bag['{}_index'.format(stream_name)] = index
 
-        children = endpoint_config.get('children')
         if children:
             for child_stream_name, child_endpoint_config in children.items():
+                _, persist_child = should_sync_stream(streams_to_sync,
+                                                      get_dependants(child_endpoint_config),
+                                                      child_stream_name)
+                # A segment's index entry is its fingerprint
+                skip_unchanged = index is not None and persist_child and \
+                    child_endpoint_config.get('skip_unchanged') and client.segment_refresh_days > 0
+                fingerprinted_ids = set()
                 for _id in stream_ids:
+                    check_time_budget(client)
+                    child_bookmark_path = bookmark_path + [_id, child_stream_name]
+                    fingerprint = index.get(_id) if skip_unchanged else None
+                    if fingerprint and fingerprint.get('type') not in FINGERPRINTED_SEGMENT_TYPES:
+                        fingerprint = None
+                    if fingerprint:
+                        fingerprinted_ids.add(_id)
+                    if fingerprint and segment_unchanged(client, state, child_bookmark_path, fingerprint):
+                        LOGGER.info('%s - Skipping %s, unchanged since %s', child_stream_name, _id,
+                                    get_bookmark(state, child_bookmark_path + ['synced_at'], None))
+                        continue
+                    child_start = time.monotonic()
                     sync_stream(client,
                                 catalog,
                                 state,
@@ -203,8 +848,20 @@ def sync_stream(client,
                                 id_bag,
                                 child_stream_name,
                                 child_endpoint_config,
-                                bookmark_path=bookmark_path + [_id, child_stream_name],
+                                bookmark_path=child_bookmark_path,
                                 id_path=id_path + [_id])
+                    # Over every parent, including the child's own children, see record_stream_durations
+                    child_durations = id_bag.setdefault('child_durations', {})
+                    child_durations[child_stream_name] = \
+                        child_durations.get(child_stream_name, 0) + time.monotonic() - child_start
+                    if fingerprint:
+                        write_bookmark(state, child_bookmark_path, {'fingerprint': fingerprint,
+                                                                    'synced_at': strftime(now())})
+                if skip_unchanged:
+                    prune_fingerprints(state, bookmark_path, fingerprinted_ids)
+
+        if not id_path:
+            profiling.snapshot('{}-end'.format(stream_name))
 
 def get_batch_info(client, batch_id):
     try:
@@ -247,41 +904,58 @@ def poll_email_activity(client, state, batch_id):
             LOGGER.error(message)
             raise Exception(message)
 
+        # The batch id is bookmarked, the next run picks the export up again
+        check_time_budget(client)
+
         sleep = next_sleep_interval(sleep)
         LOGGER.info('campaigns - status: %s, sleeping for %s seconds',
                     data['status'],
                     sleep)
-        time.sleep(sleep)
+        with client.stage_metrics.timer('reports_email_activity', BATCH_POLL_SLEEP):
+            time.sleep(sleep)
 
-def stream_email_activity(client, catalog, state, archive_url):
+def stream_email_activity(client, catalog, state, archive_url, submitted_at=None, synced_campaigns=None):
+    """
+    Stream the records of a finished batch. The campaigns whose operation
+    succeeded are added to `synced_campaigns` with the batch's `submitted_at`.
+    """
     stream_name = 'reports_email_activity'
 
+    flattener = get_flattener(catalog, stream_name)
+
     def transform_activities(records):
-        for record in records:
-            if 'activity' in record:
-                if '_links' in record:
-                    del record['_links']
-                record_template = dict(record)
-                del record_template['activity']
-
-                for activity in record['activity']:
-                    new_activity = dict(record_template)
-                    for key, value in activity.items():
-                        new_activity[key] = value
-                    yield new_activity
+        # Only the time spent flattening is measured, not the time spent by the consumer between yields
+        flatten_time = 0.0
+        count = 0
+        activities = flattener.flatten(records)
+        while True:
+            start = time.perf_counter()
+            record = next(activities, None)
+            flatten_time += time.perf_counter() - start
+            if record is None:
+                break
+            count += 1
+            yield record
+        client.stage_metrics.add(stream_name, FLATTEN, flatten_time, count)
 
     write_schema(catalog, stream_name)
 
+    # Only needed to read the batch archive, don't pay for the import on every run
+    import tarfile # pylint: disable=import-outside-toplevel
+
     failed_campaign_ids = []
     with client.request('GET', url=archive_url, s3=True, endpoint='s3') as response:
         with tarfile.open(mode='r|gz', fileobj=response.raw) as tar:
-            file = tar.next()
+            with client.stage_metrics.timer(stream_name, ARCHIVE_DOWNLOAD):
+                file = tar.next()
             while file:
                 if file.isfile():
                     try:
-                        rawoperations = tar.extractfile(file)
-                        file_content = rawoperations.read().decode('utf-8')
-                        operations = json.loads(file_content)
+                        with client.stage_metrics.timer(stream_name, ARCHIVE_DOWNLOAD):
+                            rawoperations = tar.extractfile(file)
+                            file_content = rawoperations.read().decode('utf-8')
+                        with client.stage_metrics.timer(stream_name, JSON_DECODE):
+                            operations = json.loads(file_content)
                     except json.JSONDecodeError as e:
                         if e.args[0] == 'Expecting value: line 1 column 1 (char 0)' and len(file_content.strip()) == 0:
                             LOGGER.info("Skipping the empty file: %s", file.name)
@@ -291,70 +965,84 @@ def stream_email_activity(client, catalog, state, archive_url):
 
                     for i, operation in enumerate(operations):
                         campaign_id = operation['operation_id']
-                        last_bookmark = state.get('bookmarks', {}).get(stream_name, {}).get(campaign_id)
+                        last_bookmark = get_email_activity_bookmark(state, campaign_id, None)
                         LOGGER.info("reports_email_activity - [batch operation %s] Processing records for campaign %s", i, campaign_id)
                         if operation['status_code'] != 200:
                             failed_campaign_ids.append(campaign_id)
                         else:
-                            response = json.loads(operation['response'])
+                            with client.stage_metrics.timer(stream_name, JSON_DECODE):
+                                response = json.loads(operation['response'])
                             email_activities = response['emails']
-                            max_bookmark_field = process_records(
+                            # Flattened and transformed in one pass, see ActivityFlattener
+                            flattener.max_timestamp = last_bookmark
+                            process_records(
                                 catalog,
                                 stream_name,
                                 transform_activities(email_activities),
-                                bookmark_field='timestamp',
-                                max_bookmark_field=last_bookmark)
-                            write_bookmark(state,
-                                           [stream_name, campaign_id],
-                                           max_bookmark_field)
-                file = tar.next()
+                                transformed=True)
+                            if flattener.max_timestamp:
+                                write_bookmark(state,
+                                               [stream_name, campaign_id],
+                                               flattener.max_timestamp)
+                            if synced_campaigns is not None:
+                                synced_campaigns[campaign_id] = submitted_at
+                        check_time_budget(client)
+                with client.stage_metrics.timer(stream_name, ARCHIVE_DOWNLOAD):
+                    file = tar.next()
     return failed_campaign_ids
 
-def sync_email_activity(client, catalog, state, start_date, campaign_ids, batch_id=None):
-    if batch_id:
-        LOGGER.info('reports_email_activity - Picking up previous run: %s', batch_id)
-    else:
-        LOGGER.info('reports_email_activity - Starting sync')
+def create_email_activity_batch(client, catalog, state, start_date, campaign_ids):
+    extra_fields = ['emails.activity']
 
-        extra_fields = ['emails.activity']
+    formatted_field_names = format_selected_fields(catalog, 'reports_email_activity', 'emails', extra_fields)
 
-        formatted_field_names = format_selected_fields(catalog, 'reports_email_activity', 'emails', extra_fields)
+    operations = []
+    for campaign_id in campaign_ids:
+        since = get_email_activity_bookmark(state, campaign_id, start_date)
+        operations.append({
+            'method': 'GET',
+            'path': '/reports/{}/email-activity'.format(campaign_id),
+            'operation_id': campaign_id,
+            'params': {
+                'since': since,
+                'fields': formatted_field_names
+            }
+        })
 
-        operations = []
-        for campaign_id in campaign_ids:
-            since = get_bookmark(state, ['reports_email_activity', campaign_id], start_date)
-            operations.append({
-                'method': 'GET',
-                'path': '/reports/{}/email-activity'.format(campaign_id),
-                'operation_id': campaign_id,
-                'params': {
-                    'since': since,
-                    'fields': formatted_field_names
-                }
-            })
+    data = client.post(
+        '/batches',
+        json={
+            'operations': operations
+        },
+        endpoint='create_actvity_export')
 
-        data = client.post(
-            '/batches',
-            json={
-                'operations': operations
-            },
-            endpoint='create_actvity_export')
+    batch_id = data['id']
 
-        batch_id = data['id']
+    LOGGER.info('reports_email_activity - Job running: %s', batch_id)
 
-        LOGGER.info('reports_email_activity - Job running: %s', batch_id)
+    write_activity_batch_bookmark(state, batch_id)
+    return batch_id
 
-        write_activity_batch_bookmark(state, batch_id)
+def sync_email_activity(client, catalog, state, start_date, campaign_ids, batch_id=None, synced_campaigns=None):
+    if batch_id:
+        LOGGER.info('reports_email_activity - Picking up previous run: %s', batch_id)
+    else:
+        LOGGER.info('reports_email_activity - Starting sync')
+        batch_id = create_email_activity_batch(client, catalog, state, start_date, campaign_ids)
 
     data = poll_email_activity(client, state, batch_id)
 
     LOGGER.info('reports_email_activity - Batch job complete: took %.2fs minutes',
                 (strptime_to_utc(data['completed_at']) - strptime_to_utc(data['submitted_at'])).total_seconds() / 60)
 
+    profiling.snapshot('reports_email_activity-start')
     failed_campaign_ids = stream_email_activity(client,
                                                 catalog,
                                                 state,
-                                                data['response_body_url'])
+                                                data['response_body_url'],
+                                                data['submitted_at'],
+                                                synced_campaigns)
+    profiling.snapshot('reports_email_activity-end')
     if failed_campaign_ids:
         LOGGER.warning("reports_email_activity - operations failed for campaign_ids: %s", failed_campaign_ids)
 
@@ -399,50 +1087,60 @@ def format_selected_fields(catalog, stream_name, data_key, extra_fields=None):
 def should_sync_stream(streams_to_sync, dependants, stream_name):
     selected_streams = streams_to_sync['selected_streams']
     should_persist = stream_name in selected_streams
-    last_stream = streams_to_sync['last_stream']
-    if last_stream == stream_name or last_stream is None:
-        if last_stream is not None:
-            streams_to_sync['last_stream'] = None
-            return True, should_persist
-        if should_persist or set(dependants).intersection(selected_streams):
-            return True, should_persist
+    completed_streams = streams_to_sync['completed_streams']
+    if stream_name in completed_streams:
+        # Finished earlier in an interrupted run. Only fetch the ids a pending
+        # dependant needs (e.g. campaign ids for reports_email_activity) without
+        # re-emitting the records.
+        if set(dependants).intersection(selected_streams) - completed_streams:
+            return True, False
+        return False, False
+    if should_persist or set(dependants).intersection(selected_streams):
+        return True, should_persist
     return False, should_persist
 
 def chunk_campaigns(sorted_campaigns, chunk_bookmark):
     chunk_start = chunk_bookmark * EMAIL_ACTIVITY_BATCH_SIZE
-    chunk_end = chunk_start + EMAIL_ACTIVITY_BATCH_SIZE
 
-    if chunk_bookmark > 0:
-        LOGGER.info("reports_email_activity - Resuming requests starting at campaign_id %s (index %s) in chunks of %s",
-                    sorted_campaigns[chunk_start],
-                    chunk_start,
-                    EMAIL_ACTIVITY_BATCH_SIZE)
+    # Campaign ids are read lazily, so only one chunk is materialized at a time
+    campaign_ids = iter(sorted_campaigns)
+    for _ in islice(campaign_ids, chunk_start):
+        pass
 
     done = False
     while not done:
-        current_chunk = sorted_campaigns[chunk_start:chunk_end]
+        current_chunk = list(islice(campaign_ids, EMAIL_ACTIVITY_BATCH_SIZE))
         done = len(current_chunk) == 0
         if not done:
-            end_index = min(chunk_end, len(sorted_campaigns))
+            if chunk_bookmark > 0:
+                LOGGER.info("reports_email_activity - Resuming requests starting at campaign_id %s (index %s) in chunks of %s",
+                            current_chunk[0],
+                            chunk_start,
+                            EMAIL_ACTIVITY_BATCH_SIZE)
+                chunk_bookmark = 0
             LOGGER.info("reports_email_activity - Will request for campaign_ids from %s to %s (index %s to %s)",
-                        sorted_campaigns[chunk_start],
-                        sorted_campaigns[end_index - 1],
+                        current_chunk[0],
+                        current_chunk[-1],
                         chunk_start,
-                        end_index - 1)
+                        chunk_start + len(current_chunk) - 1)
             yield current_chunk
-        chunk_start = chunk_end
-        chunk_end += EMAIL_ACTIVITY_BATCH_SIZE
+        chunk_start += EMAIL_ACTIVITY_BATCH_SIZE
 
-def write_email_activity_chunk_bookmark(state, current_bookmark, current_index, sorted_campaigns):
+def write_email_activity_chunk_bookmark(state, current_bookmark, current_index):
     # Bookmark next chunk because the current chunk will be saved in batch_id
-    # Index is relative to current bookmark
+    # Index is relative to current bookmark. After the last chunk this points past
+    # the end, so resuming its batch does not start all the chunks over again;
+    # it is reset to 0 once every chunk is done.
     next_chunk = current_bookmark + current_index + 1
-    if next_chunk * EMAIL_ACTIVITY_BATCH_SIZE < len(sorted_campaigns):
-        write_bookmark(state, ['reports_email_activity_next_chunk'], next_chunk)
-    else:
-        write_bookmark(state, ['reports_email_activity_next_chunk'], 0)
+    write_bookmark(state, ['reports_email_activity_next_chunk'], next_chunk)
+
+def retry_email_activity_chunk(state):
+    # The next chunk was bookmarked when the batch was submitted, step back so
+    # the chunk of the batch that cannot be resumed is requested again
+    next_chunk = int(get_bookmark(state, ['reports_email_activity_next_chunk'], 0))
+    write_bookmark(state, ['reports_email_activity_next_chunk'], max(next_chunk - 1, 0))
 
-def check_and_resume_email_activity_batch(client, catalog, state, start_date):
+def check_and_resume_email_activity_batch(client, catalog, state, start_date, synced_campaigns=None):
     batch_id = get_bookmark(state, ['reports_email_activity_last_run_id'], None)
 
     if batch_id:
@@ -451,61 +1149,227 @@ def check_and_resume_email_activity_batch(client, catalog, state, start_date):
             if data['status'] == 'finished' and not data['response_body_url']:
                 LOGGER.info('reports_email_activity - Previous run from state (%s) is empty, retrying.',
                             batch_id)
+                retry_email_activity_chunk(state)
                 return
         except BatchExpiredError:
             LOGGER.info('reports_email_activity - Previous run from state expired: %s',
                         batch_id)
+            retry_email_activity_chunk(state)
             return
 
         # Resume from bookmarked job_id, then if completed, issue a new batch for processing.
         campaigns = [] # Don't need a list of campaigns if resuming
-        sync_email_activity(client, catalog, state, start_date, campaigns, batch_id)
-
-def fetch_recent_campaigns(client, catalog, state, campaigns_config):
-    return sync_endpoint(client, catalog, state,
-                         client.adjusted_start_date,  # adjusted start date
-                         "campaigns", False, # persist set to false (fetch campaign id's only)
-                         campaigns_config.get('path'),
-                         campaigns_config.get( 'data_path', "campaigns"),
-                         campaigns_config.get('params', {}), ["campaigns"],
-                         "since_send_time", #new bookmark_query_field
-                         None)
-
-def sync_reports_email_activity(streams_to_sync, id_bag, client, catalog, state, start_date, campaign_config):
+        sync_email_activity(client, catalog, state, start_date, campaigns, batch_id, synced_campaigns)
+
+def get_window_start(client):
+    """Start of the `email_activity_date_window`, as a bookmark datetime."""
+    adjusted_start_date = client.adjusted_start_date
+    return strftime(strptime_to_utc(adjusted_start_date.isoformat()))
+
+def in_window(fields, window_field, window_start):
+    value = fields.get(window_field)
+    return bool(value) and strptime_to_utc(value) >= strptime_to_utc(window_start)
+
+def sync_window_index(client, catalog, state, id_bag, stream_name, endpoint_config):
+    """
+    Update the persisted `<stream>_index` bookmark, the index fields of the
+    records in the email activity date window by id, with the records sent
+    since the last one it holds:
+
+      {"datetime": "2020-01-02T00:00:00+00:00", "campaigns": {"abc123": {"send_time": "..."}}}
+
+    Used instead of listing every record when the stream is only synced for
+    that window, the entries that left the window are dropped.
+    """
+    window_field = endpoint_config['window_index_field']
+    index_key = '{}_index'.format(stream_name)
+    window_start = get_window_start(client)
+    bookmark = get_bookmark(state, [index_key], {})
+    index = {_id: fields for _id, fields in bookmark.get(stream_name, {}).items()
+             if in_window(fields, window_field, window_start)}
+    since = window_start
+    if bookmark.get('datetime') and strptime_to_utc(bookmark['datetime']) > strptime_to_utc(window_start):
+        since = bookmark['datetime']
+    LOGGER.info('%s - Updating the index of the date window since %s', stream_name, since)
+    write_bookmark(state, [index_key], {'datetime': since, stream_name: index})
+
+    sync_endpoint(client, catalog, state, since, stream_name, False,
+                  endpoint_config.get('path'),
+                  endpoint_config.get('data_path', stream_name),
+                  endpoint_config.get('params', {}),
+                  [index_key],
+                  endpoint_config['window_index_query_field'],
+                  None,
+                  sharded=endpoint_config.get('sharded', False),
+                  index_fields=endpoint_config.get('index_fields'),
+                  index=index)
+
+    window_values = [fields[window_field] for fields in index.values() if fields.get(window_field)]
+    if window_values:
+        write_bookmark(state, [index_key, 'datetime'], max(window_values, key=strptime_to_utc))
+    id_bag[index_key] = index
+
+def get_email_activity_campaign_ids(client, id_bag):
+    if client.adjusted_start_date:
+        if 'recent_campaigns' not in id_bag:
+            # Selected from the index built while listing the campaigns, no page is requested again
+            window_start = get_window_start(client)
+            LOGGER.info("Selecting Campaigns sent since %s for email activity", window_start)
+            id_bag['recent_campaigns'] = [
+                campaign_id for campaign_id, fields in id_bag.get('campaigns_index', {}).items()
+                if in_window(fields, 'send_time', window_start)]
+        return id_bag['recent_campaigns']
+    return id_bag.get('campaigns')
+
+def submit_email_activity_batch(streams_to_sync, id_bag, client, catalog, state, start_date):
+    """
+    Submit the batch of the next email activity chunk right after the campaigns
+    sync, so Mailchimp prepares the export while the other streams sync. The
+    batch id and next chunk are bookmarked exactly like a regular chunk, so
+    sync_reports_email_activity picks the batch up as a resumed one.
+    """
     should_stream, _ = should_sync_stream(
         streams_to_sync, [], 'reports_email_activity')
-    if client.adjusted_start_date:
-        LOGGER.info("Fetching Campaigns since %s for email activty", client.adjusted_start_date)
-        campaign_ids = fetch_recent_campaigns(client, catalog, state, campaign_config)
-    else:
-        campaign_ids = id_bag.get('campaigns')
+    if not should_stream or get_bookmark(state, ['reports_email_activity_last_run_id'], None):
+        return
+
+    campaign_ids = get_email_activity_campaign_ids(client, id_bag)
+    if not campaign_ids:
+        return
+
+    chunk_bookmark = int(get_bookmark(
+        state, ['reports_email_activity_next_chunk'], 0))
+    campaign_chunk = next(chunk_campaigns(IdStore(sorted(campaign_ids)), chunk_bookmark), None)
+    if campaign_chunk:
+        LOGGER.info('reports_email_activity - Submitting batch ahead of the remaining streams')
+        write_email_activity_chunk_bookmark(state, chunk_bookmark, 0)
+        create_email_activity_batch(client, catalog, state, start_date, campaign_chunk)
+
+def sync_reports_email_activity(streams_to_sync, id_bag, client, catalog, state, start_date):
+    should_stream, _ = should_sync_stream(
+        streams_to_sync, [], 'reports_email_activity')
+    campaign_ids = None
+    if should_stream:
+        campaign_ids = get_email_activity_campaign_ids(client, id_bag)
     if should_stream and campaign_ids:
+        # Batch submission times of the campaigns synced by this run, see apply_retention
+        synced_campaigns = id_bag.setdefault('email_activity_synced', {})
         # Resume previous batch, if necessary
         check_and_resume_email_activity_batch(
-            client, catalog, state, start_date)
-        # Chunk batch_ids, bookmarking the chunk number
-        sorted_campaigns = sorted(campaign_ids)
+            client, catalog, state, start_date, synced_campaigns)
+        # Chunk batch_ids, bookmarking the chunk number. The sorted ids are
+        # packed back into an IdStore so the full list is only held while sorting.
+        sorted_campaigns = IdStore(sorted(campaign_ids))
         chunk_bookmark = int(get_bookmark(
             state, ['reports_email_activity_next_chunk'], 0))
         for i, campaign_chunk in enumerate(chunk_campaigns(sorted_campaigns, chunk_bookmark)):
+            check_time_budget(client)
             write_email_activity_chunk_bookmark(
-                state, chunk_bookmark, i, sorted_campaigns)
+                state, chunk_bookmark, i)
             sync_email_activity(client, catalog, state,
-                                start_date, campaign_chunk)
+                                start_date, campaign_chunk, synced_campaigns=synced_campaigns)
         # Start from the beginning next time
         write_bookmark(state, ['reports_email_activity_next_chunk'], 0)
-## TODO: is current_stream being updated?
+
+def compact_state(client, state, id_bag):
+    """
+    At the end of a complete run, drop the bookmarks of the lists and campaigns
+    that were not returned by it, and with `state_retention_days` replace the
+    email activity bookmarks of old campaigns by a watermark.
+    """
+    live_ids = {stream_name: set(id_bag[stream_name]) for stream_name in ('lists', 'campaigns')
+                if id_bag.get(stream_name) is not None}
+    prune_bookmarks(state, live_ids, lambda _id: in_shard(client, _id))
+    if client.state_retention_days and 'campaigns' in live_ids:
+        send_times = {campaign_id: fields.get('send_time')
+                      for campaign_id, fields in id_bag.get('campaigns_index', {}).items()}
+        apply_retention(state, send_times, client.state_retention_days, id_bag.get('email_activity_synced', {}))
+
+def set_current_stream(state, stream_name):
+    if stream_name is None:
+        state.pop('current_stream', None)
+    else:
+        state['current_stream'] = stream_name
+    output.write_state(state)
+
+def get_completed_streams(state, endpoints):
+    """
+    Streams finished by an interrupted previous run. States written before
+    `completed_streams` existed only have `current_stream`, every stream before
+    it in the default order was finished.
+    """
+    if 'completed_streams' in state:
+        return set(state['completed_streams'])
+
+    completed_streams = set()
+    current_stream = state.get('current_stream')
+    if current_stream:
+        for stream_name, endpoint_config in endpoints.items():
+            if stream_name == current_stream:
+                break
+            completed_streams.add(stream_name)
+            completed_streams.update(get_dependants({'children': endpoint_config.get('children', {})}))
+    return completed_streams
+
+def record_stream_durations(state, stream_name, endpoint_config, duration, child_durations):
+    """
+    Record the time spent in the stream itself, without its children, and in
+    each child synced this run. `child_durations` has the time spent in each
+    child stream over every parent, including its own children.
+    """
+    children = {child_stream_name: child_endpoint_config
+                for child_stream_name, child_endpoint_config in endpoint_config.get('children', {}).items()
+                if child_stream_name in child_durations}
+    own_duration = duration - sum(child_durations[child_stream_name] for child_stream_name in children)
+    state.setdefault('stream_durations', {})[stream_name] = round(max(own_duration, 0), 3)
+    for child_stream_name, child_endpoint_config in children.items():
+        record_stream_durations(state, child_stream_name, child_endpoint_config,
+                                child_durations[child_stream_name], child_durations)
+
+def mark_stream_completed(state, streams_to_sync, stream_name, endpoint_config, duration, child_durations):
+    """Record that the stream and its children are done and how long they took."""
+    completed_streams = streams_to_sync['completed_streams']
+    completed_streams.add(stream_name)
+    completed_streams.update(get_dependants({'children': endpoint_config.get('children', {})}))
+    state['completed_streams'] = sorted(completed_streams)
+    record_stream_durations(state, stream_name, endpoint_config, duration, child_durations)
+    output.write_state(state)
+
+def get_stream_order(state, endpoints, email_activity_pending, selected_streams=None):
+    """
+    Order the top-level streams for this run.
+
+    campaigns goes first when the email activity is still to be synced, so its
+    batch can be submitted and exported server-side while the other streams
+    sync. The remaining streams run shortest first, based on the durations
+    recorded by previous runs, so a time-budgeted run completes (and does not
+    have to repeat) as many streams as possible. A stream's duration is its
+    own plus that of its children in `selected_streams` (all when None).
+    Streams without a recorded duration run after the others, in their
+    default order.
+    """
+    durations = state.get('stream_durations', {})
+
+    def get_duration(stream_name):
+        children = [child_stream_name
+                    for child_stream_name in get_dependants({'children': endpoints[stream_name].get('children', {})})
+                    if selected_streams is None or child_stream_name in selected_streams]
+        return durations[stream_name] + sum(durations.get(child_stream_name, 0) for child_stream_name in children)
+
+    first = ['campaigns'] if email_activity_pending and 'campaigns' in endpoints else []
+    rest = [stream_name for stream_name in endpoints if stream_name not in first]
+    known = sorted((stream_name for stream_name in rest if stream_name in durations), key=get_duration)
+    return first + known + [stream_name for stream_name in rest if stream_name not in durations]
 
 def sync(client, catalog, state, start_date):
-    streams_to_sync = {
-        'selected_streams': get_selected_streams(catalog),
-        'last_stream': state.get('current_stream')
-    }
+    selected_streams = get_selected_streams(catalog)
 
-    if not streams_to_sync['selected_streams']:
+    if not selected_streams:
         return
 
+    WRITTEN_SCHEMAS.clear()
     id_bag = {}
+    decode_bookmarks(state)
 
     endpoints = {
         'lists': {
@@ -514,20 +1378,27 @@ def sync(client, catalog, state, start_date):
                 'sort_field': 'date_created',
                 'sort_dir': 'ASC'
             },
+            'store_ids': True,
+            'sharded': True,
             'children': {
                 'list_members': {
                     'path': '/lists/{}/members',
                     'data_path': 'members',
                     'bookmark_query_field': 'since_last_changed',
-                    'bookmark_field': 'last_changed'
+                    'window_query_field': 'before_last_changed',
+                    'bookmark_field': 'last_changed',
+                    'keyset_field': 'last_changed',
+                    'partition_query_field': 'status'
                 },
                 'list_segments': {
                     'path': '/lists/{}/segments',
                     'data_path': 'segments',
+                    'index_fields': ['type', 'member_count', 'updated_at'],
                     'children': {
                         'list_segment_members': {
                             'path': '/lists/{}/segments/{}/members',
-                            'data_path': 'members'
+                            'data_path': 'members',
+                            'skip_unchanged': True
                         }
                     }
                 }
@@ -544,9 +1415,16 @@ def sync(client, catalog, state, start_date):
                 'sort_dir': 'ASC'
             },
             'store_ids': True,
+            'sharded': True,
+            # Send times, for the email activity watermark and date window
+            'index_fields': ['send_time'],
+            'window_index_field': 'send_time',
+            'window_index_query_field': 'since_send_time',
             'children': {
                 'unsubscribes': {
-                    'path': '/reports/{}/unsubscribed'
+                    'path': '/reports/{}/unsubscribed',
+                    'report_count_field': 'unsubscribed',
+                    'append_key': 'email_id'
                 }
             }
         },
@@ -555,14 +1433,55 @@ def sync(client, catalog, state, start_date):
         }
     }
 
-    for stream_name, endpoint_config in endpoints.items():
-        sync_stream(client,
-                    catalog,
-                    state,
-                    start_date,
-                    streams_to_sync,
-                    id_bag,
-                    stream_name,
-                    endpoint_config)
-
-    sync_reports_email_activity(streams_to_sync, id_bag, client, catalog, state, start_date, endpoints["campaigns"])
+    streams_to_sync = {
+        'selected_streams': selected_streams,
+        'completed_streams': get_completed_streams(state, endpoints)
+    }
+    email_activity_pending = 'reports_email_activity' in selected_streams and \
+        'reports_email_activity' not in streams_to_sync['completed_streams']
+
+    client.stage_metrics.reset(client.metrics_interval)
+    # Records and states go to stdout, or to batch files when `batch_dir` is set
+    # Each map is compressed again only once it changed
+    encode_state = partial(encode_bookmarks, cache={}) if client.compress_state_bookmarks else None
+    with recording(client.stage_metrics), output.writing(output.get_writer(client), encode_state):
+        try:
+            for stream_name in get_stream_order(state, endpoints, email_activity_pending, selected_streams):
+                endpoint_config = endpoints[stream_name]
+                if not endpoint_config.get('sharded') and not owns_unsharded_streams(client):
+                    continue
+                already_completed = stream_name in streams_to_sync['completed_streams']
+                if not already_completed:
+                    set_current_stream(state, stream_name)
+                start = time.monotonic()
+                sync_stream(client,
+                            catalog,
+                            state,
+                            start_date,
+                            streams_to_sync,
+                            id_bag,
+                            stream_name,
+                            endpoint_config)
+                if not already_completed:
+                    mark_stream_completed(state, streams_to_sync, stream_name, endpoint_config,
+                                          time.monotonic() - start, id_bag.get('child_durations', {}))
+
+                if stream_name == 'campaigns' and email_activity_pending:
+                    submit_email_activity_batch(streams_to_sync, id_bag, client, catalog, state, start_date)
+
+            set_current_stream(state, 'reports_email_activity')
+            start = time.monotonic()
+            sync_reports_email_activity(streams_to_sync, id_bag, client, catalog, state, start_date)
+            state.setdefault('stream_durations', {})['reports_email_activity'] = round(time.monotonic() - start, 3)
+
+            compact_state(client, state, id_bag)
+
+            # The run is complete, the next one starts from scratch
+            state.pop('completed_streams', None)
+            set_current_stream(state, None)
+        except TimeBudgetExceeded:
+            LOGGER.warning('Stopping sync, max_runtime_seconds elapsed. The next run resumes from stream %s',
+                           state.get('current_stream'))
+            output.write_state(state)
+        finally:
+            client.stage_metrics.log_summary()
@@ -0,0 +1,106 @@
+import sys
+import copy
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import singer
+from singer import Transformer
+from singer.messages import RecordMessage, format_message
+
+from tap_mailchimp.instrumentation import current_metrics, TRANSFORM, WRITE
+from tap_mailchimp.output import StdoutWriter
+
+LOGGER = singer.get_logger()
+
+PAGE = 'page'
+RECORD = 'record'
+STATE = 'state'
+
+def transform_page(stream_name, schema, stream_metadata, records, transformed=False):
+    """
+    Runs in a worker process: transform a page of records, unless already
+    `transformed`, and format their RECORD messages.
+    """
+    start = time.perf_counter()
+    lines = []
+    with Transformer() as transformer:
+        for record in records:
+            if not transformed:
+                record = transformer.transform(record, schema, stream_metadata)
+            lines.append(format_message(RecordMessage(stream=stream_name, record=record)))
+    lines.append('')
+    return '\n'.join(lines), time.perf_counter() - start
+
+class TransformPoolWriter(StdoutWriter):
+    """
+    Transforms and serializes pages of records on a pool of `workers`
+    processes while the sync fetches the next pages. Pages already
+    transformed by the sync, like the flattened email activity, are only
+    serialized.
+
+    The output keeps the order of the sync: records and states written while
+    pages are in the pool queue up behind them, so a STATE message is only
+    written once every page before it is. At most `max_pending` pages are in
+    the pool, submitting more waits for the oldest one.
+    """
+    pooled = True
+
+    def __init__(self, workers, max_pending=None):
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.pending = deque()
+        self.pages_in_flight = 0
+        self.__executor = None
+
+    def submit_page(self, stream_name, schema, stream_metadata, records, transformed=False):
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+        future = self.__executor.submit(transform_page, stream_name, schema, stream_metadata, records, transformed)
+        self.pending.append((PAGE, stream_name, future, len(records), transformed))
+        self.pages_in_flight += 1
+        self.drain(self.max_pending)
+
+    def write_record(self, stream_name, record):
+        if self.pending:
+            self.pending.append((RECORD, stream_name, record))
+        else:
+            super().write_record(stream_name, record)
+
+    def write_state(self, state):
+        if self.pending:
+            # The state is still being updated by the sync, keep it as it is now
+            self.pending.append((STATE, copy.deepcopy(state)))
+        else:
+            super().write_state(state)
+
+    def drain(self, max_pages_in_flight):
+        """Write the finished head of the queue, waiting for pages while more than `max_pages_in_flight` are left."""
+        while self.pending:
+            item = self.pending[0]
+            if item[0] == PAGE:
+                _, stream_name, future, count, transformed = item
+                if not future.done() and self.pages_in_flight <= max_pages_in_flight:
+                    return
+                text, transform_time = future.result()
+                start = time.perf_counter()
+                sys.stdout.write(text)
+                sys.stdout.flush()
+                stage_metrics = current_metrics()
+                if not transformed:
+                    stage_metrics.add(stream_name, TRANSFORM, transform_time, count)
+                stage_metrics.add(stream_name, WRITE, time.perf_counter() - start, count)
+                self.pages_in_flight -= 1
+            elif item[0] == RECORD:
+                super().write_record(item[1], item[2])
+            else:
+                super().write_state(item[1])
+            self.pending.popleft()
+
+    def close(self):
+        try:
+            self.drain(0)
+        finally:
+            if self.__executor is not None:
+                self.__executor.shutdown(cancel_futures=True)
+                self.__executor = None
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Measure the per-row cost of flattening and transforming reports_email_activity.
+
+    python tests/benchmarks/benchmark_flatten.py --emails 20000 --activities-per-email 5
+
+Builds a synthetic batch operation response with the simulator, then times
+the flatten + Transformer path the tap used before (a copy of the email per
+activity, transformed by singer's Transformer) against the fused
+ActivityFlattener, after checking that both produce the same records.
+"""
+import sys
+import json
+import time
+import argparse
+
+from singer import Transformer
+
+from tap_mailchimp.activity import ActivityFlattener
+from tap_mailchimp.schema import get_schemas
+
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-order
+
+STREAM_METADATA = {(): {'selected': True}}
+
+
+def flatten_and_transform(emails, schema):
+    """The flatten and transform of reports_email_activity before ActivityFlattener."""
+    with Transformer() as transformer:
+        for email in emails:
+            if 'activity' in email:
+                if '_links' in email:
+                    del email['_links']
+                template = dict(email)
+                del template['activity']
+                for activity in email['activity']:
+                    record = dict(template)
+                    for key, value in activity.items():
+                        record[key] = value
+                    yield transformer.transform(record, schema, STREAM_METADATA)
+
+
+def flatten_fused(emails, schema):
+    return ActivityFlattener(schema, STREAM_METADATA).flatten(emails)
+
+
+def time_path(flatten, response, schema, repeat):
+    """Best time of `repeat` runs, decoding the operation response is not timed."""
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        emails = json.loads(response)['emails']
+        start = time.perf_counter()
+        rows = sum(1 for _ in flatten(emails, schema))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--emails', type=int, default=20000)
+    parser.add_argument('--activities-per-email', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    simulator = MailchimpSimulator(activities_per_email=args.activities_per_email)
+    emails = [simulator.email_activity_record('camp000000', index) for index in range(args.emails)]
+    response = json.dumps({'emails': emails})
+    schema = get_schemas()[0]['reports_email_activity']
+
+    if list(flatten_and_transform(json.loads(response)['emails'], schema)) != \
+       list(flatten_fused(json.loads(response)['emails'], schema)):
+        raise Exception('The fused path produced different records')
+
+    print('{:<22} {:>10} {:>10} {:>12}'.format('path', 'rows', 'seconds', 'us/row'))
+    for name, flatten in (('flatten + Transformer', flatten_and_transform), ('fused', flatten_fused)):
+        elapsed, rows = time_path(flatten, response, schema, args.repeat)
+        print('{:<22} {:>10} {:>10.3f} {:>12.2f}'.format(name, rows, elapsed, elapsed / rows * 1e6))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
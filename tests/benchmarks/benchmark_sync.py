@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Run the full tap against the local Mailchimp simulator and report throughput.
+
+    python tests/benchmarks/benchmark_sync.py --members-per-list 100000 --campaigns 200
+
+Prints records/sec, request counts and wall time per stream, plus the total
+wall time and peak RSS of the run. Use --json to get the report as JSON for
+comparing runs.
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import resource
+from collections import defaultdict
+from contextlib import redirect_stdout
+
+from tap_mailchimp.client import MailchimpClient
+from tap_mailchimp.discover import discover
+from tap_mailchimp.sync import sync
+
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-order
+
+START_DATE = '2019-01-01T00:00:00Z'
+
+
+class MessageCounter(io.TextIOBase):
+    """Stdout replacement counting the Singer messages written per stream."""
+    def __init__(self):
+        super().__init__()
+        self.records = defaultdict(int)
+        self.first_record = {}
+        self.last_record = {}
+        self.messages = defaultdict(int)
+        self.bytes = 0
+        self.last_state = None
+        self.__pending = ''
+
+    def write(self, text):
+        self.bytes += len(text)
+        self.__pending += text
+        *lines, self.__pending = self.__pending.split('\n')
+        for line in lines:
+            if line:
+                self.handle_message(json.loads(line))
+        return len(text)
+
+    def handle_message(self, message):
+        message_type = message['type']
+        self.messages[message_type] += 1
+        if message_type == 'RECORD':
+            stream = message['stream']
+            now = time.perf_counter()
+            self.records[stream] += 1
+            self.first_record.setdefault(stream, now)
+            self.last_record[stream] = now
+        elif message_type == 'STATE':
+            self.last_state = message['value']
+
+
+def select_all(catalog, unselected_streams=()):
+    for stream in catalog.streams:
+        for entry in stream.metadata:
+            if not entry['breadcrumb']:
+                # Set either way, the metadata of a previous discovery may be shared
+                entry['metadata']['selected'] = stream.tap_stream_id not in unselected_streams
+    return catalog
+
+
+def run_benchmark(simulator, config=None, state=None, stream_names=None, unselected_streams=()):
+    """
+    Discover and sync every stream (or `stream_names`) against a running
+    simulator, `unselected_streams` are kept in the catalog but not selected.
+    """
+    config = {
+        'api_key': 'simulator',
+        'dc': 'us1',
+        'base_url': simulator.base_url,
+        'start_date': START_DATE,
+        **(config or {}),
+    }
+    output = MessageCounter()
+    with MailchimpClient(config) as client:
+        catalog = discover(client)
+        if stream_names:
+            catalog.streams = [stream for stream in catalog.streams if stream.tap_stream_id in stream_names]
+        select_all(catalog, unselected_streams)
+        simulator.request_counts.clear()
+
+        start = time.perf_counter()
+        with redirect_stdout(output):
+            sync(client, catalog, state or {}, config['start_date'])
+        wall_time = time.perf_counter() - start
+
+    streams = {}
+    for stream, count in sorted(output.records.items()):
+        stream_time = output.last_record[stream] - output.first_record[stream]
+        streams[stream] = {
+            'records': count,
+            'requests': simulator.request_counts.get(stream, 0),
+            'wall_time': stream_time,
+            'records_per_second': count / stream_time if stream_time else None,
+        }
+
+    total_records = sum(output.records.values())
+    return {
+        'streams': streams,
+        'requests': dict(simulator.request_counts),
+        'messages': dict(output.messages),
+        'output_bytes': output.bytes,
+        'records': total_records,
+        'wall_time': wall_time,
+        'records_per_second': total_records / wall_time if wall_time else None,
+        # ru_maxrss is reported in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'state': output.last_state,
+    }
+
+
+def format_report(report):
+    lines = ['{:<25} {:>10} {:>9} {:>10} {:>12}'.format('stream', 'records', 'requests', 'wall (s)', 'records/s')]
+    for stream, stats in report['streams'].items():
+        lines.append('{:<25} {:>10} {:>9} {:>10.2f} {:>12}'.format(
+            stream,
+            stats['records'],
+            stats['requests'],
+            stats['wall_time'],
+            '{:.0f}'.format(stats['records_per_second']) if stats['records_per_second'] else '-'))
+    lines.append('')
+    lines.append('requests: {}'.format(', '.join('{}={}'.format(endpoint, count)
+                                                 for endpoint, count in sorted(report['requests'].items()))))
+    lines.append('total: {} records in {:.2f}s ({:.0f} records/s), {} output bytes, peak RSS {:.1f} MB'.format(
+        report['records'],
+        report['wall_time'],
+        report['records_per_second'] or 0,
+        report['output_bytes'],
+        report['peak_rss_mb']))
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lists', type=int, default=2)
+    parser.add_argument('--members-per-list', type=int, default=10000)
+    parser.add_argument('--segments-per-list', type=int, default=5)
+    parser.add_argument('--members-per-segment', type=int, default=100)
+    parser.add_argument('--campaigns', type=int, default=50)
+    parser.add_argument('--unsubscribes-per-campaign', type=int, default=20)
+    parser.add_argument('--emails-per-campaign', type=int, default=200)
+    parser.add_argument('--activities-per-email', type=int, default=3)
+    parser.add_argument('--automations', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help='share of requests answered with a 429')
+    parser.add_argument('--server-error-ratio', type=float, default=0.0, help='share of requests answered with a 503')
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--config', help='json file with extra tap config')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {'page_size': args.page_size}
+    if args.config:
+        with open(args.config, encoding='UTF-8') as file:
+            config.update(json.load(file))
+
+    simulator = MailchimpSimulator(lists=args.lists,
+                                   members_per_list=args.members_per_list,
+                                   segments_per_list=args.segments_per_list,
+                                   members_per_segment=args.members_per_segment,
+                                   campaigns=args.campaigns,
+                                   unsubscribes_per_campaign=args.unsubscribes_per_campaign,
+                                   emails_per_campaign=args.emails_per_campaign,
+                                   activities_per_email=args.activities_per_email,
+                                   automations=args.automations,
+                                   latency=args.latency,
+                                   rate_limit_ratio=args.rate_limit_ratio,
+                                   server_error_ratio=args.server_error_ratio)
+    with simulator:
+        report = run_benchmark(simulator, config)
+
+    if args.json:
+        report.pop('state')
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,480 @@
+"""
+Local stand-in for the parts of the Mailchimp API used by `sync()`.
+
+Records are generated deterministically from their index, so any scale can
+be served without holding the data set in memory. The simulator can inject
+latency, 429 and 5xx responses and counts the requests it receives per
+endpoint.
+
+    with MailchimpSimulator(lists=2, members_per_list=10000) as simulator:
+        config = {'api_key': 'key', 'base_url': simulator.base_url, ...}
+"""
+import io
+import gzip
+import json
+import time
+import random
+import tarfile
+import threading
+import hashlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BASE_TIME = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+MEMBER_STATUSES = ['subscribed'] * 6 + ['unsubscribed', 'cleaned', 'pending', 'transactional']
+
+ACTIVITY_ACTIONS = ['open', 'click', 'bounce']
+
+def format_time(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+def parse_time(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def links():
+    return [{'rel': 'self', 'href': 'https://example.com', 'method': 'GET'}]
+
+
+class MailchimpSimulator:
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self,
+                 lists=2,
+                 members_per_list=100,
+                 members_per_minute=1,
+                 member_statuses=None,
+                 exclusive_member_since=False,
+                 segments_per_list=2,
+                 segment_types=('static',),
+                 members_per_segment=10,
+                 campaigns=5,
+                 unsubscribes_per_campaign=5,
+                 emails_per_campaign=20,
+                 activities_per_email=3,
+                 automations=3,
+                 latency=0.0,
+                 rate_limit_ratio=0.0,
+                 server_error_ratio=0.0,
+                 batch_polls_before_finish=0,
+                 gzip_json=False,
+                 truncated_responses=None,
+                 seed=0):
+        self.lists = lists
+        self.members_per_list = members_per_list
+        # Members sharing a last_changed timestamp, as after a bulk import
+        self.members_per_minute = members_per_minute
+        # Cycled through by the members, in order
+        self.member_statuses = member_statuses or MEMBER_STATUSES
+        # since_last_changed excludes the members changed at that time, like before_last_changed
+        self.exclusive_member_since = exclusive_member_since
+        self.segments_per_list = segments_per_list
+        # Cycled through by the segments, in order
+        self.segment_types = segment_types
+        self.members_per_segment = members_per_segment
+        self.campaigns = campaigns
+        self.unsubscribes_per_campaign = unsubscribes_per_campaign
+        self.emails_per_campaign = emails_per_campaign
+        self.activities_per_email = activities_per_email
+        self.automations = automations
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.server_error_ratio = server_error_ratio
+        self.batch_polls_before_finish = batch_polls_before_finish
+        # Send the JSON responses with Content-Encoding: gzip when accepted
+        self.gzip_json = gzip_json
+        # Number of responses of an endpoint cut off half way, by endpoint
+        self.truncated_responses = Counter(truncated_responses or {})
+
+        self.request_counts = Counter()
+        self.bytes_sent = 0
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__batches = {}
+        self.__server = None
+        self.__thread = None
+
+    # ---- lifecycle ----
+
+    def start(self):
+        simulator = self
+
+        class Handler(SimulatorRequestHandler):
+            pass
+        Handler.simulator = simulator
+
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        if self.__server:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def base_url(self):
+        host, port = self.__server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    # ---- data generation ----
+
+    @staticmethod
+    def list_id(index):
+        return 'list{:06d}'.format(index)
+
+    @staticmethod
+    def campaign_id(index):
+        return 'camp{:06d}'.format(index)
+
+    @staticmethod
+    def member_id(email):
+        return hashlib.md5(email.encode('utf-8')).hexdigest()
+
+    def list_record(self, index):
+        return {
+            'id': self.list_id(index),
+            'web_id': str(index),
+            'name': 'List {}'.format(index),
+            'date_created': format_time(BASE_TIME + timedelta(days=index)),
+            'stats': {'member_count': self.members_per_list},
+            '_links': links(),
+        }
+
+    def member_last_changed(self, index):
+        return BASE_TIME + timedelta(minutes=index // self.members_per_minute)
+
+    def member_record(self, list_id, index):
+        email = 'member{}@{}.example.com'.format(index, list_id)
+        return {
+            'id': self.member_id(email),
+            'email_address': email,
+            'unique_email_id': 'u{}'.format(index),
+            'email_type': 'html',
+            'status': self.member_status(index),
+            'merge_fields': {'FNAME': 'First{}'.format(index), 'LNAME': 'Last{}'.format(index)},
+            'stats': {'avg_open_rate': 0.5, 'avg_click_rate': 0.1},
+            'timestamp_signup': format_time(BASE_TIME),
+            'member_rating': 2,
+            'last_changed': format_time(self.member_last_changed(index)),
+            'language': 'en',
+            'vip': False,
+            'location': {'latitude': 0, 'longitude': 0},
+            'tags_count': 0,
+            'tags': [],
+            'list_id': list_id,
+            '_links': links(),
+        }
+
+    def segment_record(self, list_id, index):
+        return {
+            'id': index + 1,
+            'name': 'Segment {}'.format(index),
+            'member_count': self.members_per_segment,
+            'type': self.segment_types[index % len(self.segment_types)],
+            'created_at': format_time(BASE_TIME),
+            'updated_at': format_time(BASE_TIME),
+            'options': {},
+            'list_id': list_id,
+            '_links': links(),
+        }
+
+    def campaign_send_time(self, index):
+        return BASE_TIME + timedelta(hours=index)
+
+    def campaign_record(self, index):
+        return {
+            'id': self.campaign_id(index),
+            'web_id': index,
+            'type': 'regular',
+            'create_time': format_time(self.campaign_send_time(index)),
+            'status': 'sent',
+            'emails_sent': self.emails_per_campaign,
+            'send_time': format_time(self.campaign_send_time(index)),
+            'recipients': {'list_id': self.list_id(index % max(self.lists, 1))},
+            'settings': {'subject_line': 'Campaign {}'.format(index)},
+            'report_summary': {'opens': 1, 'unique_opens': 1},
+            '_links': links(),
+        }
+
+    def report_record(self, index):
+        return {
+            'id': self.campaign_id(index),
+            'campaign_title': 'Campaign {}'.format(index),
+            'emails_sent': self.emails_per_campaign,
+            'unsubscribed': self.unsubscribes_per_campaign,
+            'send_time': format_time(self.campaign_send_time(index)),
+            '_links': links(),
+        }
+
+    def unsubscribe_record(self, campaign_id, index):
+        email = 'unsub{}@{}.example.com'.format(index, campaign_id)
+        return {
+            'email_id': self.member_id(email),
+            'email_address': email,
+            'merge_fields': {},
+            'vip': False,
+            'timestamp': format_time(BASE_TIME + timedelta(minutes=index)),
+            'reason': 'N/A',
+            'campaign_id': campaign_id,
+            'list_id': 'list000000',
+            'list_is_active': True,
+            '_links': links(),
+        }
+
+    def automation_record(self, index):
+        return {
+            'id': 'auto{:06d}'.format(index),
+            'create_time': format_time(BASE_TIME),
+            'status': 'sending',
+            'emails_sent': 1,
+            'settings': {},
+            '_links': links(),
+        }
+
+    def email_activity_record(self, campaign_id, index, since=None):
+        email = 'member{}@example.com'.format(index)
+        activity = []
+        for activity_index in range(self.activities_per_email):
+            timestamp = BASE_TIME + timedelta(hours=index, minutes=activity_index)
+            if since and timestamp <= since:
+                continue
+            activity.append({
+                'action': ACTIVITY_ACTIONS[activity_index % len(ACTIVITY_ACTIONS)],
+                'timestamp': format_time(timestamp),
+                'ip': '127.0.0.1',
+            })
+        return {
+            'campaign_id': campaign_id,
+            'list_id': 'list000000',
+            'list_is_active': True,
+            'email_id': self.member_id(email),
+            'email_address': email,
+            'activity': activity,
+            '_links': links(),
+        }
+
+    # ---- endpoints ----
+
+    @staticmethod
+    def page(data_key, indexes, make_record, params):
+        """Return the `count`/`offset` page of the records at `indexes`."""
+        count = int(params.get('count', 10))
+        offset = int(params.get('offset', 0))
+        selected = indexes[offset:offset + count]
+        return {
+            data_key: [make_record(index) for index in selected],
+            'total_items': len(indexes),
+            '_links': links(),
+        }
+
+    def member_status(self, index):
+        return self.member_statuses[index % len(self.member_statuses)]
+
+    def get_members(self, list_id, params, total):
+        since = params.get('since_last_changed')
+        before = params.get('before_last_changed')
+        status = params.get('status')
+        indexes = range(total)
+        if since or before or status or 'archived' in self.member_statuses:
+            since = parse_time(since) if since else None
+            before = parse_time(before) if before else None
+            indexes = [
+                index for index in indexes
+                if (since is None or self.member_last_changed(index) > since or
+                    (self.member_last_changed(index) == since and not self.exclusive_member_since)) and
+                (before is None or self.member_last_changed(index) < before) and
+                # Archived members are only returned when asked for
+                (self.member_status(index) == status if status else self.member_status(index) != 'archived')
+            ]
+        if params.get('sort_dir') == 'DESC':
+            indexes = indexes[::-1]
+        return self.page('members', indexes, lambda index: self.member_record(list_id, index), params)
+
+    def get_campaigns(self, params):
+        since = params.get('since_send_time')
+        indexes = range(self.campaigns)
+        if since:
+            since = parse_time(since)
+            indexes = [index for index in range(self.campaigns)
+                       if self.campaign_send_time(index) >= since]
+        return self.page('campaigns', indexes, self.campaign_record, params)
+
+    def create_batch(self, body):
+        with self.__lock:
+            batch_id = 'batch{:04d}'.format(len(self.__batches))
+            self.__batches[batch_id] = {'operations': body['operations'], 'polls': 0,
+                                        'submitted_at': datetime.now(timezone.utc)}
+        return self.batch_info(batch_id, poll=False)
+
+    def batch_info(self, batch_id, poll=True):
+        batch = self.__batches.get(batch_id)
+        if batch is None:
+            return None
+        if poll:
+            batch['polls'] += 1
+        finished = batch['polls'] > self.batch_polls_before_finish
+        total = len(batch['operations'])
+        return {
+            'id': batch_id,
+            'status': 'finished' if finished else 'started',
+            'total_operations': total,
+            'finished_operations': total if finished else 0,
+            'errored_operations': 0,
+            'submitted_at': format_time(batch['submitted_at']),
+            'completed_at': format_time(batch['submitted_at'] + timedelta(minutes=1)),
+            'response_body_url': '{}/archives/{}.tar.gz'.format(self.base_url, batch_id) if finished else '',
+        }
+
+    def batch_archive(self, batch_id):
+        batch = self.__batches.get(batch_id)
+        if batch is None:
+            return None
+        responses = []
+        for operation in batch['operations']:
+            campaign_id = operation['operation_id']
+            since = operation.get('params', {}).get('since')
+            since = parse_time(since) if since else None
+            emails = [self.email_activity_record(campaign_id, index, since)
+                      for index in range(self.emails_per_campaign)]
+            responses.append({
+                'status_code': 200,
+                'operation_id': campaign_id,
+                'response': json.dumps({'emails': emails, 'campaign_id': campaign_id}),
+            })
+
+        content = json.dumps(responses).encode('utf-8')
+        buffer = io.BytesIO()
+        with tarfile.open(mode='w:gz', fileobj=buffer) as tar:
+            info = tarfile.TarInfo('{}/0.json'.format(batch_id))
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+        return buffer.getvalue()
+
+    def count_request(self, endpoint, size):
+        with self.__lock:
+            self.request_counts[endpoint] += 1
+            self.bytes_sent += size
+
+    def should_truncate(self, endpoint):
+        with self.__lock:
+            if self.truncated_responses[endpoint] > 0:
+                self.truncated_responses[endpoint] -= 1
+                return True
+            return False
+
+    def should_fail(self, ratio):
+        if not ratio:
+            return False
+        with self.__lock:
+            return self.__random.random() < ratio
+
+    def route(self, method, path, params, body):
+        # pylint: disable=too-many-return-statements,too-many-branches
+        """Return (endpoint name, status code, body) for a request."""
+        parts = [part for part in path.split('/') if part]
+        if parts[:1] == ['archives'] and len(parts) == 2:
+            return 'archive', 200, self.batch_archive(parts[1].split('.')[0])
+        if parts[:1] != ['3.0']:
+            return 'unknown', 404, None
+        parts = parts[1:]
+
+        if method == 'POST' and parts == ['batches']:
+            return 'create_batch', 200, self.create_batch(body)
+        if method != 'GET':
+            return 'unknown', 404, None
+
+        if parts == ['lists']:
+            return 'lists', 200, self.page('lists', range(self.lists), self.list_record, params)
+        if len(parts) == 3 and parts[0] == 'lists' and parts[2] == 'members':
+            return 'list_members', 200, self.get_members(parts[1], params, self.members_per_list)
+        if len(parts) == 3 and parts[0] == 'lists' and parts[2] == 'segments':
+            return 'list_segments', 200, self.page(
+                'segments', range(self.segments_per_list),
+                lambda index: self.segment_record(parts[1], index), params)
+        if len(parts) == 5 and parts[0] == 'lists' and parts[2] == 'segments':
+            return 'list_segment_members', 200, self.get_members(parts[1], params, self.members_per_segment)
+        if parts == ['campaigns']:
+            return 'campaigns', 200, self.get_campaigns(params)
+        if parts == ['reports']:
+            return 'reports', 200, self.page('reports', range(self.campaigns), self.report_record, params)
+        if len(parts) == 3 and parts[0] == 'reports' and parts[2] == 'unsubscribed':
+            return 'unsubscribes', 200, self.page(
+                'unsubscribes', range(self.unsubscribes_per_campaign),
+                lambda index: self.unsubscribe_record(parts[1], index), params)
+        if parts == ['automations']:
+            return 'automations', 200, self.page('automations', range(self.automations),
+                                                   self.automation_record, params)
+        if len(parts) == 2 and parts[0] == 'batches':
+            return 'get_batch_info', 200, self.batch_info(parts[1])
+        return 'unknown', 404, None
+
+
+class SimulatorRequestHandler(BaseHTTPRequestHandler):
+    simulator = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+    def handle_request(self, method):
+        simulator = self.simulator
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = None
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = json.loads(self.rfile.read(length))
+
+        if simulator.latency:
+            time.sleep(simulator.latency)
+
+        endpoint, status, payload = simulator.route(method, url.path, params, body)
+
+        if endpoint != 'archive':
+            if simulator.should_fail(simulator.rate_limit_ratio):
+                status, payload = 429, {'title': 'Too Many Requests'}
+            elif simulator.should_fail(simulator.server_error_ratio):
+                status, payload = 503, {'title': 'Service Unavailable'}
+
+        if payload is None:
+            status, payload = 404, {'title': 'Resource Not Found'}
+
+        if isinstance(payload, bytes):
+            content, content_type = payload, 'application/gzip'
+        else:
+            content, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        content_encoding = None
+        if content_type == 'application/json' and simulator.gzip_json and \
+           'gzip' in self.headers.get('Accept-Encoding', ''):
+            content, content_encoding = gzip.compress(content), 'gzip'
+        simulator.count_request(endpoint, len(content))
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if simulator.should_truncate(endpoint):
+            # The connection drops before the announced Content-Length is sent
+            self.wfile.write(content[:len(content) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(content)
+
+    def do_GET(self): # pylint: disable=invalid-name
+        self.handle_request('GET')
+
+    def do_POST(self): # pylint: disable=invalid-name
+        self.handle_request('POST')
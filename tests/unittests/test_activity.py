@@ -0,0 +1,83 @@
+import copy
+import unittest
+
+from singer import Transformer
+
+from tap_mailchimp.activity import ActivityFlattener, SLOW, convert_datetime
+from tap_mailchimp.schema import get_schemas
+
+SCHEMA = get_schemas()[0]['reports_email_activity']
+STREAM_METADATA = {(): {'selected': True}}
+
+
+def email(activity, **fields):
+    return {
+        'campaign_id': 'camp000000',
+        'list_id': 'list000000',
+        'list_is_active': True,
+        'email_id': 'e1',
+        'email_address': 'member@example.com',
+        'activity': activity,
+        '_links': [],
+        **fields,
+    }
+
+
+def flatten_and_transform(emails, stream_metadata):
+    """Reference: a copy of the email per activity, transformed by the Transformer."""
+    records = []
+    with Transformer() as transformer:
+        for record in emails:
+            template = {key: value for key, value in record.items() if key not in ('activity', '_links')}
+            for activity in record['activity']:
+                records.append(transformer.transform({**template, **activity}, SCHEMA, stream_metadata))
+    return records
+
+
+class TestActivityFlattener(unittest.TestCase):
+
+    def assert_same_as_transformer(self, emails, stream_metadata=None):
+        stream_metadata = stream_metadata or STREAM_METADATA
+        expected = flatten_and_transform(copy.deepcopy(emails), stream_metadata)
+
+        records = list(ActivityFlattener(SCHEMA, stream_metadata).flatten(emails))
+
+        self.assertEqual(records, expected)
+        self.assertEqual([list(record) for record in records], [list(record) for record in expected])
+
+    def test_records_match_the_transformer(self):
+        self.assert_same_as_transformer([
+            email([{'action': 'open', 'timestamp': '2020-01-01T00:00:00+00:00', 'ip': '127.0.0.1'},
+                   {'action': 'click', 'timestamp': '2020-01-01T00:01:00+00:00', 'ip': '127.0.0.1',
+                    'url': 'https://example.com', 'type': None}]),
+            email([], email_id='e2'),
+        ])
+
+    def test_values_the_converters_do_not_handle(self):
+        self.assert_same_as_transformer([
+            # A timestamp in another format, and a number in a string field
+            email([{'action': 'open', 'timestamp': '2020-01-01T01:00:00Z', 'ip': 127}]),
+            email([{'action': 'open', 'timestamp': '2020-01-01T00:00:00+00:00'}], list_is_active='false'),
+        ])
+
+    def test_unselected_and_unknown_fields_are_dropped(self):
+        stream_metadata = {(): {'selected': True},
+                           ('properties', 'ip'): {'selected': False, 'inclusion': 'available'}}
+
+        self.assert_same_as_transformer([
+            email([{'action': 'open', 'timestamp': '2020-01-01T00:00:00+00:00', 'ip': '127.0.0.1',
+                    'new_field': 1}], other=2),
+        ], stream_metadata)
+
+    def test_max_timestamp(self):
+        flattener = ActivityFlattener(SCHEMA, STREAM_METADATA)
+        flattener.max_timestamp = '2020-01-01T00:01:00+00:00'
+
+        list(flattener.flatten([email([{'action': 'open', 'timestamp': '2020-01-01T00:02:00+00:00'},
+                                       {'action': 'open', 'timestamp': '2020-01-01T00:00:00+00:00'}])]))
+
+        self.assertEqual(flattener.max_timestamp, '2020-01-01T00:02:00+00:00')
+
+    def test_invalid_date_goes_through_the_transformer(self):
+        self.assertEqual(convert_datetime('2020-01-01T00:00:00+00:00'), '2020-01-01T00:00:00.000000Z')
+        self.assertIs(convert_datetime('2020-02-30T00:00:00+00:00'), SLOW)
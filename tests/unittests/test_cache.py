@@ -0,0 +1,95 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from tap_mailchimp.cache import get_cache_key, read_cache, write_cache
+from tap_mailchimp.client import MailchimpClient
+
+
+def get_mock_metadata_response(*args, **kwargs):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b'{"api_endpoint": "https://us1.api.mailchimp.com"}'
+    return response
+
+
+class TestCache(unittest.TestCase):
+
+    def test_cache_round_trip(self):
+        """
+            Verify that a written value is read back while it is fresh
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            write_cache(cache_dir, 'catalog', 'key', {'streams': []})
+
+            self.assertEqual(read_cache(cache_dir, 'catalog', 'key', 60), {'streams': []})
+            self.assertIsNone(read_cache(cache_dir, 'catalog', 'other', 60))
+
+    def test_expired_cache_is_ignored(self):
+        """
+            Verify that values older than the ttl are not returned
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            write_cache(cache_dir, 'catalog', 'key', {'streams': []})
+            with patch('tap_mailchimp.cache.time.time', return_value=10 ** 12):
+                self.assertIsNone(read_cache(cache_dir, 'catalog', 'key', 60))
+
+    def test_cache_key_does_not_contain_credentials(self):
+        key = get_cache_key('secret-token', None, 'us1')
+
+        self.assertNotIn('secret-token', key)
+        self.assertNotEqual(key, get_cache_key('other-token', None, 'us1'))
+
+    def test_cache_key_changes_with_the_api_and_the_tap(self):
+        """
+            Verify that the cache is not shared across base URLs, tap versions or schema files
+        """
+        config = {'api_key': 'KEY', 'dc': 'us1'}
+        key = MailchimpClient(config).cache_key
+
+        self.assertEqual(MailchimpClient(config).cache_key, key)
+        self.assertNotEqual(MailchimpClient({**config, 'base_url': 'http://localhost:8080'}).cache_key, key)
+        with patch('tap_mailchimp.client.get_package_version', return_value='0.0.1'):
+            self.assertNotEqual(MailchimpClient(config).cache_key, key)
+        with patch('tap_mailchimp.client.get_schemas_digest', return_value='edited'):
+            self.assertNotEqual(MailchimpClient(config).cache_key, key)
+
+    def test_cache_key_is_only_computed_for_the_cache(self):
+        with patch('tap_mailchimp.client.get_schemas_digest') as mocked_digest:
+            client = MailchimpClient({'api_key': 'KEY', 'dc': 'us1'})
+
+        mocked_digest.assert_not_called()
+        self.assertTrue(client.cache_key)
+
+
+@patch('requests.Session.request', side_effect=get_mock_metadata_response)
+class TestApiEndpointCache(unittest.TestCase):
+
+    def test_api_endpoint_is_cached(self, mocked_request):
+        """
+            Verify that the OAuth metadata endpoint is only called once for the same access token
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = {'access_token': 'TOKEN', 'cache_dir': cache_dir}
+            first_client = MailchimpClient(config)
+            first_client.get_base_url()
+            second_client = MailchimpClient(config)
+            second_client.get_base_url()
+
+            cache_files = os.listdir(cache_dir)
+            with open(os.path.join(cache_dir, cache_files[0]), encoding='UTF-8') as file:
+                cached = json.load(file)
+
+        self.assertEqual(mocked_request.call_count, 1)
+        self.assertEqual(second_client.base_url, 'https://us1.api.mailchimp.com')
+        self.assertNotIn('TOKEN', json.dumps(cached) + cache_files[0])
+
+    def test_no_cache_without_cache_dir(self, mocked_request):
+        MailchimpClient({'access_token': 'TOKEN'}).get_base_url()
+        MailchimpClient({'access_token': 'TOKEN'}).get_base_url()
+
+        self.assertEqual(mocked_request.call_count, 2)
@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.cassette import Cassette, CassetteMissError, get_request_key # pylint: disable=wrong-import-position
+from tap_mailchimp.client import MailchimpClient # pylint: disable=wrong-import-position
+from tap_mailchimp.discover import discover # pylint: disable=wrong-import-position
+from tap_mailchimp.sync import sync # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import MessageCounter, select_all # pylint: disable=wrong-import-position
+
+NOW = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def run_sync(config):
+    output = MessageCounter()
+    with MailchimpClient(config) as client:
+        catalog = select_all(discover(client))
+        # The segments' synced_at is the time of the run, keep it the same across runs
+        with redirect_stdout(output), patch('tap_mailchimp.sync.now', return_value=NOW):
+            sync(client, catalog, {}, config['start_date'])
+    return output
+
+
+class TestCassette(unittest.TestCase):
+
+    def test_request_key_ignores_parameter_order(self):
+        self.assertEqual(get_request_key('get', 'http://x/lists', {'a': 1, 'b': 2}),
+                         get_request_key('GET', 'http://x/lists', {'b': 2, 'a': 1}))
+        self.assertNotEqual(get_request_key('POST', 'http://x/batches', json_body={'a': 1}),
+                            get_request_key('POST', 'http://x/batches', json_body={'a': 2}))
+
+    def test_replay_without_recording_raises(self):
+        with tempfile.TemporaryDirectory() as cassette_dir:
+            with self.assertRaises(CassetteMissError):
+                Cassette(cassette_dir, 'replay')
+
+    def test_record_and_replay_sync(self):
+        """
+            Verify that a sync recorded against the simulator replays offline with the
+            same output, including the streamed batch archive
+        """
+        with tempfile.TemporaryDirectory() as cassette_dir:
+            with MailchimpSimulator(lists=1, members_per_list=15, campaigns=2, emails_per_campaign=4) as simulator:
+                config = {'api_key': 'key', 'base_url': simulator.base_url, 'start_date': '2019-01-01T00:00:00Z',
+                          'page_size': 10, 'cassette_dir': cassette_dir}
+                recorded = run_sync({**config, 'cassette_mode': 'record'})
+
+            # The simulator is stopped, every response comes from the cassette
+            replayed = run_sync({**config, 'cassette_mode': 'replay'})
+
+            with self.assertRaises(CassetteMissError):
+                run_sync({**config, 'cassette_mode': 'replay', 'page_size': 5})
+
+        self.assertEqual(dict(replayed.records), dict(recorded.records))
+        self.assertEqual(replayed.records['reports_email_activity'], 24)
+        # Stream durations are timings of the run itself
+        recorded.last_state.pop('stream_durations')
+        replayed.last_state.pop('stream_durations')
+        self.assertEqual(replayed.last_state, recorded.last_state)
+
+    def test_record_and_replay_gzip_streamed_pages(self):
+        """
+            Verify that pages streamed with `stream_json` and sent gzip encoded are
+            recorded decoded and replay with the same output
+        """
+        with tempfile.TemporaryDirectory() as cassette_dir:
+            with MailchimpSimulator(lists=1, members_per_list=15, campaigns=2, emails_per_campaign=4,
+                                    gzip_json=True) as simulator:
+                config = {'api_key': 'key', 'base_url': simulator.base_url, 'start_date': '2019-01-01T00:00:00Z',
+                          'page_size': 10, 'cassette_dir': cassette_dir, 'stream_json': True}
+                recorded = run_sync({**config, 'cassette_mode': 'record'})
+
+            replayed = run_sync({**config, 'cassette_mode': 'replay'})
+
+        self.assertEqual(recorded.records['list_members'], 15)
+        self.assertEqual(dict(replayed.records), dict(recorded.records))
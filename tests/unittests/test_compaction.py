@@ -0,0 +1,214 @@
+import os
+import sys
+import zlib
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.compaction import (MAX_WATERMARK_COHORTS, WATERMARK, apply_retention, decode_bookmarks,
+                                      encode_bookmarks, get_email_activity_bookmark, is_encoded,
+                                      merge_watermarks, prune_bookmarks)
+from mailchimp_simulator import MailchimpSimulator, BASE_TIME # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+STREAMS = ['lists', 'list_members', 'campaigns', 'unsubscribes', 'reports_email_activity']
+CONFIG = {'page_size': 50}
+
+
+class TestPruneBookmarks(unittest.TestCase):
+
+    def test_deleted_lists_and_campaigns_are_dropped(self):
+        """
+            Verify that the bookmarks of the lists and campaigns no longer returned
+            are dropped at the end of the run
+        """
+        with MailchimpSimulator(lists=3, campaigns=4) as simulator:
+            state = run_benchmark(simulator, CONFIG, stream_names=STREAMS)['state']
+        self.assertEqual(len(state['bookmarks']['lists']), 3)
+        self.assertEqual(len(state['bookmarks']['reports_email_activity']), 4)
+
+        with MailchimpSimulator(lists=1, campaigns=2) as simulator:
+            state = run_benchmark(simulator, CONFIG, state=state, stream_names=STREAMS)['state']
+
+        self.assertEqual(list(state['bookmarks']['lists']), ['list000000'])
+        self.assertEqual(sorted(state['bookmarks']['reports_email_activity']), ['camp000000', 'camp000001'])
+        self.assertEqual(sorted(key for key in state['bookmarks']['campaigns'] if key != 'datetime'),
+                         ['camp000000', 'camp000001'])
+
+    def test_streams_not_synced_are_left_alone(self):
+        state = {'bookmarks': {'lists': {'list000000': {}}, 'campaigns': {'datetime': 'x', 'camp000000': {}}}}
+
+        prune_bookmarks(state, {'campaigns': set()}, lambda _id: True)
+
+        self.assertEqual(state['bookmarks'], {'lists': {'list000000': {}}, 'campaigns': {'datetime': 'x'}})
+
+    def test_deleted_campaigns_leave_the_watermark(self):
+        state = {'bookmarks': {WATERMARK: {'send_time': 'x', 'cohorts': [
+            {'datetime': 'y', 'campaign_ids': ['c1', 'c2']}, {'datetime': 'z', 'campaign_ids': ['c3']}]}}}
+
+        prune_bookmarks(state, {'campaigns': {'c2'}}, lambda _id: True)
+
+        self.assertEqual(state['bookmarks'][WATERMARK]['cohorts'], [{'datetime': 'y', 'campaign_ids': ['c2']}])
+
+    def test_ids_of_other_shards_are_kept(self):
+        state = {'bookmarks': {'lists': {'list000000': {}, 'list000001': {}}}}
+
+        prune_bookmarks(state, {'lists': set()}, lambda _id: _id == 'list000000')
+
+        self.assertEqual(state['bookmarks'], {'lists': {'list000001': {}}})
+
+
+class TestRetention(unittest.TestCase):
+
+    def test_old_campaigns_share_a_watermark(self):
+        """
+            Verify that the email activity bookmarks of campaigns sent before the
+            retention horizon are replaced by one watermark, still used to resume them
+        """
+        config = {**CONFIG, 'state_retention_days': 1}
+        horizon = BASE_TIME + timedelta(hours=2, minutes=30)
+        with mock.patch('tap_mailchimp.compaction.now', return_value=horizon + timedelta(days=1)), \
+             MailchimpSimulator(lists=1, campaigns=5) as simulator:
+            state = run_benchmark(simulator, config, stream_names=STREAMS)['state']
+
+        activity = state['bookmarks']['reports_email_activity']
+        self.assertEqual(sorted(activity), ['camp000003', 'camp000004'])
+        watermark = state['bookmarks'][WATERMARK]
+        self.assertEqual(watermark['send_time'], '2020-01-01T02:30:00.000000Z')
+        # The latest activity of the 20 emails
+        self.assertEqual(watermark['cohorts'], [{'datetime': '2020-01-01T19:02:00+00:00',
+                                                 'campaign_ids': ['camp000000', 'camp000001', 'camp000002']}])
+
+        self.assertEqual(get_email_activity_bookmark(state, 'camp000001', None), '2020-01-01T19:02:00+00:00')
+        self.assertEqual(get_email_activity_bookmark(state, 'camp000004', None), activity['camp000004'])
+        self.assertIsNone(get_email_activity_bookmark(state, 'camp000005', None))
+
+    def test_resumed_runs_read_no_activity_again(self):
+        """
+            Verify that the campaigns of the watermark are resumed from it run after run,
+            without reading their activity again
+        """
+        config = {**CONFIG, 'state_retention_days': 1}
+        horizon = BASE_TIME + timedelta(hours=2, minutes=30)
+        records = []
+        state = None
+        with mock.patch('tap_mailchimp.compaction.now', return_value=horizon + timedelta(days=1)), \
+             MailchimpSimulator(lists=1, campaigns=5) as simulator:
+            for _ in range(3):
+                report = run_benchmark(simulator, config, state=state, stream_names=['campaigns',
+                                                                                     'reports_email_activity'])
+                records.append(report['streams'].get('reports_email_activity', {}).get('records', 0))
+                state = report['state']
+
+        self.assertEqual(records, [300, 0, 0])
+        self.assertNotIn(None, state['bookmarks']['reports_email_activity'].values())
+        self.assertEqual(len(state['bookmarks'][WATERMARK]['cohorts']), 1)
+
+    def test_campaigns_without_a_bookmark_are_not_covered(self):
+        """
+            Verify that an old campaign that had no bookmark when the watermark was made,
+            e.g. whose operation failed, starts from the start date
+        """
+        state = {'bookmarks': {'reports_email_activity': {'c1': '2020-03-01T00:00:00+00:00'}}}
+        send_times = {'c1': '2019-01-01T00:00:00+00:00', 'c2': '2019-01-01T00:00:00+00:00'}
+
+        with mock.patch('tap_mailchimp.compaction.now', return_value=BASE_TIME):
+            apply_retention(state, send_times, 10, {'c1': '2020-03-02T00:00:00+00:00'})
+
+        self.assertEqual(get_email_activity_bookmark(state, 'c1', 'start'), '2020-03-01T00:00:00+00:00')
+        self.assertEqual(get_email_activity_bookmark(state, 'c2', 'start'), 'start')
+
+    def test_campaigns_not_synced_keep_their_bookmark(self):
+        state = {'bookmarks': {'reports_email_activity': {'c1': '2020-03-01T00:00:00+00:00',
+                                                          'c2': '2020-01-01T00:00:00+00:00'}}}
+        send_times = {'c1': '2019-01-01T00:00:00+00:00', 'c2': '2019-01-01T00:00:00+00:00'}
+
+        with mock.patch('tap_mailchimp.compaction.now', return_value=BASE_TIME):
+            self.assertEqual(apply_retention(state, send_times, 10, {'c1': '2020-03-02T00:00:00+00:00'}), 1)
+
+        self.assertEqual(state['bookmarks']['reports_email_activity'], {'c2': '2020-01-01T00:00:00+00:00'})
+
+    def test_watermark_advances_with_the_campaigns_synced_again(self):
+        """
+            Verify that a cohort holds the latest bookmark of its campaigns, capped by the
+            submission of their batch, and that campaigns synced again leave their old cohort
+        """
+        state = {'bookmarks': {
+            'reports_email_activity': {'c1': '2020-03-01T00:00:00+00:00', 'c2': '2020-02-01T00:00:00+00:00'},
+            WATERMARK: {'send_time': '2019-06-01T00:00:00.000000Z', 'cohorts': [
+                {'datetime': '2020-01-15T00:00:00+00:00', 'campaign_ids': ['c0', 'c2']}]},
+        }}
+        send_times = {'c1': '2019-01-01T00:00:00+00:00', 'c2': '2019-01-02T00:00:00+00:00'}
+        synced_campaigns = {'c1': '2020-04-01T00:00:00+00:00', 'c2': '2020-04-01T00:00:00+00:00'}
+
+        with mock.patch('tap_mailchimp.compaction.now', return_value=BASE_TIME):
+            self.assertEqual(apply_retention(state, send_times, 10, synced_campaigns), 2)
+
+        self.assertEqual(state['bookmarks']['reports_email_activity'], {})
+        self.assertEqual(state['bookmarks'][WATERMARK], {'send_time': '2019-12-22T00:00:00.000000Z', 'cohorts': [
+            {'datetime': '2020-01-15T00:00:00+00:00', 'campaign_ids': ['c0']},
+            {'datetime': '2020-03-01T00:00:00+00:00', 'campaign_ids': ['c1', 'c2']}]})
+
+        state['bookmarks']['reports_email_activity']['c1'] = '2020-05-01T00:00:00+00:00'
+        with mock.patch('tap_mailchimp.compaction.now', return_value=BASE_TIME):
+            apply_retention(state, send_times, 10, {'c1': '2020-04-15T00:00:00+00:00'})
+
+        self.assertEqual(state['bookmarks'][WATERMARK]['cohorts'][-1],
+                         {'datetime': '2020-04-15T00:00:00+00:00', 'campaign_ids': ['c1']})
+        self.assertEqual(get_email_activity_bookmark(state, 'c2', None), '2020-03-01T00:00:00+00:00')
+
+    def test_earliest_cohorts_are_combined(self):
+        watermarks = [{'send_time': '2020-01-01T00:00:00.000000Z', 'cohorts': [
+            {'datetime': '2020-01-{:02d}T00:00:00+00:00'.format(day), 'campaign_ids': ['c{:02d}'.format(day)]}]}
+                      for day in range(1, MAX_WATERMARK_COHORTS + 3)]
+
+        cohorts = merge_watermarks(watermarks)['cohorts']
+
+        self.assertEqual(len(cohorts), MAX_WATERMARK_COHORTS)
+        self.assertEqual(cohorts[0], {'datetime': '2020-01-01T00:00:00+00:00',
+                                      'campaign_ids': ['c01', 'c02', 'c03']})
+
+
+class TestEncodedBookmarks(unittest.TestCase):
+
+    def test_round_trip(self):
+        state = {'bookmarks': {'lists': {'list000000': {'list_members': {'datetime': 'x'}}},
+                               'reports_email_activity': {'camp000000': 'y'},
+                               'automations': {'datetime': 'z'}}}
+
+        encoded = encode_bookmarks(state)
+
+        self.assertTrue(is_encoded(encoded['bookmarks']['lists']))
+        self.assertTrue(is_encoded(encoded['bookmarks']['reports_email_activity']))
+        self.assertEqual(encoded['bookmarks']['automations'], {'datetime': 'z'})
+        self.assertFalse(is_encoded(state['bookmarks']['lists']))
+        self.assertEqual(decode_bookmarks(encoded), state)
+
+    def test_unchanged_maps_are_not_compressed_again(self):
+        cache = {}
+        state = {'bookmarks': {'lists': {'list000000': {}}, 'reports_email_activity': {'camp000000': 'x'}}}
+        first = encode_bookmarks(state, cache)
+
+        state['bookmarks']['reports_email_activity']['camp000000'] = 'y'
+        with mock.patch('tap_mailchimp.compaction.zlib.compress', wraps=zlib.compress) as mocked_compress:
+            second = encode_bookmarks(state, cache)
+
+        self.assertEqual(mocked_compress.call_count, 1)
+        self.assertIs(second['bookmarks']['lists'], first['bookmarks']['lists'])
+        self.assertEqual(decode_bookmarks(second)['bookmarks']['reports_email_activity'], {'camp000000': 'y'})
+
+    def test_encoded_state_is_emitted_and_resumed(self):
+        """
+            Verify that with `compress_state_bookmarks` the state messages carry the
+            encoded bookmarks, and a run resumed from them reads nothing new
+        """
+        config = {**CONFIG, 'compress_state_bookmarks': 'true'}
+        with MailchimpSimulator(lists=2, campaigns=2) as simulator:
+            emitted = run_benchmark(simulator, config, stream_names=STREAMS)['state']
+            self.assertTrue(is_encoded(emitted['bookmarks']['lists']))
+            second_run = run_benchmark(simulator, config, state=emitted, stream_names=STREAMS)
+
+        self.assertEqual(sorted(emitted['bookmarks']['lists']), ['list000000', 'list000001'])
+        self.assertNotIn('unsubscribes', second_run['requests'])
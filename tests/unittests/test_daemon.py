@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.client import MailchimpClient # pylint: disable=wrong-import-position
+from tap_mailchimp.daemon import Daemon, FairScheduler, RateLimiter, ThreadLocalStdout # pylint: disable=wrong-import-position
+from tap_mailchimp.discover import discover # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import select_all # pylint: disable=wrong-import-position
+
+
+class TestThreadLocalStdout(unittest.TestCase):
+
+    def test_writes_go_to_the_thread_target(self):
+        default, target = io.StringIO(), io.StringIO()
+        stdout = ThreadLocalStdout(default)
+
+        def write_from_thread():
+            stdout.set_target(target)
+            stdout.write('account\n')
+
+        thread = threading.Thread(target=write_from_thread)
+        thread.start()
+        thread.join()
+        stdout.write('main\n')
+
+        self.assertEqual(target.getvalue(), 'account\n')
+        self.assertEqual(default.getvalue(), 'main\n')
+
+
+class TestFairScheduler(unittest.TestCase):
+
+    def test_concurrent_requests_are_limited(self):
+        scheduler = FairScheduler(max_concurrent_requests=2)
+        rate_limiter = RateLimiter(requests_per_second=0)
+        lock = threading.Lock()
+        in_flight = [0, 0] # current, max
+
+        def request():
+            with scheduler.slot(rate_limiter):
+                with lock:
+                    in_flight[0] += 1
+                    in_flight[1] = max(in_flight)
+                time.sleep(0.01)
+                with lock:
+                    in_flight[0] -= 1
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(in_flight, [0, 2])
+
+    def test_rate_limit_spaces_requests(self):
+        rate_limiter = RateLimiter(requests_per_second=50)
+
+        start = time.monotonic()
+        for _ in range(6):
+            rate_limiter.wait()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+class TestDaemon(unittest.TestCase):
+
+    def test_accounts_synced_to_separate_outputs(self):
+        """
+            Verify that each account of the daemon writes its own output and state files
+        """
+        with tempfile.TemporaryDirectory() as work_dir, \
+                MailchimpSimulator(lists=1, members_per_list=5, campaigns=1) as simulator:
+            accounts = []
+            for name in ('first', 'second'):
+                config = {'api_key': name, 'base_url': simulator.base_url,
+                          'start_date': '2019-01-01T00:00:00Z'}
+                with MailchimpClient(config) as client:
+                    catalog = select_all(discover(client))
+                paths = {key: os.path.join(work_dir, '{}-{}.json'.format(name, key))
+                         for key in ('config', 'catalog', 'state')}
+                for key, value in (('config', config), ('catalog', catalog.to_dict())):
+                    with open(paths[key], 'w', encoding='UTF-8') as file:
+                        json.dump(value, file)
+                accounts.append({'name': name, 'output_dir': os.path.join(work_dir, name), **paths})
+
+            profile_dir = os.path.join(work_dir, 'profiles')
+            daemon = Daemon({'accounts': accounts, 'max_workers': 2, 'profile_dir': profile_dir})
+            daemon.run(once=True)
+
+            # Each run is profiled on its own thread, the catalogs share the parsed schemas
+            profiles = sorted(name for name in os.listdir(profile_dir) if name.endswith('.prof'))
+            self.assertEqual([name.split('-')[1] for name in profiles], ['first', 'second'])
+            first, second = (daemon.load_catalog(account['catalog']) for account in accounts)
+            self.assertIs(first.get_stream('lists').schema, second.get_stream('lists').schema)
+            self.assertTrue(first.get_stream('lists').metadata)
+
+            for account in accounts:
+                output_files = os.listdir(account['output_dir'])
+                self.assertEqual(len(output_files), 1)
+                with open(os.path.join(account['output_dir'], output_files[0]), encoding='UTF-8') as file:
+                    messages = [json.loads(line) for line in file]
+                records = [message for message in messages if message['type'] == 'RECORD']
+                schemas = [message for message in messages if message['type'] == 'SCHEMA']
+                self.assertEqual(len([record for record in records if record['stream'] == 'list_members']), 5)
+                self.assertEqual(len(schemas), 8)
+                with open(account['state'], encoding='UTF-8') as file:
+                    state = json.load(file)
+                self.assertIn('list_members', json.dumps(state['bookmarks']))
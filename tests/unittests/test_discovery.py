@@ -1,3 +1,5 @@
+import tempfile
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -29,6 +31,7 @@ def _make_client(forbidden_streams=None):
     """Return a mock MailchimpClient. Streams listed in forbidden_streams raise 403."""
     forbidden_streams = forbidden_streams or []
     client = MagicMock()
+    client.cache_dir = None
 
     def _get(path, **kwargs):
         endpoint = kwargs.get('endpoint', '')
@@ -119,6 +122,29 @@ class TestApplyAccessChecks(unittest.TestCase):
             self.assertEqual(call.kwargs.get('params'), {'count': 1})
 
 
+    def test_access_checks_run_concurrently(self):
+        """All parent stream probes are in flight at the same time."""
+        barrier = threading.Barrier(len(PARENT_STREAM_PATHS), timeout=5)
+        client = MagicMock()
+        client.get.side_effect = lambda path, **kwargs: barrier.wait()
+        schemas, field_metadata = _make_schemas()
+
+        _apply_access_checks(client, schemas, field_metadata)
+
+        self.assertFalse(barrier.broken)
+        self.assertEqual(set(schemas.keys()), ALL_STREAM_NAMES)
+
+    def test_base_url_resolved_once_before_probes(self):
+        """The OAuth api_endpoint is looked up once rather than by every probe."""
+        client = _make_client()
+        client.base_url = None
+        schemas, field_metadata = _make_schemas()
+
+        _apply_access_checks(client, schemas, field_metadata)
+
+        client.get_base_url.assert_called_once_with()
+
+
 class TestPruneInaccessibleChildren(unittest.TestCase):
     def test_child_removed_when_parent_absent(self):
         schemas = {'list_members': {}}
@@ -211,10 +237,31 @@ class TestDiscover(unittest.TestCase):
         self.assertIn('automations', mock_schemas)
 
 
+    @patch('tap_mailchimp.discover.get_schemas')
+    def test_discover_uses_cached_catalog(self, mock_get_schemas):
+        """A second discovery with the same credentials is served from the cache."""
+        mock_schemas = {name: {'properties': {}} for name in ALL_STREAM_NAMES}
+        mock_metadata = {name: [] for name in ALL_STREAM_NAMES}
+        mock_get_schemas.return_value = (mock_schemas, mock_metadata)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = _make_client(forbidden_streams=['automations'])
+            client.cache_dir = cache_dir
+            client.cache_key = 'key'
+            client.cache_ttl = 60
+
+            first_catalog = discover(client)
+            probes = client.get.call_count
+            second_catalog = discover(client)
+
+        self.assertEqual(client.get.call_count, probes)
+        self.assertEqual(first_catalog.to_dict(), second_catalog.to_dict())
+
+
 class TestDoDiscover(unittest.TestCase):
     """Tests for do_discover() delegation to discover()."""
 
-    @patch('tap_mailchimp.__init__.discover')
+    @patch('tap_mailchimp.discover.discover')
     def test_do_discover_delegates_to_discover(self, mock_discover):
         """do_discover() calls discover(client) and writes the catalog to stdout."""
         client = MagicMock()
@@ -225,7 +272,7 @@ class TestDoDiscover(unittest.TestCase):
 
         mock_discover.assert_called_once_with(client)
 
-    @patch('tap_mailchimp.__init__.discover')
+    @patch('tap_mailchimp.discover.discover')
     def test_do_discover_propagates_forbidden_error(self, mock_discover):
         """MailchimpForbiddenError from discover() (all streams forbidden) propagates."""
         from tap_mailchimp.client import MailchimpForbiddenError as FE
@@ -0,0 +1,113 @@
+import unittest
+import tracemalloc
+from unittest.mock import MagicMock, patch
+
+from tap_mailchimp.id_store import IdStore
+from tap_mailchimp.sync import chunk_campaigns, sync_endpoint, EMAIL_ACTIVITY_BATCH_SIZE
+
+
+class TestIdStore(unittest.TestCase):
+
+    def test_ids_are_returned_in_insertion_order(self):
+        """
+            Verify that ids are yielded as strings in the order they were appended
+        """
+        store = IdStore(['b', 'a', 3])
+
+        self.assertEqual(list(store), ['b', 'a', '3'])
+        self.assertEqual(len(store), 3)
+
+    def test_ids_spill_to_disk_above_threshold(self):
+        """
+            Verify that ids are spilled to a temporary file once the memory threshold
+            is exceeded and are still iterated in order, including ids still in memory
+        """
+        ids = ['{:010d}'.format(i) for i in range(1000)]
+        store = IdStore(max_memory_bytes=100)
+        for _id in ids:
+            store.append(_id)
+
+        self.assertTrue(store.spilled)
+        self.assertEqual(list(store), ids)
+        # Iterating twice yields the same ids
+        self.assertEqual(list(store), ids)
+        store.close()
+
+    def test_nested_iteration(self):
+        """
+            Verify that a spilled store can be iterated by nested loops
+        """
+        store = IdStore(['a', 'b', 'c'], max_memory_bytes=2)
+
+        pairs = [(outer, inner) for outer in store for inner in store]
+
+        self.assertEqual(len(pairs), 9)
+
+    def test_iteration_does_not_copy_the_buffer(self):
+        """
+            Verify that the ids in memory are read one at a time, without a copy of the buffer
+        """
+        store = IdStore(('{:010d}'.format(i) for i in range(100000)), max_memory_bytes=2 * 1024 * 1024)
+        self.assertFalse(store.spilled)
+
+        tracemalloc.start()
+        try:
+            ids = iter(store)
+            self.assertEqual(next(ids), '0000000000')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(peak, 64 * 1024)
+        self.assertEqual(sum(1 for _ in ids), 99999)
+
+    def test_empty_store_is_falsy(self):
+        self.assertFalse(IdStore())
+        self.assertTrue(IdStore(['a']))
+
+
+class TestChunkCampaigns(unittest.TestCase):
+
+    def test_chunks_from_bookmark(self):
+        """
+            Verify that chunking starts from the bookmarked chunk and reads the ids lazily
+        """
+        campaign_ids = IdStore(['{:04d}'.format(i) for i in range(EMAIL_ACTIVITY_BATCH_SIZE * 2 + 5)])
+
+        chunks = list(chunk_campaigns(campaign_ids, 1))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[0][0], '{:04d}'.format(EMAIL_ACTIVITY_BATCH_SIZE))
+        self.assertEqual(len(chunks[1]), 5)
+
+
+def consume_records(catalog, stream_name, records, **kwargs):
+    for _ in records:
+        pass
+
+
+@patch('tap_mailchimp.sync.write_schema')
+@patch('tap_mailchimp.sync.format_selected_fields', return_value='')
+@patch('tap_mailchimp.sync.process_records', side_effect=consume_records)
+class TestSyncEndpointIds(unittest.TestCase):
+
+    def get_client(self):
+        client = MagicMock()
+        client.page_size = 1000
+        client.deadline = None
+        client.adaptive_page_size = False
+        client.stream_json = False
+        client.get.return_value = {'lists': [{'id': 'a', '_links': []}, {'id': 'b', '_links': []}]}
+        return client
+
+    def test_ids_collected_for_parent_streams(self, *args):
+        ids = sync_endpoint(self.get_client(), MagicMock(), {}, None, 'lists', True,
+                            '/lists', 'lists', {}, ['lists'], None, None, collect_ids=True)
+
+        self.assertEqual(list(ids), ['a', 'b'])
+
+    def test_ids_not_collected_for_other_streams(self, *args):
+        ids = sync_endpoint(self.get_client(), MagicMock(), {}, None, 'lists', True,
+                            '/lists', 'lists', {}, ['lists'], None, None)
+
+        self.assertIsNone(ids)
@@ -0,0 +1,97 @@
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import singer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.client import MailchimpClient # pylint: disable=wrong-import-position
+from tap_mailchimp.discover import discover # pylint: disable=wrong-import-position
+from tap_mailchimp.instrumentation import (HTTP_WAIT, JSON_DECODE, TRANSFORM, WRITE, # pylint: disable=wrong-import-position
+                                           StageMetrics, recording)
+from tap_mailchimp.sync import process_records, sync # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import MessageCounter, select_all # pylint: disable=wrong-import-position
+
+
+class TestStageMetrics(unittest.TestCase):
+
+    def test_measurements_are_aggregated(self):
+        """
+            Verify that time and counts are summed per stream and stage
+        """
+        stage_metrics = StageMetrics(interval=3600)
+        stage_metrics.add('lists', 'http_wait', 1.0)
+        stage_metrics.add('lists', 'http_wait', 0.5, count=2)
+        stage_metrics.add('campaigns', 'http_wait', 2.0)
+
+        self.assertEqual(stage_metrics.totals[('lists', 'http_wait')], [1.5, 3])
+        self.assertEqual(stage_metrics.totals[('campaigns', 'http_wait')], [2.0, 1])
+
+    @patch('tap_mailchimp.instrumentation.metrics.log')
+    def test_increments_are_emitted_periodically(self, mocked_log):
+        """
+            Verify that only the increments since the last emission are logged as metrics
+        """
+        stage_metrics = StageMetrics(interval=0)
+        stage_metrics.add('lists', 'http_wait', 1.0)
+        stage_metrics.add('lists', 'http_wait', 2.0)
+
+        points = [call.args[1] for call in mocked_log.call_args_list]
+        self.assertEqual([point.value for point in points], [1.0, 2.0])
+        self.assertEqual(points[0].tags, {'endpoint': 'lists', 'stage': 'http_wait', 'count': 1})
+        self.assertEqual(stage_metrics.totals[('lists', 'http_wait')], [3.0, 2])
+
+    @patch('tap_mailchimp.instrumentation.LOGGER.info')
+    def test_summary_lists_every_stage(self, mocked_info):
+        stage_metrics = StageMetrics(interval=3600)
+        stage_metrics.add('lists', 'http_wait', 1.0)
+        stage_metrics.add('lists', 'transform', 3.0)
+
+        stage_metrics.log_summary()
+
+        rows = [call.args[1:3] for call in mocked_info.call_args_list if len(call.args) > 3]
+        self.assertIn(('lists', 'transform'), rows)
+        self.assertIn(('lists', 'http_wait'), rows)
+
+
+@patch('tap_mailchimp.sync.singer.write_record')
+class TestProcessRecordsMetrics(unittest.TestCase):
+
+    def test_transform_and_write_are_timed(self, mocked_write_record):
+        catalog = singer.Catalog.from_dict({"streams": [{
+            "tap_stream_id": "lists",
+            "schema": {"properties": {"id": {"type": ["string"]}}},
+            "metadata": [{"breadcrumb": ["properties", "id"], "metadata": {"inclusion": "automatic"}}]
+        }]})
+        with recording(StageMetrics(interval=3600)) as stage_metrics:
+            process_records(catalog, 'lists', [{'id': 'a'}, {'id': 'b'}])
+
+        self.assertEqual(stage_metrics.totals[('lists', TRANSFORM)][1], 2)
+        self.assertEqual(stage_metrics.totals[('lists', WRITE)][1], 2)
+
+
+class TestRunMetrics(unittest.TestCase):
+
+    def test_worker_threads_are_timed(self):
+        """
+            Verify that the requests of the partition workers are part of the run's
+            stage totals
+        """
+        with MailchimpSimulator(lists=1, members_per_list=30, campaigns=0) as simulator:
+            config = {'api_key': 'key', 'base_url': simulator.base_url, 'start_date': '2019-01-01T00:00:00Z',
+                      'page_size': 10, 'list_members_status_partitions': True}
+            with MailchimpClient(config) as client:
+                catalog = select_all(discover(client))
+                catalog.streams = [stream for stream in catalog.streams
+                                   if stream.tap_stream_id in ('lists', 'list_members')]
+                simulator.request_counts.clear()
+                with redirect_stdout(MessageCounter()):
+                    sync(client, catalog, {}, config['start_date'])
+
+        totals = client.stage_metrics.totals
+        self.assertEqual(totals[('list_members', HTTP_WAIT)][1], simulator.request_counts['list_members'])
+        self.assertEqual(totals[('list_members', JSON_DECODE)][1], simulator.request_counts['list_members'])
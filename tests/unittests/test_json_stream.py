@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.json_stream import iter_items # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+
+def chunked(document, size):
+    data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterItems(unittest.TestCase):
+
+    def test_items_across_chunk_boundaries(self):
+        """
+            Verify that items split in any place, including inside numbers and multi-byte
+            characters, are decoded like json.loads does
+        """
+        members = [{'id': str(i), 'email_address': 'm{}@exämple.com'.format(i), 'member_rating': 12345,
+                    'stats': {'avg_open_rate': 0.25, 'tags': [1, 2]}} for i in range(5)]
+        document = {'list_id': 'l1', 'members': members, 'total_items': 5, '_links': [{'rel': 'self'}]}
+
+        for size in (1, 2, 7, 64, 100000):
+            self.assertEqual(list(iter_items(chunked(document, size), 'members')), members)
+
+    def test_missing_and_empty_arrays(self):
+        self.assertEqual(list(iter_items(chunked({'members': [], 'total_items': 0}, 3), 'members')), [])
+        self.assertEqual(list(iter_items(chunked({'total_items': 0}, 3), 'members')), [])
+        self.assertEqual(list(iter_items([b'{}'], 'members')), [])
+
+    def test_items_are_yielded_as_they_arrive(self):
+        chunks_read = []
+
+        def chunks():
+            for chunk in (b'{"members": [{"id": "a"},', b' {"id": "b"}', b']}'):
+                chunks_read.append(chunk)
+                yield chunk
+
+        items = iter_items(chunks(), 'members')
+
+        self.assertEqual(next(items), {'id': 'a'})
+        self.assertEqual(len(chunks_read), 1)
+
+    def test_invalid_json(self):
+        with self.assertRaises(ValueError):
+            list(iter_items([b'{"members": [{"id": "a"} {"id": "b"}]}'], 'members'))
+        with self.assertRaises(ValueError):
+            list(iter_items([b'{"members": [{"id": "a"'], 'members'))
+
+
+class TestStreamedSync(unittest.TestCase):
+
+    def test_sync_with_streamed_pages(self):
+        with MailchimpSimulator(lists=2, members_per_list=25, segments_per_list=2, members_per_segment=3,
+                                campaigns=3, automations=2) as simulator:
+            report = run_benchmark(simulator, {'page_size': 10, 'stream_json': True})
+
+        records = {stream: stats['records'] for stream, stats in report['streams'].items()}
+        self.assertEqual(records['list_members'], 50)
+        self.assertEqual(records['list_segment_members'], 12)
+        self.assertEqual(records['campaigns'], 3)
+        self.assertEqual(report['requests']['list_members'], 6)
+        self.assertEqual(report['state']['bookmarks']['lists']['list000001']['list_members']['datetime'],
+                         '2020-01-01T00:24:00+00:00')
+
+    def test_page_cut_off_is_requested_again(self):
+        """
+            Verify that a page whose connection drops half way is requested again from
+            the same position, its records already emitted being emitted again
+        """
+        with MailchimpSimulator(lists=1, members_per_list=25, campaigns=0,
+                                truncated_responses={'list_members': 1}) as simulator:
+            report = run_benchmark(simulator, {'page_size': 10, 'stream_json': True},
+                                   stream_names=['lists', 'list_members'])
+
+        self.assertEqual(report['requests']['list_members'], 4)
+        self.assertGreaterEqual(report['streams']['list_members']['records'], 25)
+        self.assertEqual(report['state']['bookmarks']['lists']['list000000']['list_members']['datetime'],
+                         '2020-01-01T00:24:00+00:00')
@@ -0,0 +1,133 @@
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.client import MailchimpClient # pylint: disable=wrong-import-position
+from tap_mailchimp.discover import discover # pylint: disable=wrong-import-position
+from tap_mailchimp.keyset import KeysetCursor # pylint: disable=wrong-import-position
+from tap_mailchimp.sync import sync # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import MessageCounter, run_benchmark, select_all # pylint: disable=wrong-import-position
+
+START_DATE = '2019-01-01T00:00:00Z'
+
+
+def member(_id, minute):
+    return {'id': _id, 'last_changed': '2020-01-01T00:{:02d}:00+00:00'.format(minute)}
+
+
+class MemberCollector(MessageCounter):
+    """Keeps the ids of the list_members records."""
+    def __init__(self):
+        super().__init__()
+        self.member_ids = []
+
+    def handle_message(self, message):
+        super().handle_message(message)
+        if message['type'] == 'RECORD' and message['stream'] == 'list_members':
+            self.member_ids.append(message['record']['id'])
+
+
+class TestKeysetCursor(unittest.TestCase):
+
+    def test_boundary_moves_to_the_last_timestamp_of_the_page(self):
+        cursor = KeysetCursor('last_changed', {}, START_DATE)
+
+        records = list(cursor.filter([member('a', 1), member('b', 2), member('c', 2)]))
+        cursor.advance(3)
+
+        self.assertEqual([record['id'] for record in records], ['a', 'b', 'c'])
+        self.assertEqual(cursor.bookmark(), {'datetime': '2020-01-01T00:02:00+00:00', 'tie_ids': ['b', 'c']})
+        self.assertEqual(cursor.query_since(), '2020-01-01T00:01:59+00:00')
+        self.assertEqual(cursor.offset, 0)
+
+    def test_ties_already_synced_are_dropped(self):
+        cursor = KeysetCursor('last_changed',
+                              {'datetime': '2020-01-01T00:02:00+00:00', 'tie_ids': ['b', 'c']},
+                              START_DATE)
+
+        records = list(cursor.filter([member('a', 1), member('b', 2), member('c', 2), member('d', 2)]))
+
+        self.assertEqual([record['id'] for record in records], ['d'])
+
+    def test_page_of_ties_advances_the_offset(self):
+        cursor = KeysetCursor('last_changed', {'datetime': '2020-01-01T00:02:00+00:00'}, START_DATE)
+
+        list(cursor.filter([member('a', 2), member('b', 2)]))
+        cursor.advance(2)
+
+        self.assertEqual(cursor.offset, 2)
+        self.assertEqual(cursor.bookmark(), {'datetime': '2020-01-01T00:02:00+00:00', 'tie_ids': ['a', 'b']})
+
+    def test_too_many_ties_are_bookmarked_by_offset(self):
+        cursor = KeysetCursor('last_changed', {'datetime': '2020-01-01T00:02:00+00:00'}, START_DATE)
+
+        with patch('tap_mailchimp.keyset.MAX_TIE_IDS', 3):
+            for page in (['a', 'b'], ['c', 'd']):
+                list(cursor.filter([member(_id, 2) for _id in page]))
+                cursor.advance(2)
+
+        self.assertEqual(cursor.bookmark(), {'datetime': '2020-01-01T00:02:00+00:00', 'tie_offset': 4})
+        resumed = KeysetCursor('last_changed', cursor.bookmark(), START_DATE)
+        self.assertEqual(resumed.offset, 4)
+        self.assertEqual(resumed.bookmark(), cursor.bookmark())
+
+
+class TestKeysetListMembers(unittest.TestCase):
+
+    def test_members_sharing_timestamps_are_emitted_once(self):
+        """
+            Verify that members changed at the same time across page boundaries, more of
+            them than fit in a page, are all emitted once in last_changed order
+        """
+        with MailchimpSimulator(lists=1, members_per_list=50, members_per_minute=25, campaigns=0) as simulator:
+            report = run_benchmark(simulator, {'page_size': 10}, stream_names=['lists', 'list_members'])
+
+        self.assertEqual(report['streams']['list_members']['records'], 50)
+        bookmark = report['state']['bookmarks']['lists']['list000000']['list_members']
+        self.assertEqual(bookmark['datetime'], '2020-01-01T00:01:00+00:00')
+        self.assertEqual(len(bookmark['tie_ids']), 25)
+
+    def test_interrupted_list_resumes_where_it_stopped(self):
+        """
+            Verify that a sync failing in the middle of a list resumes after the last page
+            it bookmarked, without skipping or repeating members
+        """
+        state = {}
+        with MailchimpSimulator(lists=1, members_per_list=50, members_per_minute=7, campaigns=0) as simulator:
+            config = {'api_key': 'key', 'base_url': simulator.base_url,
+                      'start_date': START_DATE, 'page_size': 10}
+            get = MailchimpClient.get
+            calls = []
+
+            def fail_on_fourth_page(client, path, **kwargs):
+                if kwargs.get('endpoint') == 'list_members':
+                    calls.append(kwargs['params'])
+                    if len(calls) == 4:
+                        raise RuntimeError('Connection lost')
+                return get(client, path, **kwargs)
+
+            with MailchimpClient(config) as client:
+                catalog = select_all(discover(client))
+                catalog.streams = [stream for stream in catalog.streams
+                                   if stream.tap_stream_id in ('lists', 'list_members')]
+                first_run = MemberCollector()
+                with patch.object(MailchimpClient, 'get', autospec=True, side_effect=fail_on_fourth_page):
+                    with redirect_stdout(first_run), self.assertRaises(RuntimeError):
+                        sync(client, catalog, state, START_DATE)
+
+                state = first_run.last_state
+                second_run = MemberCollector()
+                with redirect_stdout(second_run):
+                    sync(client, catalog, state, START_DATE)
+
+        # Each page starts at the last timestamp of the previous one, 10 + 7 + 7 new members
+        self.assertEqual(len(first_run.member_ids), 24)
+        self.assertEqual(len(second_run.member_ids), 26)
+        self.assertEqual(len(set(first_run.member_ids + second_run.member_ids)), 50)
+        self.assertTrue(all(params['sort_field'] == 'last_changed' and params['sort_dir'] == 'ASC'
+                            for params in calls))
@@ -0,0 +1,88 @@
+import io
+import os
+import sys
+import gzip
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.output import BatchWriter # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+
+def read_messages(stdout):
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+def read_batch(message):
+    with gzip.open(message['manifest'][0][len('file://'):], 'rt', encoding='UTF-8') as file:
+        return [json.loads(line) for line in file]
+
+
+class TestBatchWriter(unittest.TestCase):
+
+    def test_files_rotate_and_state_waits_for_them(self):
+        """
+            Verify that files are closed every batch_size records and that a state written
+            while records are pending is only emitted after their BATCH messages
+        """
+        stdout = io.StringIO()
+        state = {'bookmarks': {'lists': 1}}
+        with tempfile.TemporaryDirectory() as batch_dir, redirect_stdout(stdout):
+            writer = BatchWriter(batch_dir, batch_size=2)
+            writer.write_record('lists', {'id': 'a'})
+            writer.write_state(state)
+            state['bookmarks']['lists'] = 2
+            writer.write_record('list_members', {'id': 'm'})
+            writer.write_record('lists', {'id': 'b'})
+            writer.write_record('lists', {'id': 'c'})
+            writer.close()
+
+            messages = read_messages(stdout)
+            self.assertEqual([(message['type'], message.get('stream')) for message in messages], [
+                ('BATCH', 'list_members'),
+                ('BATCH', 'lists'),
+                ('STATE', None),
+                ('BATCH', 'lists'),
+            ])
+            # The state as it was when written, not as it was later changed
+            self.assertEqual(messages[2]['value'], {'bookmarks': {'lists': 1}})
+            self.assertEqual(read_batch(messages[1]), [{'id': 'a'}, {'id': 'b'}])
+            self.assertEqual(read_batch(messages[3]), [{'id': 'c'}])
+            self.assertEqual(len(os.listdir(batch_dir)), 3)
+
+    def test_other_streams_write_records(self):
+        stdout = io.StringIO()
+        with tempfile.TemporaryDirectory() as batch_dir, redirect_stdout(stdout):
+            writer = BatchWriter(batch_dir, streams=['list_members'])
+            writer.write_record('lists', {'id': 'a'})
+            writer.write_state({})
+            writer.close()
+
+        self.assertEqual([message['type'] for message in read_messages(stdout)], ['RECORD', 'STATE'])
+
+
+class TestBatchOutputSync(unittest.TestCase):
+
+    def test_sync_with_batch_output(self):
+        with tempfile.TemporaryDirectory() as batch_dir:
+            with MailchimpSimulator(lists=2, members_per_list=25, campaigns=2) as simulator:
+                report = run_benchmark(simulator, {'batch_dir': batch_dir, 'batch_size': 20,
+                                                   'batch_streams': 'list_members,reports_email_activity'})
+
+            records = 0
+            batch_files = os.listdir(batch_dir)
+            for name in batch_files:
+                with gzip.open(os.path.join(batch_dir, name), 'rt', encoding='UTF-8') as file:
+                    records += sum(1 for _ in file)
+
+        self.assertNotIn('list_members', report['streams'])
+        self.assertNotIn('reports_email_activity', report['streams'])
+        self.assertEqual(report['streams']['lists']['records'], 2)
+        self.assertEqual(records, 50 + 120)
+        self.assertEqual(report['messages']['BATCH'], len(batch_files))
+        # Every list_members bookmark made it into the final state
+        self.assertEqual(len(report['state']['bookmarks']['lists']), 2)
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from requests.exceptions import Timeout
+
+from tap_mailchimp.client import MailchimpClient
+from tap_mailchimp.page_size import PageSizeController
+from tap_mailchimp.sync import sync_endpoint
+
+
+class TestPageSizeController(unittest.TestCase):
+
+    def test_grows_towards_target_latency(self):
+        controller = PageSizeController(100, target_latency=5)
+
+        controller.observe(100, latency=1)
+        self.assertEqual(controller.page_size, 200)
+        controller.observe(200, latency=4)
+        self.assertEqual(controller.page_size, 250)
+
+    def test_shrinks_slow_pages(self):
+        controller = PageSizeController(1000, target_latency=5)
+
+        controller.observe(1000, latency=60)
+
+        self.assertEqual(controller.page_size, 500)
+
+    def test_limits(self):
+        controller = PageSizeController(800, target_latency=5)
+
+        controller.observe(800, latency=0.1)
+        self.assertEqual(controller.page_size, 1000)
+        # 50 KB per record, only 400 records fit in 20 MB
+        controller.observe(1000, latency=0.1, response_bytes=1000 * 50 * 1024)
+        self.assertEqual(controller.page_size, 409)
+
+    def test_short_page_is_ignored(self):
+        controller = PageSizeController(1000, target_latency=5)
+
+        controller.observe(3, latency=0.01)
+
+        self.assertEqual(controller.page_size, 1000)
+
+    def test_shrink(self):
+        controller = PageSizeController(30, target_latency=5)
+
+        self.assertTrue(controller.shrink())
+        self.assertEqual(controller.page_size, 15)
+        self.assertTrue(controller.shrink())
+        self.assertEqual(controller.page_size, 10)
+        self.assertFalse(controller.shrink())
+
+
+class TestAdaptivePageSize(unittest.TestCase):
+
+    def test_config(self):
+        client = MailchimpClient({'access_token': 'TOKEN', 'adaptive_page_size': True, 'target_page_latency': 2})
+
+        self.assertTrue(client.adaptive_page_size)
+        self.assertEqual(client.target_page_latency, 2)
+        self.assertFalse(MailchimpClient({'access_token': 'TOKEN'}).adaptive_page_size)
+
+    @patch('tap_mailchimp.sync.write_schema')
+    @patch('tap_mailchimp.sync.format_selected_fields', return_value='')
+    @patch('tap_mailchimp.sync.singer.write_record')
+    @patch('tap_mailchimp.sync.singer.write_state')
+    def test_timeout_shrinks_the_page(self, *args):
+        """
+            Verify that a timed out page is requested again at the same offset with a smaller
+            count, and that the chosen size is kept in the state
+        """
+        client = MagicMock()
+        client.page_size = 1000
+        client.deadline = None
+        client.adaptive_page_size = True
+        client.stream_json = False
+        client.target_page_latency = 3600
+        client.last_response_bytes = None
+        requests = []
+
+        def get(path, params, endpoint, retry_timeouts):
+            requests.append((params['offset'], params['count'], retry_timeouts))
+            if len(requests) == 1:
+                raise Timeout()
+            total = 600
+            count = max(0, min(params['count'], total - params['offset']))
+            return {'lists': [{'id': str(params['offset'] + i), '_links': []} for i in range(count)]}
+        client.get.side_effect = get
+        catalog = MagicMock()
+        catalog.get_stream.return_value.schema.to_dict.return_value = {}
+        catalog.get_stream.return_value.metadata = []
+        state = {}
+
+        sync_endpoint(client, catalog, state, None, 'lists', False, '/lists', 'lists', {}, ['lists'],
+                      None, None)
+
+        self.assertEqual(requests, [(0, 1000, False), (0, 500, False), (500, 1000, False)])
+        self.assertEqual(state['page_sizes'], {'lists': 1000})
@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from tap_mailchimp.parquet import ParquetBatchWriter, get_arrow_schema
+except ImportError:
+    pa = None
+
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+
+@unittest.skipUnless(pa, 'pyarrow is not installed')
+class TestParquetBatchWriter(unittest.TestCase):
+
+    def test_schema_mapping(self):
+        """
+            Verify that the nullable JSON schema types map to Arrow types
+        """
+        arrow_schema, _ = get_arrow_schema({'properties': {
+            'id': {'type': ['string']},
+            'count': {'type': ['null', 'integer']},
+            'rate': {'type': ['null', 'number']},
+            'vip': {'type': ['null', 'boolean']},
+            'timestamp': {'type': ['null', 'string'], 'format': 'date-time'},
+            'location': {'type': ['null', 'object'], 'properties': {'latitude': {'type': ['null', 'number']}}},
+            'merge_fields': {'type': ['null', 'object']},
+            'tags': {'type': ['null', 'array'], 'items': {'type': ['null', 'string']}},
+        }})
+
+        self.assertEqual(arrow_schema.field('id').type, pa.string())
+        self.assertEqual(arrow_schema.field('count').type, pa.int64())
+        self.assertEqual(arrow_schema.field('rate').type, pa.float64())
+        self.assertEqual(arrow_schema.field('vip').type, pa.bool_())
+        self.assertEqual(arrow_schema.field('timestamp').type, pa.timestamp('us', tz='UTC'))
+        self.assertEqual(arrow_schema.field('location').type, pa.struct([('latitude', pa.float64())]))
+        self.assertEqual(arrow_schema.field('merge_fields').type, pa.string())
+        self.assertEqual(arrow_schema.field('tags').type, pa.list_(pa.string()))
+        self.assertTrue(all(field.nullable for field in arrow_schema))
+
+    def test_row_groups_and_files(self):
+        schema = {'properties': {'id': {'type': ['string']},
+                                 'timestamp': {'type': ['null', 'string'], 'format': 'date-time'},
+                                 'merge_fields': {'type': ['null', 'object']}}}
+        stdout = io.StringIO()
+        with tempfile.TemporaryDirectory() as batch_dir, redirect_stdout(stdout):
+            writer = ParquetBatchWriter(batch_dir, batch_size=5, row_group_size=2)
+            writer.write_schema('list_members', schema, ['id'])
+            for i in range(7):
+                writer.write_record('list_members', {'id': str(i), 'timestamp': '2020-01-01T00:00:00.000000Z',
+                                                     'merge_fields': {'FNAME': 'A'} if i else None})
+            writer.close()
+
+            batches = [json.loads(line) for line in stdout.getvalue().splitlines()
+                       if json.loads(line)['type'] == 'BATCH']
+            paths = [batch['manifest'][0][len('file://'):] for batch in batches]
+            files = [pq.ParquetFile(path) for path in paths]
+
+            self.assertEqual(batches[0]['encoding'], {'format': 'parquet', 'compression': 'snappy'})
+            self.assertEqual([file.metadata.num_rows for file in files], [5, 2])
+            self.assertEqual(files[0].metadata.num_row_groups, 3)
+            rows = files[0].read().to_pylist()
+            self.assertEqual(rows[0], {'id': '0', 'timestamp': datetime(2020, 1, 1, tzinfo=timezone.utc),
+                                       'merge_fields': None})
+            self.assertEqual(rows[1]['merge_fields'], '{"FNAME": "A"}')
+
+    def test_sync_with_parquet_output(self):
+        with tempfile.TemporaryDirectory() as batch_dir:
+            with MailchimpSimulator(lists=1, members_per_list=25, campaigns=2) as simulator:
+                run_benchmark(simulator, {'batch_dir': batch_dir, 'batch_format': 'parquet',
+                                          'batch_streams': ['list_members', 'unsubscribes',
+                                                            'reports_email_activity']})
+
+            rows = {}
+            for name in os.listdir(batch_dir):
+                stream_name = name.split('-sync-')[0]
+                rows[stream_name] = rows.get(stream_name, 0) + \
+                    pq.ParquetFile(os.path.join(batch_dir, name)).metadata.num_rows
+
+        self.assertEqual(rows['list_members'], 25)
+        self.assertEqual(rows['reports_email_activity'], 120)
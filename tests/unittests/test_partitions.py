@@ -0,0 +1,88 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.sync import LIST_MEMBER_STATUSES # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+CONFIG = {'page_size': 10, 'list_members_status_partitions': True}
+NOW = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+class TestStatusPartitionedListMembers(unittest.TestCase):
+
+    def test_partitions_emit_every_member(self):
+        """
+            Verify that syncing list_members by status emits every member once and
+            bookmarks each partition, with the run's start less the clock margin as the
+            list's datetime once every partition is finished
+        """
+        with mock.patch('tap_mailchimp.sync.now', return_value=NOW), \
+             MailchimpSimulator(lists=2, members_per_list=50, campaigns=0) as simulator:
+            report = run_benchmark(simulator, CONFIG, stream_names=['lists', 'list_members'])
+
+        self.assertEqual(report['streams']['list_members']['records'], 100)
+        bookmark = report['state']['bookmarks']['lists']['list000001']['list_members']
+        self.assertEqual(sorted(bookmark['partitions']), sorted(LIST_MEMBER_STATUSES))
+        # Members 40 to 45 are subscribed, the last of them changed at minute 45
+        self.assertEqual(bookmark['partitions']['subscribed']['datetime'], '2020-01-01T00:45:00+00:00')
+        self.assertEqual(bookmark['partitions']['transactional']['datetime'], '2020-01-01T00:49:00+00:00')
+        self.assertEqual(bookmark['datetime'], '2020-12-31T23:00:00+00:00')
+
+    def test_archived_members_are_not_synced(self):
+        """
+            Verify that archived members are left out of a partitioned sync like out of
+            one without partitions
+        """
+        statuses = ['subscribed', 'archived']
+        with MailchimpSimulator(lists=1, members_per_list=20, campaigns=0, member_statuses=statuses) as simulator:
+            partitioned = run_benchmark(simulator, CONFIG, stream_names=['lists', 'list_members'])
+            unpartitioned = run_benchmark(simulator, {'page_size': 10}, stream_names=['lists', 'list_members'])
+
+        self.assertEqual(partitioned['streams']['list_members']['records'], 10)
+        self.assertEqual(unpartitioned['streams']['list_members']['records'], 10)
+
+    def test_empty_partition_does_not_hold_the_list_bookmark_back(self):
+        """
+            Verify that a status without members does not keep the list's datetime at
+            the start date
+        """
+        with mock.patch('tap_mailchimp.sync.now', return_value=NOW), \
+             MailchimpSimulator(lists=1, members_per_list=30, campaigns=0,
+                                member_statuses=['subscribed']) as simulator:
+            report = run_benchmark(simulator, CONFIG, stream_names=['lists', 'list_members'])
+
+        bookmark = report['state']['bookmarks']['lists']['list000000']['list_members']
+        self.assertEqual(bookmark['partitions']['transactional']['datetime'], '2019-01-01T00:00:00+00:00')
+        self.assertEqual(bookmark['datetime'], '2020-12-31T23:00:00+00:00')
+
+    def test_next_run_resumes_each_partition(self):
+        """
+            Verify that a run after a partitioned sync requests each partition from its own
+            bookmark and emits no member again
+        """
+        with MailchimpSimulator(lists=1, members_per_list=50, campaigns=0) as simulator:
+            first_run = run_benchmark(simulator, CONFIG, stream_names=['lists', 'list_members'])
+            second_run = run_benchmark(simulator, CONFIG, state=first_run['state'],
+                                       stream_names=['lists', 'list_members'])
+
+        self.assertNotIn('list_members', second_run['streams'])
+        self.assertEqual(second_run['requests']['list_members'], len(LIST_MEMBER_STATUSES))
+
+    def test_partitions_start_from_the_list_bookmark(self):
+        """
+            Verify that turning partitions on for a list synced without them starts every
+            partition from the list's bookmark
+        """
+        state = {'bookmarks': {'lists': {'list000000': {'list_members': {
+            'datetime': '2020-01-01T00:40:00+00:00', 'tie_ids': []}}}}}
+        with MailchimpSimulator(lists=1, members_per_list=50, campaigns=0) as simulator:
+            report = run_benchmark(simulator, CONFIG, state=state, stream_names=['lists', 'list_members'])
+
+        # Members 40 to 49
+        self.assertEqual(report['streams']['list_members']['records'], 10)
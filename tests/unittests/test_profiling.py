@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+from unittest.mock import patch
+
+from tap_mailchimp import profiling
+from tap_mailchimp.profiling import profiled, snapshot
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profile_files_are_written(self):
+        """
+            Verify that a profiled block writes the CPU profile, its summary and the
+            memory snapshots taken at stream boundaries
+        """
+        with tempfile.TemporaryDirectory() as profile_dir:
+            with profiled(profile_dir):
+                snapshot('lists-start')
+                sorted(range(1000), key=str)
+                snapshot('lists-end')
+
+            files = sorted(os.listdir(profile_dir))
+
+        self.assertEqual(len([name for name in files if name.endswith('.prof')]), 1)
+        self.assertEqual(len([name for name in files if name.endswith('.txt')]), 1)
+        snapshots = [name for name in files if name.endswith('.snapshot')]
+        self.assertEqual(len(snapshots), 3)
+        self.assertTrue(snapshots[0].endswith('-0001-lists-start.snapshot'))
+        self.assertIsNone(profiling.active_profiler())
+
+    @patch('tracemalloc.take_snapshot')
+    def test_no_profiling_without_profile_dir(self, mocked_take_snapshot):
+        """
+            Verify that nothing is profiled when no profile directory is configured
+        """
+        with profiled(None):
+            snapshot('lists-start')
+
+        self.assertFalse(mocked_take_snapshot.called)
+        self.assertIsNone(profiling.active_profiler())
+
+    def test_profilers_are_not_imported_without_profile_dir(self):
+        """
+            Verify that a run without a profile directory does not import cProfile, pstats or tracemalloc
+        """
+        code = ('import sys; from tap_mailchimp.profiling import profiled, snapshot\n'
+                'with profiled(None): snapshot("lists-start")\n'
+                'print(*(name in sys.modules for name in ("cProfile", "pstats", "tracemalloc")))')
+        output = subprocess.run([sys.executable, '-c', code],
+                                check=True, capture_output=True, text=True).stdout.strip()
+
+        self.assertEqual(output, 'False False False')
@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tap_mailchimp.sync import (get_completed_streams, get_dependants, get_stream_order,
+                                record_stream_durations, should_sync_stream, submit_email_activity_batch,
+                                write_email_activity_chunk_bookmark)
+
+ENDPOINTS = {
+    'lists': {'children': {'list_members': {}, 'list_segments': {'children': {'list_segment_members': {}}}}},
+    'campaigns': {'children': {'unsubscribes': {}}, 'dependants': ['reports_email_activity']},
+    'automations': {},
+}
+
+
+class TestStreamOrder(unittest.TestCase):
+
+    def test_default_order(self):
+        self.assertEqual(get_stream_order({}, ENDPOINTS, False), ['lists', 'campaigns', 'automations'])
+
+    def test_campaigns_first_when_email_activity_pending(self):
+        self.assertEqual(get_stream_order({}, ENDPOINTS, True), ['campaigns', 'lists', 'automations'])
+
+    def test_shortest_streams_first(self):
+        state = {'stream_durations': {'lists': 300.0, 'campaigns': 20.0, 'automations': 1.5}}
+
+        self.assertEqual(get_stream_order(state, ENDPOINTS, False), ['automations', 'campaigns', 'lists'])
+        self.assertEqual(get_stream_order(state, ENDPOINTS, True), ['campaigns', 'automations', 'lists'])
+
+    def test_streams_without_duration_run_last(self):
+        state = {'stream_durations': {'automations': 30.0, 'campaigns': 20.0}}
+
+        self.assertEqual(get_stream_order(state, ENDPOINTS, False), ['campaigns', 'automations', 'lists'])
+
+    def test_selected_children_add_to_their_parent(self):
+        """
+            Verify that the durations of the selected children of a stream count towards its own
+        """
+        state = {'stream_durations': {'lists': 1.0, 'list_members': 100.0, 'list_segments': 2.0,
+                                      'list_segment_members': 3.0, 'campaigns': 20.0, 'automations': 10.0}}
+
+        self.assertEqual(get_stream_order(state, ENDPOINTS, False), ['automations', 'campaigns', 'lists'])
+        self.assertEqual(get_stream_order(state, ENDPOINTS, False, {'lists', 'list_segments', 'campaigns'}),
+                         ['lists', 'automations', 'campaigns'])
+
+    def test_child_durations_are_recorded(self):
+        state = {}
+        child_durations = {'list_members': 6.0, 'list_segments': 3.0, 'list_segment_members': 2.0}
+
+        record_stream_durations(state, 'lists', ENDPOINTS['lists'], 10.0, child_durations)
+
+        self.assertEqual(state['stream_durations'], {'lists': 1.0, 'list_members': 6.0, 'list_segments': 1.0,
+                                                     'list_segment_members': 2.0})
+
+
+class TestCompletedStreams(unittest.TestCase):
+
+    def test_completed_streams_from_state(self):
+        state = {'current_stream': 'lists', 'completed_streams': ['campaigns', 'unsubscribes']}
+
+        self.assertEqual(get_completed_streams(state, ENDPOINTS), {'campaigns', 'unsubscribes'})
+
+    def test_current_stream_only_state(self):
+        """
+            Verify that a state written before completed_streams existed resumes at current_stream
+        """
+        state = {'current_stream': 'automations'}
+
+        self.assertEqual(get_completed_streams(state, ENDPOINTS), {
+            'lists', 'list_members', 'list_segments', 'list_segment_members', 'campaigns', 'unsubscribes'})
+
+    def test_get_dependants_does_not_modify_config(self):
+        endpoint_config = {'children': {'unsubscribes': {}}, 'dependants': ['reports_email_activity']}
+
+        get_dependants(endpoint_config)
+
+        self.assertEqual(endpoint_config['dependants'], ['reports_email_activity'])
+
+
+class TestShouldSyncStream(unittest.TestCase):
+
+    def test_completed_stream_with_pending_dependant(self):
+        streams_to_sync = {'selected_streams': ['campaigns', 'reports_email_activity'],
+                           'completed_streams': {'campaigns'}}
+
+        self.assertEqual(should_sync_stream(streams_to_sync, ['reports_email_activity'], 'campaigns'),
+                         (True, False))
+
+    def test_completed_stream_without_pending_dependant(self):
+        streams_to_sync = {'selected_streams': ['campaigns', 'reports_email_activity'],
+                           'completed_streams': {'campaigns', 'reports_email_activity'}}
+
+        self.assertEqual(should_sync_stream(streams_to_sync, ['reports_email_activity'], 'campaigns'),
+                         (False, False))
+
+    def test_pending_stream(self):
+        streams_to_sync = {'selected_streams': ['lists'], 'completed_streams': {'campaigns'}}
+
+        self.assertEqual(should_sync_stream(streams_to_sync, [], 'lists'), (True, True))
+
+
+class TestEmailActivityBatch(unittest.TestCase):
+
+    def test_last_chunk_bookmark_points_past_the_end(self):
+        state = {}
+
+        write_email_activity_chunk_bookmark(state, 0, 0)
+
+        self.assertEqual(state['bookmarks']['reports_email_activity_next_chunk'], 1)
+
+    @patch('tap_mailchimp.sync.create_email_activity_batch')
+    def test_batch_submitted_for_first_chunk(self, mocked_create_batch):
+        streams_to_sync = {'selected_streams': ['campaigns', 'reports_email_activity'],
+                           'completed_streams': set()}
+        client = MagicMock()
+        client.adjusted_start_date = None
+        state = {}
+
+        submit_email_activity_batch(streams_to_sync, {'campaigns': ['b', 'a']}, client, None,
+                                    state, '2019-01-01T00:00:00Z')
+
+        self.assertEqual(mocked_create_batch.call_args.args[4], ['a', 'b'])
+        self.assertEqual(state['bookmarks']['reports_email_activity_next_chunk'], 1)
+
+    @patch('tap_mailchimp.sync.create_email_activity_batch')
+    def test_no_batch_when_one_is_pending(self, mocked_create_batch):
+        streams_to_sync = {'selected_streams': ['campaigns', 'reports_email_activity'],
+                           'completed_streams': set()}
+        state = {'bookmarks': {'reports_email_activity_last_run_id': 'batch-1'}}
+
+        submit_email_activity_batch(streams_to_sync, {'campaigns': ['a']}, None, None,
+                                    state, '2019-01-01T00:00:00Z')
+
+        self.assertFalse(mocked_create_batch.called)
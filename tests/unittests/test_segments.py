@@ -0,0 +1,131 @@
+import os
+import sys
+import unittest
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+from singer.utils import now, strftime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.sync import segment_unchanged # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+STREAMS = ['lists', 'list_segments', 'list_segment_members']
+FINGERPRINT = {'type': 'static', 'member_count': 10, 'updated_at': '2020-01-01T00:00:00+00:00'}
+CONFIG = {'segment_refresh_days': 7}
+
+
+class TestSegmentUnchanged(unittest.TestCase):
+
+    def get_state(self, synced_at):
+        return {'bookmarks': {'segment': {'fingerprint': FINGERPRINT, 'synced_at': strftime(synced_at)}}}
+
+    def test_same_fingerprint_recently_synced(self):
+        client = MagicMock(segment_refresh_days=7)
+
+        self.assertTrue(segment_unchanged(client, self.get_state(now()), ['segment'], FINGERPRINT))
+
+    def test_changed_member_count(self):
+        client = MagicMock(segment_refresh_days=7)
+
+        self.assertFalse(segment_unchanged(client, self.get_state(now()), ['segment'],
+                                           {**FINGERPRINT, 'member_count': 11}))
+
+    def test_refresh_interval_passed(self):
+        client = MagicMock(segment_refresh_days=7)
+
+        self.assertFalse(segment_unchanged(client, self.get_state(now() - timedelta(days=8)), ['segment'],
+                                           FINGERPRINT))
+
+    def test_fuzzy_segments_are_always_fetched(self):
+        client = MagicMock(segment_refresh_days=7)
+        fingerprint = {**FINGERPRINT, 'type': 'fuzzy'}
+        state = {'bookmarks': {'segment': {'fingerprint': fingerprint, 'synced_at': strftime(now())}}}
+
+        self.assertFalse(segment_unchanged(client, state, ['segment'], fingerprint))
+
+
+class TestSegmentChangeDetection(unittest.TestCase):
+
+    def test_unchanged_segments_are_skipped(self):
+        """
+            Verify that the members of segments unchanged since the previous run are not
+            requested again, while the segments themselves are
+        """
+        with MailchimpSimulator(lists=1, segments_per_list=3, campaigns=0) as simulator:
+            first_run = run_benchmark(simulator, CONFIG, stream_names=STREAMS)
+            second_run = run_benchmark(simulator, CONFIG, state=first_run['state'], stream_names=STREAMS)
+
+        self.assertEqual(first_run['requests']['list_segment_members'], 3)
+        bookmark = first_run['state']['bookmarks']['lists']['list000000']['list_segments']['1']
+        self.assertEqual(bookmark['list_segment_members']['fingerprint'], FINGERPRINT)
+        self.assertEqual(second_run['streams']['list_segments']['records'], 3)
+        self.assertNotIn('list_segment_members', second_run['requests'])
+
+    def test_changed_segments_are_fetched(self):
+        """
+            Verify that the members of a segment whose member count changed are fetched again
+        """
+        with MailchimpSimulator(lists=1, segments_per_list=3, campaigns=0) as simulator:
+            state = run_benchmark(simulator, CONFIG, stream_names=STREAMS)['state']
+        with MailchimpSimulator(lists=1, segments_per_list=3, members_per_segment=12, campaigns=0) as simulator:
+            report = run_benchmark(simulator, CONFIG, state=state, stream_names=STREAMS)
+
+        self.assertEqual(report['streams']['list_segment_members']['records'], 36)
+
+    def test_forced_refresh(self):
+        """
+            Verify that segment_refresh_days 0 fetches the members of every segment on every run
+        """
+        with MailchimpSimulator(lists=1, segments_per_list=3, campaigns=0) as simulator:
+            state = run_benchmark(simulator, CONFIG, stream_names=STREAMS)['state']
+            report = run_benchmark(simulator, {'segment_refresh_days': 0}, state=state, stream_names=STREAMS)
+
+        self.assertEqual(report['requests']['list_segment_members'], 3)
+
+    def test_no_fingerprint_without_segment_members(self):
+        """
+            Verify that segments are not fingerprinted when their members are not synced,
+            so selecting list_segment_members later fetches them
+        """
+        with MailchimpSimulator(lists=1, segments_per_list=3, campaigns=0) as simulator:
+            report = run_benchmark(simulator, CONFIG, stream_names=['lists', 'list_segments'])
+
+        self.assertNotIn('list_segments', report['state'].get('bookmarks', {}).get('lists', {}).get('list000000', {}))
+
+    def test_disabled_by_default(self):
+        """
+            Verify that without segment_refresh_days the members of every segment are fetched
+            on every run, and no fingerprint is written
+        """
+        with MailchimpSimulator(lists=1, segments_per_list=3, campaigns=0) as simulator:
+            state = run_benchmark(simulator, stream_names=STREAMS)['state']
+            report = run_benchmark(simulator, state=state, stream_names=STREAMS)
+
+        self.assertEqual(report['requests']['list_segment_members'], 3)
+        self.assertNotIn('list_segments', report['state'].get('bookmarks', {}).get('lists', {}).get('list000000', {}))
+
+    def test_fuzzy_segments_are_not_fingerprinted(self):
+        """
+            Verify that only static and saved segments get a fingerprint bookmark
+        """
+        with MailchimpSimulator(lists=1, segments_per_list=3, segment_types=('static', 'fuzzy', 'saved'),
+                                campaigns=0) as simulator:
+            state = run_benchmark(simulator, CONFIG, stream_names=STREAMS)['state']
+            report = run_benchmark(simulator, CONFIG, state=state, stream_names=STREAMS)
+
+        self.assertEqual(sorted(state['bookmarks']['lists']['list000000']['list_segments']), ['1', '3'])
+        self.assertEqual(report['requests']['list_segment_members'], 1)
+
+    def test_deleted_segments_are_pruned(self):
+        """
+            Verify that the fingerprints of the segments no longer returned are dropped
+        """
+        with MailchimpSimulator(lists=1, segments_per_list=3, campaigns=0) as simulator:
+            state = run_benchmark(simulator, CONFIG, stream_names=STREAMS)['state']
+        with MailchimpSimulator(lists=1, segments_per_list=1, campaigns=0) as simulator:
+            state = run_benchmark(simulator, CONFIG, state=state, stream_names=STREAMS)['state']
+
+        self.assertEqual(list(state['bookmarks']['lists']['list000000']['list_segments']), ['1'])
@@ -0,0 +1,106 @@
+import os
+import sys
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.client import MailchimpClient # pylint: disable=wrong-import-position
+from tap_mailchimp.sharding import get_shard, merge_states # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+
+class TestShardConfig(unittest.TestCase):
+
+    def test_default_single_shard(self):
+        client = MailchimpClient({'access_token': 'TOKEN'})
+
+        self.assertEqual((client.shard_index, client.shard_count), (0, 1))
+
+    def test_invalid_shard_index(self):
+        with self.assertRaises(Exception):
+            MailchimpClient({'access_token': 'TOKEN', 'shard_index': 2, 'shard_count': 2})
+
+    def test_shard_is_stable(self):
+        self.assertEqual(get_shard('list000001', 4), get_shard('list000001', 4))
+        self.assertEqual(Counter(get_shard('camp{:06d}'.format(i), 2) for i in range(100)).keys(), {0, 1})
+
+
+class TestMergeStates(unittest.TestCase):
+
+    def test_merge_shard_states(self):
+        states = [
+            {'bookmarks': {'lists': {'a': {'list_members': {'datetime': '2021-01-01T00:00:00Z'}}},
+                           'reports_email_activity': {'c1': '2021-02-01T00:00:00Z'}},
+             'stream_durations': {'lists': 10.0, 'automations': 1.0}},
+            {'bookmarks': {'lists': {'b': {'list_members': {'datetime': '2021-01-02T00:00:00Z'}}},
+                           'reports_email_activity': {'c2': '2021-02-02T00:00:00Z'},
+                           'reports_email_activity_last_run_id': 'batch-1',
+                           'reports_email_activity_next_chunk': 1},
+             'current_stream': 'reports_email_activity',
+             'stream_durations': {'lists': 12.0}},
+        ]
+
+        self.assertEqual(merge_states(states), {
+            'bookmarks': {
+                'lists': {'a': {'list_members': {'datetime': '2021-01-01T00:00:00Z'}},
+                          'b': {'list_members': {'datetime': '2021-01-02T00:00:00Z'}}},
+                'reports_email_activity': {'c1': '2021-02-01T00:00:00Z', 'c2': '2021-02-02T00:00:00Z'}},
+            'stream_durations': {'lists': 12.0, 'automations': 1.0},
+        })
+
+    def test_conflicting_bookmarks_keep_latest(self):
+        states = [{'bookmarks': {'campaigns': {'datetime': '2021-03-01T00:00:00Z'}}},
+                  {'bookmarks': {'campaigns': {'datetime': '2021-01-01T00:00:00.000000Z'}}}]
+
+        self.assertEqual(merge_states(states)['bookmarks']['campaigns']['datetime'], '2021-03-01T00:00:00Z')
+
+
+    def test_email_activity_watermarks_keep_every_cohort(self):
+        states = [{'bookmarks': {'reports_email_activity_watermark': {
+                      'send_time': '2020-06-01T00:00:00.000000Z',
+                      'cohorts': [{'datetime': '2021-03-01T00:00:00+00:00', 'campaign_ids': ['c1']}]}}},
+                  {'bookmarks': {'reports_email_activity_watermark': {
+                      'send_time': '2020-07-01T00:00:00.000000Z',
+                      'cohorts': [{'datetime': '2021-01-01T00:00:00+00:00', 'campaign_ids': ['c2']},
+                                  {'datetime': '2021-03-01T00:00:00+00:00', 'campaign_ids': ['c3']}]}}},
+                  {'bookmarks': {}}]
+
+        self.assertEqual(merge_states(states)['bookmarks']['reports_email_activity_watermark'], {
+            'send_time': '2020-07-01T00:00:00.000000Z',
+            'cohorts': [{'datetime': '2021-01-01T00:00:00+00:00', 'campaign_ids': ['c2']},
+                        {'datetime': '2021-03-01T00:00:00+00:00', 'campaign_ids': ['c1', 'c3']}]})
+
+class TestShardedSync(unittest.TestCase):
+
+    def test_shards_split_the_account(self):
+        """
+            Verify that two shards emit every record of the account exactly once between them
+        """
+        simulator = MailchimpSimulator(lists=6, members_per_list=4, segments_per_list=1, members_per_segment=2,
+                                       campaigns=6, unsubscribes_per_campaign=1, emails_per_campaign=2,
+                                       activities_per_email=1, automations=3)
+        with simulator:
+            reports = [run_benchmark(simulator, {'shard_index': index, 'shard_count': 2})
+                       for index in range(2)]
+
+        totals = Counter()
+        for report in reports:
+            totals.update({stream: stats['records'] for stream, stats in report['streams'].items()})
+        self.assertEqual(dict(totals), {
+            'automations': 3,
+            'campaigns': 6,
+            'list_members': 24,
+            'list_segment_members': 12,
+            'list_segments': 6,
+            'lists': 6,
+            'reports_email_activity': 12,
+            'unsubscribes': 6,
+        })
+        self.assertNotIn('automations', reports[1]['streams'])
+        for report in reports:
+            self.assertLess(report['streams']['lists']['records'], 6)
+
+        merged = merge_states([report['state'] for report in reports])
+        self.assertEqual(len(merged['bookmarks']['lists']), 6)
@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+
+class TestSyncAgainstSimulator(unittest.TestCase):
+
+    def test_full_sync(self):
+        """
+            Verify that a full sync against the simulator emits every generated record
+        """
+        simulator = MailchimpSimulator(lists=2, members_per_list=25, segments_per_list=2,
+                                       members_per_segment=3, campaigns=4, unsubscribes_per_campaign=2,
+                                       emails_per_campaign=5, activities_per_email=2, automations=3)
+        with simulator:
+            report = run_benchmark(simulator, {'page_size': 10})
+
+        records = {stream: stats['records'] for stream, stats in report['streams'].items()}
+        self.assertEqual(records, {
+            'automations': 3,
+            'campaigns': 4,
+            'list_members': 50,
+            'list_segment_members': 12,
+            'list_segments': 4,
+            'lists': 2,
+            'reports_email_activity': 40,
+            'unsubscribes': 8,
+        })
+        # 25 members in pages of 10 for each list
+        self.assertEqual(report['requests']['list_members'], 6)
+        self.assertEqual(report['messages']['SCHEMA'], 8)
+        self.assertEqual(report['state']['bookmarks']['lists']['list000001']['list_members']['datetime'],
+                         '2020-01-01T00:24:00+00:00')
+
+    @patch('time.sleep')
+    def test_sync_retries_injected_errors(self, mocked_sleep):
+        """
+            Verify that 429 and 5xx responses from the simulator are retried
+        """
+        simulator = MailchimpSimulator(lists=1, members_per_list=5, campaigns=0, automations=2,
+                                       rate_limit_ratio=0.2, server_error_ratio=0.2, seed=1)
+        with simulator:
+            report = run_benchmark(simulator, stream_names=['automations', 'lists', 'list_members'])
+
+        self.assertEqual(report['streams']['list_members']['records'], 5)
+        self.assertEqual(report['streams']['automations']['records'], 2)
+        self.assertTrue(mocked_sleep.called)
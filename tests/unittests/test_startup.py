@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+from unittest.mock import patch
+
+from tap_mailchimp import schema
+from tap_mailchimp.schema import build_bundle, get_schemas, load_bundle, load_schemas, write_bundle
+
+
+def normalize(value):
+    # Metadata breadcrumbs are tuples when generated and lists when read back from json
+    return json.loads(json.dumps(value))
+
+
+class TestSchemaBundle(unittest.TestCase):
+
+    def setUp(self):
+        schema.SCHEMAS.clear()
+        schema.FIELD_METADATA.clear()
+
+    def tearDown(self):
+        schema.SCHEMAS.clear()
+        schema.FIELD_METADATA.clear()
+
+    def test_bundle_matches_schema_files(self):
+        """
+            Verify that the schemas and metadata loaded from the bundle match the ones
+            generated from the schema files
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_bundle(os.path.join(tmp_dir, 'bundle.json'))
+            with patch('tap_mailchimp.schema.get_bundle_path', return_value=path):
+                schemas, field_metadata = get_schemas()
+
+        expected_schemas, expected_metadata = load_schemas()
+        self.assertEqual(schemas, expected_schemas)
+        self.assertEqual(field_metadata, normalize(expected_metadata))
+
+    def test_stale_bundle_is_ignored(self):
+        """
+            Verify that a bundle built for another bundle version falls back to the schema files
+        """
+        bundle = build_bundle()
+        bundle['version'] = -1
+        bundle['schemas'] = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'bundle.json')
+            with open(path, 'w', encoding='UTF-8') as file:
+                json.dump(bundle, file)
+            with patch('tap_mailchimp.schema.get_bundle_path', return_value=path):
+                with patch('tap_mailchimp.schema.load_schemas', return_value=({'lists': {}}, {'lists': []})):
+                    schemas, _ = get_schemas()
+
+        self.assertEqual(schemas, {'lists': {}})
+
+    def test_bundle_of_another_version_is_ignored(self):
+        """
+            Verify that a bundle built for another version of the package is not used,
+            without reading the schema files to check it
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'bundle.json')
+            with patch('tap_mailchimp.schema.get_bundle_path', return_value=path):
+                with patch('tap_mailchimp.schema.get_package_version', return_value='1.0.0'):
+                    write_bundle(path)
+                    with patch('tap_mailchimp.schema.get_schema_path') as mocked_schema_path:
+                        self.assertIsNotNone(load_bundle())
+                with patch('tap_mailchimp.schema.get_package_version', return_value='2.0.0'):
+                    self.assertIsNone(load_bundle())
+
+        mocked_schema_path.assert_not_called()
+
+    def test_schemas_are_read_from_the_bundle(self):
+        """
+            Verify that with a bundle the schemas and metadata are prepared with one read,
+            without opening the schema files or generating metadata
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_bundle(os.path.join(tmp_dir, 'bundle.json'))
+
+            with patch('tap_mailchimp.schema.get_bundle_path', return_value=path), \
+                 patch('builtins.open', wraps=open) as mocked_open, \
+                 patch('tap_mailchimp.schema.load_schemas') as mocked_load_schemas:
+                get_schemas()
+
+        self.assertEqual([call.args[0] for call in mocked_open.call_args_list], [path])
+        mocked_load_schemas.assert_not_called()
+        self.assertTrue(schema.SCHEMAS)
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_does_not_load_path_specific_modules(self):
+        """
+            Verify that importing the tap does not import modules only needed by
+            discovery (thread pool), the sync or the email activity sync (tarfile)
+        """
+        code = ('import sys; import tap_mailchimp; '
+                'print(*(name in sys.modules for name in ("tarfile", "concurrent.futures.thread", '
+                '"tap_mailchimp.sync", "tap_mailchimp.discover")))')
+        output = subprocess.run([sys.executable, '-c', code],
+                                check=True, capture_output=True, text=True).stdout.strip()
+
+        self.assertEqual(output, 'False False False False')
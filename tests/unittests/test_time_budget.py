@@ -0,0 +1,96 @@
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.client import MailchimpClient # pylint: disable=wrong-import-position
+from tap_mailchimp.discover import discover # pylint: disable=wrong-import-position
+from tap_mailchimp.sync import (TimeBudgetExceeded, check_time_budget, # pylint: disable=wrong-import-position
+                                set_current_stream, sync)
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import MessageCounter, select_all # pylint: disable=wrong-import-position
+
+
+class TestCheckTimeBudget(unittest.TestCase):
+
+    def test_no_deadline(self):
+        client = MailchimpClient({'access_token': 'TOKEN'})
+
+        self.assertIsNone(client.deadline)
+        check_time_budget(client)
+
+    def test_deadline_passed(self):
+        client = MagicMock()
+        client.deadline = 0
+
+        with self.assertRaises(TimeBudgetExceeded):
+            check_time_budget(client)
+
+
+class TestTimeBudgetedSync(unittest.TestCase):
+
+    def run_sync(self, simulator, state, stop_at_stream=None):
+        config = {'api_key': 'key', 'base_url': simulator.base_url,
+                  'start_date': '2019-01-01T00:00:00Z', 'page_size': 10,
+                  'max_runtime_seconds': 3600}
+        output = MessageCounter()
+
+        def set_current_stream_and_stop(state, stream_name):
+            # Exhaust the time budget once the sync reaches `stop_at_stream`
+            if stream_name == stop_at_stream:
+                client.deadline = 0
+            set_current_stream(state, stream_name)
+
+        with MailchimpClient(config) as client:
+            catalog = select_all(discover(client))
+            with patch('tap_mailchimp.sync.set_current_stream', side_effect=set_current_stream_and_stop):
+                with redirect_stdout(output):
+                    sync(client, catalog, state, config['start_date'])
+        return output
+
+    def test_sync_stops_and_resumes(self):
+        """
+            Verify that a sync running out of time stops cleanly with current_stream in
+            the state and that the next run skips the completed streams
+        """
+        state = {}
+        with MailchimpSimulator(lists=1, members_per_list=5, campaigns=2) as simulator:
+            # campaigns syncs first, as the email activity is pending
+            first_run = self.run_sync(simulator, state, stop_at_stream='lists')
+            self.assertEqual(state['current_stream'], 'lists')
+            self.assertEqual(first_run.last_state['current_stream'], 'lists')
+            self.assertEqual(state['completed_streams'], ['campaigns', 'unsubscribes'])
+            self.assertIn('campaigns', first_run.records)
+            self.assertNotIn('lists', first_run.records)
+
+            second_run = self.run_sync(simulator, state)
+
+        self.assertNotIn('current_stream', state)
+        self.assertNotIn('completed_streams', state)
+        self.assertNotIn('campaigns', second_run.records)
+        self.assertNotIn('unsubscribes', second_run.records)
+        self.assertEqual(second_run.records['lists'], 1)
+        self.assertEqual(second_run.records['list_members'], 5)
+        # The batch submitted by the first run is picked up, the chunk is not requested twice
+        self.assertEqual(second_run.records['reports_email_activity'], 120)
+        self.assertEqual(simulator.request_counts['create_batch'], 1)
+
+    def test_resume_at_email_activity_refetches_campaign_ids(self):
+        """
+            Verify that resuming at reports_email_activity fetches the campaign ids again
+            without re-emitting the campaigns
+        """
+        state = {'current_stream': 'reports_email_activity'}
+        with MailchimpSimulator(lists=1, members_per_list=5, campaigns=2) as simulator:
+            output = self.run_sync(simulator, state)
+            campaign_requests = simulator.request_counts['campaigns']
+
+        # The discovery access probe and one page of campaign ids
+        self.assertEqual(campaign_requests, 2)
+        self.assertNotIn('campaigns', output.records)
+        self.assertNotIn('unsubscribes', output.records)
+        self.assertNotIn('automations', output.records)
+        self.assertEqual(output.records['reports_email_activity'], 120)
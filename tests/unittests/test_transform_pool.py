@@ -0,0 +1,93 @@
+import io
+import os
+import sys
+import json
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.client import MailchimpClient # pylint: disable=wrong-import-position
+from tap_mailchimp.discover import discover # pylint: disable=wrong-import-position
+from tap_mailchimp.sync import sync # pylint: disable=wrong-import-position
+from tap_mailchimp.transform_pool import TransformPoolWriter # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import select_all # pylint: disable=wrong-import-position
+
+NOW = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def run_sync(simulator, **config):
+    config = {'api_key': 'key', 'base_url': simulator.base_url,
+              'start_date': '2019-01-01T00:00:00Z', 'page_size': 10, **config}
+    stdout = io.StringIO()
+    with MailchimpClient(config) as client:
+        catalog = select_all(discover(client))
+        # The segments' synced_at is the time of the run, keep it the same across runs
+        with redirect_stdout(stdout), patch('tap_mailchimp.sync.now', return_value=NOW):
+            sync(client, catalog, {}, config['start_date'])
+
+    messages = []
+    for line in stdout.getvalue().splitlines():
+        message = json.loads(line)
+        if message['type'] == 'RECORD':
+            messages.append(('RECORD', message['stream'], message['record']))
+        elif message['type'] == 'STATE':
+            # Stream durations are timings of the run itself
+            message['value'].pop('stream_durations', None)
+            messages.append(('STATE', message['value']))
+    return messages
+
+
+class TestTransformPoolWriter(unittest.TestCase):
+
+    def test_states_wait_for_earlier_pages(self):
+        stdout = io.StringIO()
+        schema = {'properties': {'id': {'type': ['string']}}}
+        stream_metadata = {(): {'selected': True}, ('properties', 'id'): {'inclusion': 'automatic'}}
+        state = {'bookmarks': {'lists': 1}}
+        with redirect_stdout(stdout):
+            writer = TransformPoolWriter(workers=1)
+            writer.submit_page('lists', schema, stream_metadata, [{'id': 'a'}, {'id': 'b'}])
+            writer.write_state(state)
+            state['bookmarks']['lists'] = 2
+            writer.submit_page('lists', schema, stream_metadata, [{'id': 'c'}])
+            writer.close()
+
+        messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([message.get('record', message.get('value')) for message in messages],
+                         [{'id': 'a'}, {'id': 'b'}, {'bookmarks': {'lists': 1}}, {'id': 'c'}])
+
+    def test_same_output_as_sequential_sync(self):
+        """
+            Verify that a sync with a transform pool writes the same records and states in the same order
+        """
+        outputs = []
+        for config in ({}, {'transform_workers': 2}):
+            with MailchimpSimulator(lists=2, members_per_list=25, segments_per_list=1, members_per_segment=3,
+                                    campaigns=2, emails_per_campaign=4) as simulator:
+                outputs.append(run_sync(simulator, **config))
+        sequential, pooled = outputs
+
+        self.assertEqual(pooled, sequential)
+        self.assertTrue(any(message[0] == 'RECORD' and message[1] == 'reports_email_activity'
+                            for message in pooled))
+
+    def test_email_activity_is_serialized_by_the_pool(self):
+        """
+            Verify that the flattened email activity, already transformed, is sent to the pool to be serialized
+        """
+        with MailchimpSimulator(lists=1, campaigns=2, emails_per_campaign=4) as simulator, \
+             patch.object(TransformPoolWriter, 'submit_page', autospec=True,
+                          side_effect=TransformPoolWriter.submit_page) as mocked_submit_page:
+            messages = run_sync(simulator, transform_workers=2)
+
+        activity_pages = [call for call in mocked_submit_page.call_args_list
+                          if call.args[1] == 'reports_email_activity']
+        self.assertEqual(len(activity_pages), 2)
+        self.assertTrue(all(call.kwargs['transformed'] for call in activity_pages))
+        # 4 emails of 3 activities per campaign
+        self.assertEqual(sum(1 for message in messages
+                             if message[0] == 'RECORD' and message[1] == 'reports_email_activity'), 24)
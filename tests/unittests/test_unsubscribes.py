@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+STREAMS = ['campaigns', 'unsubscribes']
+CONFIG = {'page_size': 5}
+
+
+class TestIncrementalUnsubscribes(unittest.TestCase):
+
+    def test_unchanged_campaigns_are_skipped(self):
+        """
+            Verify that the unsubscribes of campaigns whose report count did not change
+            are not requested again
+        """
+        with MailchimpSimulator(lists=1, campaigns=2, unsubscribes_per_campaign=7) as simulator:
+            first_run = run_benchmark(simulator, CONFIG, stream_names=STREAMS)
+            second_run = run_benchmark(simulator, CONFIG, state=first_run['state'], stream_names=STREAMS)
+
+        self.assertEqual(first_run['streams']['unsubscribes']['records'], 14)
+        bookmark = first_run['state']['bookmarks']['campaigns']['camp000000']['unsubscribes']
+        self.assertEqual(bookmark['count'], 7)
+        self.assertNotIn('unsubscribes', second_run['requests'])
+        self.assertEqual(second_run['requests']['reports'], 1)
+
+    def test_new_unsubscribes_are_read_from_the_last_one(self):
+        """
+            Verify that only the pages after the last unsubscribe of the previous run are read
+        """
+        with MailchimpSimulator(lists=1, campaigns=2, unsubscribes_per_campaign=7) as simulator:
+            state = run_benchmark(simulator, CONFIG, stream_names=STREAMS)['state']
+        with MailchimpSimulator(lists=1, campaigns=2, unsubscribes_per_campaign=12) as simulator:
+            report = run_benchmark(simulator, CONFIG, state=state, stream_names=STREAMS)
+
+        self.assertEqual(report['streams']['unsubscribes']['records'], 10)
+        # Offsets 6 and 11 of each campaign
+        self.assertEqual(report['requests']['unsubscribes'], 4)
+        self.assertEqual(report['state']['bookmarks']['campaigns']['camp000001']['unsubscribes']['count'], 12)
+
+    def test_changed_list_is_read_from_the_start(self):
+        """
+            Verify that a list whose last synced unsubscribe moved is read again in full
+        """
+        state = {'bookmarks': {'campaigns': {
+            'camp000000': {'unsubscribes': {'count': 3, 'last_key': 'moved'}},
+        }}}
+        with MailchimpSimulator(lists=1, campaigns=1, unsubscribes_per_campaign=7) as simulator:
+            report = run_benchmark(simulator, CONFIG, state=state, stream_names=STREAMS)
+
+        self.assertEqual(report['streams']['unsubscribes']['records'], 7)
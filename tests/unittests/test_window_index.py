@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+# Campaigns are sent an hour apart from 2020-01-01, the window starts on 2020-01-02
+CONFIG = {'page_size': 50, 'email_activity_date_window': 1}
+TODAY = datetime(2020, 1, 3, tzinfo=timezone.utc)
+# 20 emails of 3 activities per campaign
+RECORDS_PER_CAMPAIGN = 60
+STREAMS = ['campaigns', 'reports_email_activity']
+
+
+def run_on(day, simulator, state=None, stream_names=None, unselected_streams=()):
+    # The window is computed from today when the client is created
+    with mock.patch('singer.utils.now', return_value=day):
+        return run_benchmark(simulator, CONFIG, state=state, stream_names=stream_names,
+                             unselected_streams=unselected_streams)
+
+
+class TestWindowIndex(unittest.TestCase):
+
+    def test_window_is_selected_from_the_campaigns_sync(self):
+        """
+            Verify that the campaigns of the date window are selected from the campaigns
+            listed by their own sync, without requesting them again or bookmarking them
+        """
+        with MailchimpSimulator(lists=1, campaigns=30) as simulator:
+            report = run_on(TODAY, simulator, stream_names=STREAMS)
+
+        self.assertEqual(report['streams']['campaigns']['records'], 30)
+        self.assertEqual(report['requests']['campaigns'], 1)
+        # Campaigns 24 to 29
+        self.assertEqual(report['streams']['reports_email_activity']['records'], 6 * RECORDS_PER_CAMPAIGN)
+        self.assertEqual(sorted(report['state']['bookmarks']['reports_email_activity'])[0], 'camp000024')
+        self.assertNotIn('datetime', report['state']['bookmarks'].get('campaigns', {}))
+        self.assertNotIn('campaigns_index', report['state']['bookmarks'])
+
+    def test_persisted_index_when_campaigns_are_not_selected(self):
+        """
+            Verify that without the campaigns stream only the campaigns sent since the
+            last indexed one are requested, and the campaigns out of the window dropped
+        """
+        with MailchimpSimulator(lists=1, campaigns=30) as simulator:
+            state = run_on(TODAY, simulator, stream_names=STREAMS, unselected_streams=['campaigns'])['state']
+
+        index = state['bookmarks']['campaigns_index']
+        self.assertEqual(sorted(index['campaigns']), ['camp0000{}'.format(i) for i in range(24, 30)])
+        self.assertEqual(index['datetime'], '2020-01-02T05:00:00+00:00')
+
+        with MailchimpSimulator(lists=1, campaigns=50, emails_per_campaign=0) as simulator:
+            report = run_on(datetime(2020, 1, 3, 12, tzinfo=timezone.utc), simulator, state=state,
+                            stream_names=STREAMS, unselected_streams=['campaigns'])
+
+        index = report['state']['bookmarks']['campaigns_index']
+        # Requested since camp000029, one page of campaigns 29 to 49
+        self.assertEqual(report['requests']['campaigns'], 1)
+        self.assertEqual(sorted(index['campaigns']), ['camp0000{}'.format(i) for i in range(24, 50)])
+        self.assertEqual(index['datetime'], '2020-01-03T01:00:00+00:00')
+
+        with MailchimpSimulator(lists=1, campaigns=50, emails_per_campaign=0) as simulator:
+            report = run_on(datetime(2020, 1, 4, tzinfo=timezone.utc), simulator, state=report['state'],
+                            stream_names=STREAMS, unselected_streams=['campaigns'])
+
+        # The window now starts on 2020-01-03
+        self.assertEqual(sorted(report['state']['bookmarks']['campaigns_index']['campaigns']),
+                         ['camp0000{}'.format(i) for i in range(48, 50)])
+
+    def test_campaigns_are_listed_for_their_children(self):
+        """
+            Verify that the campaigns are listed in full when unsubscribes need them
+        """
+        with MailchimpSimulator(lists=1, campaigns=30, unsubscribes_per_campaign=1) as simulator:
+            report = run_on(TODAY, simulator, stream_names=STREAMS + ['unsubscribes'],
+                            unselected_streams=['campaigns'])
+
+        self.assertEqual(report['streams']['unsubscribes']['records'], 30)
+        self.assertEqual(report['streams']['reports_email_activity']['records'], 6 * RECORDS_PER_CAMPAIGN)
+        self.assertNotIn('campaigns_index', report['state']['bookmarks'])
@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from tap_mailchimp.sync import get_windows # pylint: disable=wrong-import-position
+from mailchimp_simulator import MailchimpSimulator # pylint: disable=wrong-import-position
+from benchmark_sync import run_benchmark # pylint: disable=wrong-import-position
+
+
+class TestGetWindows(unittest.TestCase):
+
+    def test_windows_cover_the_range(self):
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        end = datetime(2020, 1, 25, tzinfo=timezone.utc)
+
+        windows = get_windows(start, end, 10)
+
+        self.assertEqual([(window_start.day, window_end.day) for window_start, window_end in windows],
+                         [(1, 11), (11, 21), (21, 25)])
+
+
+class TestWindowedListMembers(unittest.TestCase):
+
+    def test_backfill_in_parallel_windows(self):
+        """
+            Verify that a first sync of list_members in windows emits every member and ends
+            with the regular datetime bookmark
+        """
+        with MailchimpSimulator(lists=2, members_per_list=25, campaigns=0) as simulator:
+            report = run_benchmark(simulator, {'page_size': 10, 'list_members_window_days': 200,
+                                               'list_members_window_workers': 3},
+                                   stream_names=['lists', 'list_members'])
+
+        self.assertEqual(report['streams']['list_members']['records'], 50)
+        bookmark = report['state']['bookmarks']['lists']['list000001']['list_members']
+        self.assertEqual(list(bookmark), ['datetime'])
+        # The end of the windows, as no member changed since
+        self.assertGreater(bookmark['datetime'], '2020-01-01T00:24:00+00:00')
+
+    def test_resume_interrupted_backfill(self):
+        """
+            Verify that only the windows not completed by an interrupted backfill are synced
+        """
+        windows = {
+            'start': '2019-01-01T00:00:00+00:00',
+            'end': '2020-06-01T00:00:00+00:00',
+            'days': 100,
+            # The members changed in January 2020, in window 3
+            'completed': [0, 1, 2, 3],
+            'max_bookmark': '2020-01-01T00:24:00+00:00',
+        }
+        state = {'bookmarks': {'lists': {'list000000': {'list_members': {'windows': windows}}}}}
+        with MailchimpSimulator(lists=1, members_per_list=25, campaigns=0) as simulator:
+            report = run_benchmark(simulator, {'page_size': 10, 'list_members_window_days': 100},
+                                   state=state, stream_names=['lists', 'list_members'])
+
+        self.assertNotIn('list_members', report['streams'])
+        # One page for each of the two windows left
+        self.assertEqual(report['requests']['list_members'], 2)
+        self.assertEqual(state['bookmarks']['lists']['list000000']['list_members'],
+                         {'datetime': '2020-05-31T23:00:00+00:00'})
+
+    def test_member_on_a_window_boundary(self):
+        """
+            Verify that a member changed exactly on the boundary of two windows is synced
+            even when neither window's bounds include that second
+        """
+        windows = {
+            'start': '2019-12-31T00:00:00+00:00',
+            'end': '2020-01-02T00:00:00+00:00',
+            'days': 1,
+            'completed': [],
+            'max_bookmark': '2019-12-31T00:00:00+00:00',
+        }
+        state = {'bookmarks': {'lists': {'list000000': {'list_members': {'windows': windows}}}}}
+        # The first member changed on 2020-01-01T00:00:00, the end of the first window
+        with MailchimpSimulator(lists=1, members_per_list=25, exclusive_member_since=True,
+                                campaigns=0) as simulator:
+            report = run_benchmark(simulator, {'page_size': 50, 'list_members_window_days': 1},
+                                   state=state, stream_names=['lists', 'list_members'])
+
+        self.assertEqual(report['streams']['list_members']['records'], 25)
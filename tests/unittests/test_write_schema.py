@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import singer
+
+from tap_mailchimp.sync import sync_stream, write_schema, WRITTEN_SCHEMAS
+
+def get_catalog():
+    return singer.Catalog.from_dict(
+        {"streams": [
+            {"tap_stream_id": stream_name,
+             "stream": stream_name,
+             "key_properties": ["id"],
+             "schema": {"properties": {"id": {"type": ["string"]}}},
+             "metadata": [{"breadcrumb": [], "metadata": {"selected": True}},
+                          {"breadcrumb": ["properties", "id"], "metadata": {"inclusion": "automatic"}}]}
+            for stream_name in ['lists', 'list_segments']
+        ]}
+    )
+
+
+def get_client():
+    def _get(path, **kwargs):
+        if path == '/lists':
+            return {'lists': [{'id': 'l1', '_links': []}, {'id': 'l2', '_links': []}]}
+        return {'segments': [{'id': 's1', '_links': []}]}
+
+    client = MagicMock()
+    client.page_size = 1000
+    client.deadline = None
+    client.adaptive_page_size = False
+    client.stream_json = False
+    client.get.side_effect = _get
+    return client
+
+
+@patch('tap_mailchimp.sync.singer.write_state')
+@patch('tap_mailchimp.sync.singer.write_record')
+@patch('tap_mailchimp.sync.singer.write_schema')
+class TestWriteSchemaOnce(unittest.TestCase):
+
+    def setUp(self):
+        WRITTEN_SCHEMAS.clear()
+
+    def test_write_schema_once_per_stream(self, mocked_write_schema, *args):
+        """
+            Verify that the schema of a stream is only emitted on the first call
+        """
+        catalog = get_catalog()
+
+        write_schema(catalog, 'lists')
+        write_schema(catalog, 'lists')
+
+        self.assertEqual(mocked_write_schema.call_count, 1)
+
+    def test_child_schema_written_once_for_all_parents(self, mocked_write_schema, *args):
+        """
+            Verify that a child stream synced for several parent ids emits a single SCHEMA
+            message, before its first record
+        """
+        endpoint_config = {
+            'path': '/lists',
+            'children': {
+                'list_segments': {
+                    'path': '/lists/{}/segments',
+                    'data_path': 'segments'
+                }
+            }
+        }
+        streams_to_sync = {'selected_streams': ['lists', 'list_segments'], 'completed_streams': set()}
+
+        sync_stream(get_client(), get_catalog(), {}, None, streams_to_sync, {}, 'lists', endpoint_config)
+
+        written = [call.args[0] for call in mocked_write_schema.call_args_list]
+        self.assertEqual(written, ['lists', 'list_segments'])